@@ -0,0 +1,324 @@
+import kivy
+from kivy.app import App
+from kivy.uix.widget import Widget
+from kivy.uix.label import Label
+from kivy.uix.button import Button
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.floatlayout import FloatLayout
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.logger import Logger
+from kivy.core.clipboard import Clipboard
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from clipboard_detect import KivyBackend
+from sync_service import ConfigStore, create_service
+
+# Longest the UI waits before showing the newest sync status
+STATUS_INTERVAL = 0.2
+
+# Required for Android (will not run on desktop)
+try:
+    from android.permissions import request_permissions, Permission
+    from android.runnable import run_on_ui_thread
+    from jnius import autoclass, PythonJavaClass, java_method
+    from android import activity
+    
+    # Android classes
+    PythonActivity = autoclass('org.kivy.android.PythonActivity')
+    Context = autoclass('android.content.Context')
+    WindowManager = autoclass('android.view.WindowManager')
+    LayoutParams = autoclass('android.view.WindowManager$LayoutParams')
+    
+    class PrimaryClipChangedListener(PythonJavaClass):
+        """Forwards ClipboardManager change notifications to a Python callback"""
+        __javainterfaces__ = ['android/content/ClipboardManager$OnPrimaryClipChangedListener']
+        __javacontext__ = 'app'
+        
+        def __init__(self, callback):
+            super(PrimaryClipChangedListener, self).__init__()
+            self.callback = callback
+        
+        @java_method('()V')
+        def onPrimaryClipChanged(self):
+            self.callback()
+    
+    class AndroidClipboardBackend(KivyBackend):
+        """Kivy clipboard backend that also receives ClipboardManager notifications"""
+        
+        def set_listener(self, callback):
+            self._listener = PrimaryClipChangedListener(callback)
+            self._register_listener()
+            return True
+        
+        @run_on_ui_thread
+        def _register_listener(self):
+            try:
+                manager = PythonActivity.mActivity.getSystemService(Context.CLIPBOARD_SERVICE)
+                manager.addPrimaryClipChangedListener(self._listener)
+            except Exception as e:
+                Logger.error(f"ClipSync: Error registering clipboard listener: {e}")
+    
+    ANDROID_AVAILABLE = True
+except ImportError:
+    Logger.warning("ClipSync: Android modules not available. Running in desktop mode.")
+    ANDROID_AVAILABLE = False
+
+
+class FloatingClipboardWidget(FloatLayout):
+    """
+    A floating widget that monitors clipboard content and stays visible
+    to maintain focus for Android v10+ compatibility.
+    
+    It is a front-end for a SyncService: reading, hashing, encryption and
+    sending all run on the service thread, and the UI only receives
+    coalesced status updates.
+    """
+    
+    def __init__(self, sync_service, **kwargs):
+        super(FloatingClipboardWidget, self).__init__(**kwargs)
+        
+        self.sync_service = sync_service
+        self.sync_service.on_status = self.on_sync_status
+        self._latest_status = None
+        self._status_event = None
+        
+        # Flag to track if we're actively monitoring
+        self.is_monitoring = False
+        
+        # Setup the UI
+        self.setup_ui()
+        
+        # Request necessary permissions on Android
+        if ANDROID_AVAILABLE:
+            self.request_android_permissions()
+    
+    def setup_ui(self):
+        """Setup the floating UI components"""
+        
+        # Main container with semi-transparent background
+        main_layout = BoxLayout(
+            orientation='vertical',
+            spacing=5,
+            padding=10,
+            size_hint=(None, None),
+            size=(200, 120),
+            pos_hint={'x': 0.8, 'y': 0.8}  # Position in top-right corner
+        )
+        
+        # Status label
+        self.status_label = Label(
+            text='ClipSync Ready',
+            size_hint_y=0.4,
+            font_size='12sp',
+            halign='center',
+            valign='middle'
+        )
+        self.status_label.bind(size=self.status_label.setter('text_size'))
+        
+        # Clipboard content preview (truncated)
+        self.clipboard_preview = Label(
+            text='Clipboard: Empty',
+            size_hint_y=0.4,
+            font_size='10sp',
+            halign='center',
+            valign='middle',
+            text_size=(180, None)
+        )
+        
+        # Control button
+        self.control_button = Button(
+            text='Start Monitoring',
+            size_hint_y=0.2,
+            font_size='11sp'
+        )
+        self.control_button.bind(on_press=self.toggle_monitoring)
+        
+        # Add widgets to layout
+        main_layout.add_widget(self.status_label)
+        main_layout.add_widget(self.clipboard_preview)
+        main_layout.add_widget(self.control_button)
+        
+        # Add semi-transparent background
+        with main_layout.canvas.before:
+            from kivy.graphics import Color, Rectangle
+            Color(0, 0, 0, 0.7)  # Semi-transparent black
+            self.bg_rect = Rectangle(size=main_layout.size, pos=main_layout.pos)
+        
+        # Bind size and position updates
+        main_layout.bind(size=self.update_bg, pos=self.update_bg)
+        
+        self.add_widget(main_layout)
+    
+    def update_bg(self, instance, value):
+        """Update background rectangle size and position"""
+        self.bg_rect.size = instance.size
+        self.bg_rect.pos = instance.pos
+    
+    def request_android_permissions(self):
+        """Request necessary Android permissions"""
+        if not ANDROID_AVAILABLE:
+            return
+            
+        # Request permissions that might be needed
+        permissions = [
+            Permission.WRITE_EXTERNAL_STORAGE,
+            Permission.READ_EXTERNAL_STORAGE,
+        ]
+        
+        try:
+            request_permissions(permissions)
+            Logger.info("ClipSync: Android permissions requested")
+        except Exception as e:
+            Logger.error(f"ClipSync: Error requesting permissions: {e}")
+    
+    def toggle_monitoring(self, instance):
+        """Toggle clipboard monitoring on/off"""
+        if not self.is_monitoring:
+            self.start_monitoring()
+        else:
+            self.stop_monitoring()
+    
+    def start_monitoring(self):
+        """Start monitoring clipboard content"""
+        self.is_monitoring = True
+        self.control_button.text = 'Stop Monitoring'
+        self.status_label.text = 'Monitoring Active'
+        
+        # The service thread polls and sends; nothing runs on the main loop
+        self.sync_service.start()
+        
+        Logger.info("ClipSync: Started clipboard monitoring")
+    
+    def stop_monitoring(self):
+        """Stop monitoring clipboard content"""
+        self.is_monitoring = False
+        self.control_button.text = 'Start Monitoring'
+        self.status_label.text = 'Monitoring Stopped'
+        
+        self.sync_service.stop()
+        
+        Logger.info("ClipSync: Stopped clipboard monitoring")
+    
+    def on_sync_status(self, status):
+        """Called on the service thread; keeps only the newest status for the UI"""
+        if status['event'] == 'changed':
+            Logger.info(f"ClipSync: Clipboard changed - {status['length']} characters")
+        elif status['event'] == 'echo':
+            Logger.info(f"ClipSync: Echo suppressed ({status['suppressed']} total)")
+        elif status['event'] == 'error':
+            Logger.error(f"ClipSync: Error syncing clipboard: {status['message']}")
+        
+        # At most one UI update is pending at a time; later statuses replace earlier ones
+        self._latest_status = status
+        if self._status_event is None:
+            self._status_event = Clock.schedule_once(self.update_status, STATUS_INTERVAL)
+    
+    def update_status(self, dt):
+        """Show the newest sync status (runs on the main loop)"""
+        self._status_event = None
+        status = self._latest_status
+        if status is None or not self.is_monitoring:
+            return
+        
+        if status['event'] == 'changed':
+            self.clipboard_preview.text = f"Clipboard: {status['preview']}"
+            self.status_label.text = f"Content detected ({status['length']} chars)"
+        elif status['event'] == 'error':
+            self.status_label.text = 'Error reading clipboard'
+        elif status['event'] == 'echo':
+            self.status_label.text = 'Received from peer'
+        
+        if status['failed']:
+            self.status_label.text += f"\n{status['sent']} sent, {status['failed']} failed"
+
+
+class ClipSyncFloatingApp(App):
+    """
+    Main Kivy application that creates a floating, persistent clipboard monitor
+    """
+    
+    def __init__(self, sync_service, **kwargs):
+        super(ClipSyncFloatingApp, self).__init__(**kwargs)
+        self.sync_service = sync_service
+    
+    def build(self):
+        """Build the application"""
+        # Set window properties for floating behavior
+        if ANDROID_AVAILABLE:
+            self.setup_android_floating_window()
+        else:
+            # Desktop mode - smaller window for testing
+            Window.size = (300, 150)
+            Window.always_on_top = True
+        
+        # Create and return the main widget
+        self.floating_widget = FloatingClipboardWidget(self.sync_service)
+        return self.floating_widget
+    
+    def setup_android_floating_window(self):
+        """Setup Android-specific floating window properties"""
+        try:
+            # This would be used for system overlay windows
+            # Note: Requires SYSTEM_ALERT_WINDOW permission for true floating
+            Logger.info("ClipSync: Setting up Android floating window")
+            
+            # For now, we'll use a regular window that stays in focus
+            # In a production app, you might want to implement a proper overlay
+            
+        except Exception as e:
+            Logger.error(f"ClipSync: Error setting up Android floating window: {e}")
+    
+    def on_start(self):
+        """Called when the application starts"""
+        Logger.info("ClipSync: Application started")
+        
+        # Keep the app in focus to maintain clipboard access
+        if ANDROID_AVAILABLE:
+            self.maintain_focus()
+    
+    def maintain_focus(self):
+        """Maintain application focus for clipboard access"""
+        try:
+            # Schedule periodic focus maintenance
+            Clock.schedule_interval(self.focus_maintenance, 1.0)  # Every second
+        except Exception as e:
+            Logger.error(f"ClipSync: Error maintaining focus: {e}")
+    
+    def focus_maintenance(self, dt):
+        """Periodic focus maintenance"""
+        # This helps ensure the app stays in focus
+        # Additional focus maintenance logic can be added here
+        pass
+    
+    def on_pause(self):
+        """Called when the app is paused"""
+        Logger.info("ClipSync: Application paused")
+        # Return True to keep the app running in background
+        return True
+    
+    def on_resume(self):
+        """Called when the app is resumed"""
+        Logger.info("ClipSync: Application resumed")
+    
+    def on_stop(self):
+        """Called when the app is closing"""
+        self.floating_widget.sync_service.close()
+
+
+def run_ui(config=None):
+    """Run the floating UI attached to a new sync service"""
+    # Notifications on Android, adaptive polling elsewhere
+    backend = AndroidClipboardBackend() if ANDROID_AVAILABLE else KivyBackend()
+    if config is None:
+        sync_service = create_service(None, backend, config_store=ConfigStore())
+    else:
+        sync_service = create_service(config, backend)
+    try:
+        ClipSyncFloatingApp(sync_service).run()
+    except Exception as e:
+        Logger.error(f"ClipSync: Fatal error: {e}")
+        raise
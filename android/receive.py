@@ -1,40 +1,16 @@
+import logging
 import os
-import json
-import base64
-from flask import Flask, request, jsonify
-from Crypto.Cipher import AES
-import subprocess
+import sys
 
-# Load config from shared/config.json (relative to this script)
-config_path = os.path.join(os.path.dirname(__file__), "..", "shared", "config.json")
-config_path = os.path.abspath(config_path)
-with open(config_path, 'r') as f:
-    config = json.load(f)
-
-AES_KEY = base64.b64decode(config['aes_key'])
-AES_IV = base64.b64decode(config['iv'])
-LOCAL_PORT = config['local_port']
-
-app = Flask(__name__)
-
-@app.route('/clipboard', methods=['POST'])
-def clipboard():
-    data = request.get_json()
-    if not data or 'data' not in data:
-        return jsonify({"error": "Missing 'data' field"}), 400
-    try:
-        encrypted = base64.b64decode(data['data'])
-        cipher = AES.new(AES_KEY, AES.MODE_CBC, AES_IV)
-        decrypted = cipher.decrypt(encrypted)
-        pad_len = decrypted[-1]
-        clipboard_text = decrypted[:-pad_len].decode('utf-8')
-        # Set clipboard using Termux:API
-        subprocess.run(['termux-clipboard-set', clipboard_text])
-        print(f"Clipboard updated: {clipboard_text}")
-        return jsonify({"status": "success"}), 200
-    except Exception as e:
-        print(f"Error: {e}")
-        return jsonify({"error": str(e)}), 500
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared"))
+from clipboard_detect import TermuxBackend
+from receiver import run_receiver
+from config_store import ConfigStore
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=LOCAL_PORT)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    store = ConfigStore()
+    if store.config is None:
+        sys.exit("Missing shared/config.json, run setup_config.py first")
+    # Termux:API sets the Android clipboard, taking the text on stdin
+    run_receiver(store.config, TermuxBackend().write, config_store=store)
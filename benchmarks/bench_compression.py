@@ -0,0 +1,79 @@
+"""
+Compare wire size and latency of clipboard payloads with and without compression.
+
+Latency is encrypt + transfer + decrypt, where transfer time is modelled from
+the JSON body size at --link-mbps (default: a typical 50 Mbit/s Wi-Fi link).
+
+    python benchmarks/bench_compression.py [--link-mbps 50]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from codec import decode_text, encode_text
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def sample_log(size):
+    rng = random.Random(1)
+    levels = ["INFO", "DEBUG", "WARN", "ERROR"]
+    lines = []
+    total = 0
+    while total < size:
+        line = (f"2025-07-{rng.randint(1, 28):02d} 12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                f"{rng.choice(levels)} worker-{rng.randint(1, 8)} handled /api/v1/items/{rng.randint(1, 99999)} "
+                f"in {rng.randint(1, 900)} ms")
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def sample_json(size):
+    rng = random.Random(2)
+    items = []
+    total = 0
+    while total < size:
+        item = {"id": rng.randint(1, 10**6), "name": f"user{rng.randint(1, 5000)}",
+                "active": rng.random() > 0.5, "score": round(rng.random() * 100, 2)}
+        items.append(item)
+        total += 70
+    return json.dumps(items, indent=2)[:size]
+
+
+def measure(text, key, compress, link_mbps, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = json.dumps({"data": encode_text(text, key, compress=compress)})
+        encrypted = time.perf_counter()
+        decode_text(json.loads(body)["data"], key)
+        decrypted = time.perf_counter()
+        cpu = (encrypted - start) + (decrypted - encrypted)
+        best = cpu if best is None else min(best, cpu)
+    transfer = len(body) * 8 / (link_mbps * 1_000_000)
+    return len(body), (best + transfer) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--link-mbps", type=float, default=50.0)
+    args = parser.parse_args()
+
+    key = os.urandom(32)
+    print(f"{'kind':<5} {'size':>9} {'raw wire B':>11} {'zlib wire B':>12} {'raw ms':>8} {'zlib ms':>8}")
+    for kind, make in (("log", sample_log), ("json", sample_json)):
+        for size in SIZES:
+            text = make(size)
+            repeat = 5 if size <= 1_000_000 else 1
+            raw_bytes, raw_ms = measure(text, key, False, args.link_mbps, repeat)
+            zlib_bytes, zlib_ms = measure(text, key, None, args.link_mbps, repeat)
+            print(f"{kind:<5} {size:>9} {raw_bytes:>11} {zlib_bytes:>12} {raw_ms:>8.2f} {zlib_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
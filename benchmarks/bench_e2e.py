@@ -0,0 +1,230 @@
+"""
+End-to-end sync benchmark on a single machine.
+
+Node A is a fake in-memory clipboard watched by the real ChangeDetector and
+sent with the real ClipboardSender; node B is the real asyncio receiver on
+loopback applying into another fake clipboard. Every scenario (payload size
+x burst pattern) runs in a fresh subprocess so its peak RSS is its own.
+
+Patterns:
+  single     one copy at a time, waiting for it to be pasted on B
+  burst      --burst copies back to back; latency is until B shows the last
+  sustained  copies as fast as B keeps up for --duration seconds
+
+Results are written as JSON (default benchmarks/results/e2e-<time>.json);
+pass --compare OLD.json to print the change against an earlier run.
+
+    python benchmarks/bench_e2e.py [--sizes 100,10000,1000000] [--compare OLD.json]
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+PATTERNS = ("single", "burst", "sustained")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+WORDS = [f"{w}{n}" for w in ("error", "user", "id", "GET", "ok", "src", "json", "val", "def", "tmp") for n in range(40)]
+
+
+def make_bodies(size, count=8):
+    """Log-like texts that compress roughly 3x, generated before timing starts."""
+    bodies = []
+    for n in range(count):
+        words = random.Random(n).choices(WORDS, k=size // 5 + 1)
+        bodies.append(" ".join(words)[:size])
+    return bodies
+
+
+def tag_text(i, body):
+    """Prefix a body with a unique tag so B can tell which copy it received."""
+    tag = f"{i:08d}|"
+    return tag + body[len(tag):]
+
+
+class Node:
+    """Fake clipboard A -> detector -> sender -> loopback receiver -> fake clipboard B."""
+
+    def __init__(self):
+        from clipboard_detect import ChangeDetector, FakeClipboard
+        from receiver import AsyncHTTPServer, start_receiver
+        from sender import ClipboardSender
+
+        key = os.urandom(32)
+        config = {"aes_key": base64.b64encode(key).decode(), "device_id": "node-b"}
+        self.clipboard_a = FakeClipboard()
+        self.clipboard_b = FakeClipboard()
+        self.pasted = {}
+        self.pasted_cond = threading.Condition()
+        self.wire_bytes = 0
+        self.requests = 0
+
+        bench = self
+        original_dispatch = AsyncHTTPServer._dispatch
+
+        async def counting_dispatch(server, request):
+            bench.wire_bytes += request.content_length
+            bench.requests += 1
+            return await original_dispatch(server, request)
+
+        AsyncHTTPServer._dispatch = counting_dispatch
+
+        self.loop = asyncio.new_event_loop()
+        _, self.receiver, port = self.loop.run_until_complete(
+            start_receiver(config, self._apply, "127.0.0.1", 0, state_path=None, history_path=None))
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+        self.sender = ClipboardSender([("127.0.0.1", port)], key, origin="node-a")
+        self.sender.start()
+        self.detector = ChangeDetector(self.clipboard_a, min_interval=0.005, max_interval=0.05)
+        self.detector.prime()
+        self.stop = threading.Event()
+        self._seq = itertools.count(1)
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        for text in self.detector.watch(self.stop):
+            self.sender.send(text.strip(), next(self._seq))
+
+    def _apply(self, text):
+        self.clipboard_b.copy(text)
+        with self.pasted_cond:
+            self.pasted[int(text[:8])] = time.perf_counter()
+            self.pasted_cond.notify_all()
+
+    def wait_for(self, i, timeout=30.0):
+        with self.pasted_cond:
+            if not self.pasted_cond.wait_for(lambda: i in self.pasted, timeout):
+                raise TimeoutError(f"update {i} never arrived")
+        return self.pasted[i]
+
+    def close(self):
+        self.stop.set()
+        self.sender.stop()
+
+
+def run_scenario(size, pattern, args):
+    node = Node()
+    latencies = []
+    counter = itertools.count()
+    bodies = make_bodies(size)
+
+    def copy():
+        i = next(counter)
+        text = tag_text(i, bodies[i % len(bodies)])
+        copied = time.perf_counter()
+        node.clipboard_a.copy(text)
+        return i, copied
+
+    start = time.perf_counter()
+    if pattern == "single":
+        for _ in range(args.iterations):
+            i, copied = copy()
+            latencies.append(node.wait_for(i) - copied)
+    elif pattern == "burst":
+        for _ in range(args.iterations):
+            copied = time.perf_counter()
+            for _ in range(args.burst):
+                i, _ = copy()
+            latencies.append(node.wait_for(i) - copied)
+    else:
+        deadline = start + args.duration
+        while time.perf_counter() < deadline:
+            i, copied = copy()
+            latencies.append(node.wait_for(i) - copied)
+    elapsed = time.perf_counter() - start
+    node.close()
+
+    return {
+        "size": size,
+        "pattern": pattern,
+        "copies": next(counter),
+        "pasted": len(node.pasted),
+        "latency_ms": {
+            "p50": statistics.median(latencies) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies) * 1000,
+        },
+        "updates_per_s": len(node.pasted) / elapsed,
+        "wire_bytes": node.wire_bytes,
+        "wire_bytes_per_update": node.wire_bytes / max(1, node.requests),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = {(r["size"], r["pattern"]): r for r in json.load(f)["results"]}
+    print(f"\nChange vs {old_path}:")
+    for r in results:
+        before = old.get((r["size"], r["pattern"]))
+        if not before:
+            continue
+        def delta(new, prev):
+            return f"{(new - prev) / prev * 100:+.1f}%" if prev else "n/a"
+        print(f"{r['pattern']:<9} {r['size']:>9}  p50 {delta(r['latency_ms']['p50'], before['latency_ms']['p50']):>8}"
+              f"  upd/s {delta(r['updates_per_s'], before['updates_per_s']):>8}"
+              f"  rss {delta(r['peak_rss_kb'], before['peak_rss_kb']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,10000,1000000")
+    parser.add_argument("--patterns", default=",".join(PATTERNS))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        size, pattern = args.scenario.split(":")
+        print(json.dumps(run_scenario(int(size), pattern, args)))
+        return
+
+    results = []
+    print(f"{'pattern':<9} {'size':>9} {'p50 ms':>8} {'p99 ms':>8} {'upd/s':>8} {'wire B/upd':>11} {'pasted':>7} {'rss MB':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for pattern in args.patterns.split(","):
+            cmd = [sys.executable, __file__, "--scenario", f"{size}:{pattern}",
+                   "--iterations", str(args.iterations), "--burst", str(args.burst), "--duration", str(args.duration)]
+            r = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+            results.append(r)
+            print(f"{pattern:<9} {size:>9} {r['latency_ms']['p50']:>8.2f} {r['latency_ms']['p99']:>8.2f} "
+                  f"{r['updates_per_s']:>8.1f} {r['wire_bytes_per_update']:>11.0f} "
+                  f"{r['pasted']:>3}/{r['copies']:<3} {r['peak_rss_kb'] / 1024:>7.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"timestamp": time.time(), "python": platform.python_version(),
+                   "machine": platform.machine(), "args": vars(args), "results": results}, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
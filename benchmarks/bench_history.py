@@ -0,0 +1,115 @@
+"""
+Clipboard history benchmark.
+
+Fills a history log with --entries texts of mixed sizes, then, in a fresh
+subprocess so memory is its own, reports how long opening the log takes,
+how much RSS the index adds, and the latency of fetch-by-id, recent(),
+prefix search and substring search.
+
+    python benchmarks/bench_history.py [--entries 100000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+WORDS = "alpha beta gamma delta epsilon zeta theta kappa lambda sigma omega".split()
+
+
+def make_text(rng, i):
+    size = rng.choice((40, 200, 1000, 5000))
+    words = " ".join(rng.choice(WORDS) for _ in range(size // 6))
+    return f"entry {i} {words}"
+
+
+def fill(path, entries):
+    from history import ClipboardHistory
+    rng = random.Random(1)
+    history = ClipboardHistory(path, max_entries=entries, max_bytes=1 << 40)
+    started = time.perf_counter()
+    for i in range(entries):
+        history.add(make_text(rng, i), source="local" if i % 2 else "phone")
+    elapsed = time.perf_counter() - started
+    history.close()
+    return entries / elapsed
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def rss_kb():
+    """Current RSS from /proc (Linux), falling back to the peak."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(path, entries):
+    rss_before = rss_kb()
+    import history as history_module  # noqa: F401 (imported before timing the open)
+    started = time.perf_counter()
+    history = history_module.ClipboardHistory(path, max_entries=entries, max_bytes=1 << 40)
+    load_ms = (time.perf_counter() - started) * 1000
+    rss_after = rss_kb()
+    ids = random.Random(2).sample(range(1, entries + 1), 100)
+    return {
+        "entries": len(history),
+        "log_mb": history.size() / 1024 / 1024,
+        "load_ms": load_ms,
+        "index_rss_mb": (rss_after - rss_before) / 1024,
+        "get_ms": timed(lambda: [history.get(i) for i in ids]) / len(ids),
+        "recent_ms": timed(lambda: history.recent(20)),
+        "prefix_ms": timed(lambda: history.search(f"entry {entries // 2} ", prefix=True)),
+        "substring_ms": timed(lambda: history.search("omega omega omega")),
+        "substring_rare_ms": timed(lambda: history.search(f"entry {entries // 3} ")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.entries)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.log")
+        rate = fill(path, args.entries)
+        cmd = [sys.executable, __file__, "--entries", str(args.entries), "--measure", path]
+        r = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+    print(f"entries           {r['entries']:>10}")
+    print(f"log size          {r['log_mb']:>10.1f} MB")
+    print(f"add               {rate:>10.0f} /s")
+    print(f"open (load index) {r['load_ms']:>10.1f} ms")
+    print(f"index RSS         {r['index_rss_mb']:>10.1f} MB")
+    print(f"get by id         {r['get_ms']:>10.3f} ms")
+    print(f"recent(20)        {r['recent_ms']:>10.3f} ms")
+    print(f"prefix search     {r['prefix_ms']:>10.1f} ms")
+    print(f"substring (many)  {r['substring_ms']:>10.1f} ms")
+    print(f"substring (one)   {r['substring_rare_ms']:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Sync pipeline benchmark.
+
+Times every stage of the send path on its own for clipboard texts of
+several sizes, then sends a burst of updates through the sender's threaded
+pipeline and through the same stages run one after another, with a
+transport that discards the frames, to show how much the stages overlap.
+
+    python benchmarks/bench_pipeline.py [--updates 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from bench_compression import sample_log
+
+SIZES = [1_000, 64_000, 1_000_000]
+
+
+class NullTransport:
+    """A transport that accepts every frame and sends nothing."""
+
+    def __init__(self, peer, **options):
+        self.name = f"{peer[0]}:{peer[1]}"
+        self.base = None
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=2.0):
+        pass
+
+    def enqueue(self, envelope):
+        self.sent += 1
+
+    def pending(self):
+        return 0
+
+
+def make_sender(queue_size=16):
+    from sender import ClipboardSender
+    return ClipboardSender([("127.0.0.1", 5000)], os.urandom(32), queue_size, origin="bench", transport=NullTransport)
+
+
+def stage_times(text, repeat):
+    """Median milliseconds per stage for one text, each stage fed the previous stage's output."""
+    from sender import Update
+    from sync_service import SyncService
+    from clipboard_detect import ChangeDetector, FakeClipboard
+    sender = make_sender()
+    service = SyncService(ChangeDetector(FakeClipboard()))
+    stages = service.pipeline.stages + sender.pipeline.stages
+    samples = {stage.name: [] for stage in stages}
+    for _ in range(repeat):
+        item = text
+        for stage in stages:
+            if stage.name == "delta":
+                item = Update(item, 1, time.monotonic())
+            started = time.perf_counter()
+            item = stage.fn(item)
+            samples[stage.name].append((time.perf_counter() - started) * 1000)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def throughput(texts, pipelined):
+    """Updates per second through the sender, with its stage threads or inline."""
+    from sender import Update
+    # Queues as long as the burst, so no update is superseded and both runs frame all of them.
+    sender = make_sender(len(texts))
+    started = time.perf_counter()
+    if pipelined:
+        sender.start()
+        started = time.perf_counter()
+        for i, text in enumerate(texts):
+            sender.send(text, i + 1)
+        sender.pipeline.wait_idle()
+    else:
+        for i, text in enumerate(texts):
+            sender.pipeline.process(Update(text, i + 1, time.monotonic()))
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    return len(texts) / elapsed, sender.sent
+
+
+def latency(text, pipelined, repeat):
+    """Median milliseconds from send() until one update is framed, with nothing else queued."""
+    from sender import Update
+    sender = make_sender()
+    if pipelined:
+        sender.start()
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        if pipelined:
+            sender.send(f"{i} {text}", i + 1)
+            sender.pipeline.wait_idle()
+        else:
+            sender.pipeline.process(Update(f"{i} {text}", i + 1, time.monotonic()))
+        samples.append((time.perf_counter() - started) * 1000)
+    sender.stop()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = {size: sample_log(size) for size in SIZES}
+    results = {size: stage_times(text, args.repeat) for size, text in texts.items()}
+    print(f"{'stage (ms)':<12}" + "".join(f"{size:>12,}" for size in SIZES))
+    for name in results[SIZES[0]]:
+        print(f"{name:<12}" + "".join(f"{results[size][name]:>12.3f}" for size in SIZES))
+
+    print(f"\n{'latency (ms)':<12}" + "".join(f"{size:>12,}" for size in SIZES))
+    for label, pipelined in (("inline", False), ("pipelined", True)):
+        print(f"{label:<12}" + "".join(f"{latency(texts[size], pipelined, args.repeat):>12.3f}" for size in SIZES))
+
+    burst = [f"{i} {texts[64_000]}" for i in range(args.updates)]
+    print(f"\n{args.updates} updates of 64 kB:")
+    for label, pipelined in (("inline", False), ("pipelined", True)):
+        rate, sent = throughput(burst, pipelined)
+        print(f"  {label:<10} {rate:>8.0f} updates/s ({sent} framed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Load-test the asyncio receiver against the old Flask development server.
+
+Both servers run in their own process on loopback with a no-op clipboard
+backend and real decryption. The Flask baseline mirrors the previous
+receive.py (threaded app.run(), JSON body, base64 ciphertext) and needs
+`pip install flask`.
+
+With --overload, the asyncio receiver is flooded with large binary frames
+instead, once with its default admission limits and once with them lifted,
+and the server's peak RSS is reported next to how many requests were
+accepted or pushed back (429/503) or failed.
+
+    python benchmarks/bench_receivers.py [--requests 2000] [--concurrency 16]
+    python benchmarks/bench_receivers.py --overload [--flood-size 4000000] [--concurrency 64]
+"""
+import argparse
+import base64
+import collections
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from codec import decode_text, encode_text
+from wire import frame_aad
+
+KEY = base64.b64decode("dGhpcy1pcy1hLXNlY3JldC1rZXktZm9yLWFlcy1rZXk=")
+CONFIG = {"aes_key": base64.b64encode(KEY).decode(), "device_id": "bench-receiver"}
+ORIGIN = "bench-sender"
+AAD = frame_aad(0, 0, ORIGIN)
+
+
+def serve_flask(port):
+    import logging
+    from flask import Flask, request, jsonify
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = Flask(__name__)
+
+    @app.route('/clipboard', methods=['POST'])
+    def clipboard():
+        data = request.get_json()
+        if not data or 'data' not in data:
+            return jsonify({"error": "Missing 'data' field"}), 400
+        decode_text(data['data'], KEY, AAD)
+        return jsonify({"status": "success"}), 200
+
+    app.run(host='127.0.0.1', port=port)
+
+
+def serve_async(port, unbounded=False):
+    import receiver
+    config = dict(CONFIG, local_port=port)
+    if unbounded:
+        receiver.SPILL_SIZE = 1 << 40
+        config.update(max_body_size=1 << 40, max_pending_requests=1 << 20, max_pending_bytes=1 << 40)
+    receiver.run_receiver(config, lambda text: None, host='127.0.0.1', state_path=None, history_path=None)
+
+
+def peak_rss_kb(pid):
+    """Return a process's peak RSS from /proc (Linux only), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port):
+    """Start a server subprocess; return (process, seconds until it accepts connections)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, __file__, "--serve", kind, "--port", str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc, time.perf_counter() - start
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{kind} server exited early")
+            time.sleep(0.005)
+
+
+def run_load(url, payload, total, concurrency):
+    import requests
+    latencies = []
+    lock = threading.Lock()
+    per_worker = total // concurrency
+
+    def worker():
+        session = requests.Session()
+        local = []
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            response = session.post(url, json=payload)
+            local.append(time.perf_counter() - start)
+            assert response.ok, response.text
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return latencies, len(latencies) / elapsed
+
+
+def run_flood(url, body, total, concurrency):
+    """Post `total` copies of `body` from `concurrency` threads; return a Counter of outcomes."""
+    import requests
+    outcomes = collections.Counter()
+    lock = threading.Lock()
+    per_worker = total // concurrency
+
+    def worker():
+        session = requests.Session()
+        for _ in range(per_worker):
+            try:
+                outcome = session.post(url, data=body, headers={"Content-Type": "application/octet-stream"}).status_code
+            except requests.RequestException:
+                outcome = "error"
+            with lock:
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes
+
+
+def overload(args):
+    from wire import seal_text
+    body = seal_text(base64.b64encode(os.urandom(args.flood_size * 3 // 4)).decode(), KEY, 0, ORIGIN)
+    print(f"{'limits':<9} {'peak rss MB':>11} {'accepted':>9} {'429':>6} {'503':>6} {'other':>6} {'s':>6}")
+    for kind in ("async", "unbounded"):
+        port = free_port()
+        proc, _ = start_server(kind, port)
+        try:
+            start = time.perf_counter()
+            outcomes = run_flood(f"http://127.0.0.1:{port}/clipboard/bin", body, args.requests, args.concurrency)
+            elapsed = time.perf_counter() - start
+            rss = peak_rss_kb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait()
+        accepted = outcomes.pop(202, 0) + outcomes.pop(200, 0)
+        busy, unavailable = outcomes.pop(429, 0), outcomes.pop(503, 0)
+        print(f"{'default' if kind == 'async' else 'none':<9} {rss / 1024 if rss else float('nan'):>11.1f} "
+              f"{accepted:>9} {busy:>6} {unavailable:>6} {sum(outcomes.values()):>6} {elapsed:>6.1f}")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", choices=["flask", "async", "unbounded"])
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size", type=int, default=1000, help="clipboard text size in characters")
+    parser.add_argument("--overload", action="store_true", help="flood the asyncio receiver with large bodies")
+    parser.add_argument("--flood-size", type=int, default=4_000_000, help="clipboard text size in --overload")
+    args = parser.parse_args()
+
+    if args.serve == "flask":
+        serve_flask(args.port)
+        return
+    if args.serve:
+        serve_async(args.port, unbounded=args.serve == "unbounded")
+        return
+    if args.overload:
+        overload(args)
+        return
+
+    payload = {"data": encode_text("x" * args.size, KEY, compress=False, aad=AAD), "origin": ORIGIN}
+    print(f"{'server':<7} {'startup ms':>10} {'seq p50 ms':>10} {'seq p99 ms':>10} {'conc p50 ms':>11} {'conc p99 ms':>11} {'req/s':>8}")
+    for kind in ("flask", "async"):
+        port = free_port()
+        proc, startup = start_server(kind, port)
+        try:
+            url = f"http://127.0.0.1:{port}/clipboard"
+            sequential, _ = run_load(url, payload, min(500, args.requests), 1)
+            concurrent, throughput = run_load(url, payload, args.requests, args.concurrency)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"{kind:<7} {startup * 1000:>10.1f} "
+              f"{statistics.median(sequential) * 1000:>10.2f} {percentile(sequential, 99) * 1000:>10.2f} "
+              f"{statistics.median(concurrent) * 1000:>11.2f} {percentile(concurrent, 99) * 1000:>11.2f} "
+              f"{throughput:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
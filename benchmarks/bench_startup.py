@@ -0,0 +1,112 @@
+"""
+Startup benchmark for the clipboard sync daemon.
+
+Every mode runs in a fresh subprocess and reports how long the imports
+took, the time from process start until the service reported "started",
+peak RSS and which heavy modules ended up loaded:
+
+  headless   daemon without peers, as on a device that only receives
+  peers      daemon with a configured (unreachable) peer, loading the sender
+  ui         floating Kivy UI attached to the daemon (skipped without Kivy)
+
+    python benchmarks/bench_startup.py [--modes headless,peers,ui] [--repeat 5]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+START = time.perf_counter()
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'android'))
+
+MODES = ("headless", "peers", "ui")
+HEAVY_MODULES = ("requests", "urllib3", "kivy", "Crypto")
+
+
+def run_mode(mode):
+    config = None
+    if mode == "peers":
+        config = {"aes_key": base64.b64encode(os.urandom(32)).decode(), "peers": [{"ip": "192.0.2.1", "port": 5000}],
+                  "discovery": False}
+
+    if mode == "ui":
+        try:
+            import kivy  # noqa: F401
+        except ImportError:
+            return {"mode": mode, "skipped": "Kivy is not installed"}
+        from kivy.clock import Clock
+        from floating_ui import ClipSyncFloatingApp
+        from sync_service import create_service
+        from clipboard_detect import FakeClipboard
+    else:
+        from sync_service import create_service
+        from clipboard_detect import FakeClipboard
+    imported = time.perf_counter()
+
+    started = threading.Event()
+    service = create_service(config, FakeClipboard(), state_path=None, history_path=None,
+                             on_status=lambda status: status["event"] == "started" and started.set())
+    if mode == "ui":
+        app = ClipSyncFloatingApp(service)
+
+        def start(dt):
+            # The widget takes over on_status, so wait for the service directly.
+            app.floating_widget.start_monitoring()
+            while not service.running:
+                time.sleep(0.001)
+            started.set()
+            app.stop()
+
+        # Runs on the first frame, once the window is up.
+        Clock.schedule_once(start, 0)
+        app.run()
+    else:
+        service.start()
+        started.wait(30)
+    ready = time.perf_counter()
+    service.stop()
+
+    return {
+        "mode": mode,
+        "import_ms": (imported - START) * 1000,
+        "ready_ms": (ready - START) * 1000,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode)))
+        return
+
+    print(f"{'mode':<9} {'import ms':>10} {'ready ms':>9} {'rss MB':>7}  loaded")
+    for mode in args.modes.split(","):
+        runs = []
+        for _ in range(args.repeat):
+            cmd = [sys.executable, __file__, "--mode", mode]
+            runs.append(json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.splitlines()[-1]))
+        if "skipped" in runs[0]:
+            print(f"{mode:<9} skipped: {runs[0]['skipped']}")
+            continue
+        print(f"{mode:<9} {statistics.median(r['import_ms'] for r in runs):>10.1f} "
+              f"{statistics.median(r['ready_ms'] for r in runs):>9.1f} "
+              f"{statistics.median(r['peak_rss_kb'] for r in runs) / 1024:>7.1f}  {', '.join(runs[0]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
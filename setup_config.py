@@ -6,7 +6,8 @@ import ipaddress
 import getpass
 import logging
 import platform
-from typing import Any, Dict, Optional, Callable
+import time
+from typing import Any, Dict, List, Optional, Callable, Tuple
 
 CONFIG_PATH = os.path.join("shared", "config.json")
 
@@ -29,6 +30,30 @@ def is_valid_ip(ip: str) -> bool:
     except ValueError:
         return False
 
+def parse_peer(s: str) -> Optional[Tuple[str, int]]:
+    """Parse an "ip:port" peer address, returning None if invalid."""
+    ip, sep, port = s.strip().rpartition(":")
+    if not sep or not is_valid_ip(ip) or not is_valid_port(port):
+        return None
+    return ip, int(port)
+
+def parse_peer_list(s: str) -> List[Tuple[str, int]]:
+    """Parse a comma-separated list of "ip:port" peers, skipping invalid entries."""
+    peers = [parse_peer(p) for p in s.split(",") if p.strip()]
+    return [p for p in peers if p]
+
+def is_valid_peer_list(s: str) -> bool:
+    """Check that the string is a non-empty comma-separated list of "ip:port" peers."""
+    entries = [p for p in s.split(",") if p.strip()]
+    return bool(entries) and all(parse_peer(p) for p in entries)
+
+def format_peer_list(config: Dict[str, Any]) -> Optional[str]:
+    """Format the configured peers (or legacy peer_ip/peer_port) as "ip:port, ..."."""
+    peers = [f"{p['ip']}:{p['port']}" for p in config.get("peers", [])]
+    if not peers and config.get("peer_ip") and config.get("peer_port"):
+        peers.append(f"{config['peer_ip']}:{config['peer_port']}")
+    return ", ".join(peers) or None
+
 def is_valid_base64(s: str) -> bool:
     """Check if the string is valid base64."""
     try:
@@ -91,18 +116,11 @@ def prompt_for_config(existing: Optional[Dict[str, Any]] = None) -> Dict[str, An
         str(existing.get("local_port")) if existing and existing.get("local_port") else None
     )
 
-    peer_ip = prompt_field(
-        "Enter peer IP (e.g., 192.168.0.101)",
-        is_valid_ip,
-        "❌ Invalid IP address format.",
-        existing.get("peer_ip") if existing and existing.get("peer_ip") else None
-    )
-
-    peer_port = prompt_field(
-        "Enter peer port (1–65535)",
-        is_valid_port,
-        "❌ Invalid port. Please enter a number between 1 and 65535.",
-        str(existing.get("peer_port")) if existing and existing.get("peer_port") else None
+    peers = prompt_field(
+        "Enter peers as ip:port, comma-separated, or leave empty to discover them on the LAN",
+        lambda s: not s or is_valid_peer_list(s),
+        "❌ Invalid peer list. Use ip:port entries with ports between 1 and 65535, separated by commas.",
+        format_peer_list(existing) if existing else None
     )
 
     def valid_aes_key(s: str) -> bool:
@@ -116,40 +134,44 @@ def prompt_for_config(existing: Optional[Dict[str, Any]] = None) -> Dict[str, An
         is_secret=True
     )
 
-    def valid_iv(s: str) -> bool:
-        return is_valid_base64(s) and decoded_length(s) == 16
-
-    iv = prompt_field(
-        "Enter IV (base64-encoded, 16 bytes)",
-        valid_iv,
-        "❌ Invalid IV. Must be base64-encoded and 16 bytes after decoding.",
-        existing.get("iv") if existing and existing.get("iv") else None,
-        is_secret=True
-    )
-
     return {
         "local_port": int(local_port),
-        "peer_ip": peer_ip,
-        "peer_port": int(peer_port),
-        "aes_key": aes_key,
-        "iv": iv
+        "peers": [{"ip": ip, "port": port} for ip, port in parse_peer_list(peers)],
+        "aes_key": aes_key
     }
 
+def merge_config(existing: Optional[Dict[str, Any]], config: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Keep the existing settings the prompts do not cover, and record a
+    changed key as a rotation so running devices accept both for a while.
+    """
+    merged = {k: v for k, v in (existing or {}).items() if k not in ("peer_ip", "peer_port")}
+    merged.update(config)
+    old_key = existing.get("aes_key") if existing else None
+    if old_key and old_key != config["aes_key"]:
+        merged["previous_aes_key"] = old_key
+        merged["key_rotated_at"] = time.time() if now is None else now
+    return merged
+
 def save_config(config: Dict[str, Any], path: str = CONFIG_PATH) -> None:
     """Save the configuration to a JSON file, setting secure permissions."""
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written next to the config and swapped in, so running watchers and
+    # receivers never read a half-written file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
     try:
-        with open(path, "w") as f:
+        with open(tmp_path, "w") as f:
             json.dump(config, f, indent=4)
 
         # Set file permissions to owner read/write only (Unix)
         if platform.system() != "Windows":
             try:
-                os.chmod(path, 0o600)
+                os.chmod(tmp_path, 0o600)
             except Exception as e:
                 logging.warning(f"Could not set file permissions for {path}: {e}")
         else:
             logging.info("Running on Windows: skipping file permission setting")
+        os.replace(tmp_path, path)
 
         logging.info(f"Configuration saved successfully to {path}")
         print(f"\n✅ Configuration saved successfully to {path}")
@@ -170,15 +192,13 @@ def main() -> None:
             print("❌ Aborted.")
             sys.exit(0)
 
-    config = prompt_for_config(existing)
+    config = merge_config(existing, prompt_for_config(existing))
 
-    # Show preview without sensitive fields, but with key/IV lengths
+    # Show preview without sensitive fields, but with the key length
     print("\n🔍 Preview of configuration:")
     safe_config = {}
     for k, v in config.items():
-        if k == "aes_key":
-            safe_config[k] = f"*** (base64, {decoded_length(v)} bytes)"
-        elif k == "iv":
+        if k in ("aes_key", "previous_aes_key"):
             safe_config[k] = f"*** (base64, {decoded_length(v)} bytes)"
         else:
             safe_config[k] = v
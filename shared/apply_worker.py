@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from metrics import STAGE_SECONDS, UPDATES
+
+logger = logging.getLogger(__name__)
+
+# (before_apply, on_applied, on_failed) of one submitted update
+Callbacks = Tuple[Optional[Callable[[], None]], Optional[Callable[[], None]], Optional[Callable[[], None]]]
+
+
+class ClipboardApplyWorker:
+    """
+    Applies clipboard updates on one long-lived background thread.
+
+    submit() only stores the update in a single latest-wins slot and returns,
+    so a burst of updates costs one clipboard write for whatever is newest
+    when the worker gets to it; the updates in between are counted in
+    `coalesced` and never written. `before_apply` runs right before the
+    write, so anything watching the clipboard can already recognise the
+    text; `on_failed` runs if the write raises, and `on_applied` after it
+    succeeds.
+    """
+
+    def __init__(self, apply_fn: Callable[[str], None]):
+        self.apply_fn = apply_fn
+        self.applied = 0
+        self.coalesced = 0
+        self.failed = 0
+
+        self._slot: Optional[Tuple[str, Callbacks, float]] = None
+        self._cond = threading.Condition()
+        self._busy = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="clipsync-apply", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        text: str,
+        on_applied: Optional[Callable[[], None]] = None,
+        before_apply: Optional[Callable[[], None]] = None,
+        on_failed: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Queue text to be written, replacing any update not yet applied."""
+        with self._cond:
+            if self._slot is not None:
+                self.coalesced += 1
+                UPDATES.inc(stage="apply", result="coalesced")
+            self._slot = (text, (before_apply, on_applied, on_failed), time.monotonic())
+            self._cond.notify()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no update is pending or being applied."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._slot is None and not self._busy, timeout)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._slot is not None or self._stopped)
+                if self._stopped:
+                    return
+                text, (before_apply, on_applied, on_failed), submitted_at = self._slot
+                self._slot = None
+                self._busy = True
+            started = time.monotonic()
+            STAGE_SECONDS.observe(started - submitted_at, stage="apply_queue")
+            try:
+                if before_apply:
+                    before_apply()
+                try:
+                    self.apply_fn(text)
+                except Exception:
+                    if on_failed:
+                        on_failed()
+                    raise
+                STAGE_SECONDS.observe(time.monotonic() - started, stage="apply")
+                if on_applied:
+                    on_applied()
+                self.applied += 1
+                UPDATES.inc(stage="apply", result="ok")
+            except Exception as e:
+                self.failed += 1
+                UPDATES.inc(stage="apply", result="failed")
+                logger.error("Clipboard update failed: %s", e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,214 @@
+import hashlib
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from metrics import STAGE_SECONDS
+
+
+def digest(text: str) -> bytes:
+    """Return a short content digest used to compare clipboard states."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class ClipboardBackend:
+    """
+    Access to a clipboard: watchers read() it and receivers write() to it.
+
+    Backends that can report a cheap change counter override change_token(),
+    and backends that can push change notifications override set_listener().
+    """
+
+    def read(self) -> str:
+        raise NotImplementedError
+
+    def write(self, text: str) -> None:
+        raise NotImplementedError
+
+    def change_token(self) -> Optional[int]:
+        """Return a value that changes whenever the clipboard does, or None."""
+        return None
+
+    def set_listener(self, callback: Callable[[], None]) -> bool:
+        """Register a change callback. Returns False if unsupported."""
+        return False
+
+
+class PyperclipBackend(ClipboardBackend):
+    """Plain polling backend built on pyperclip."""
+
+    def __init__(self):
+        import pyperclip
+        self._paste = pyperclip.paste
+        self._copy = pyperclip.copy
+
+    def read(self) -> str:
+        return self._paste() or ""
+
+    def write(self, text: str) -> None:
+        self._copy(text)
+
+
+class WindowsSequenceBackend(PyperclipBackend):
+    """Uses GetClipboardSequenceNumber so unchanged clipboards are never read."""
+
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        self._sequence = ctypes.windll.user32.GetClipboardSequenceNumber
+
+    def change_token(self) -> Optional[int]:
+        return self._sequence()
+
+
+class KivyBackend(ClipboardBackend):
+    """Polling backend built on kivy.core.clipboard."""
+
+    def __init__(self):
+        from kivy.core.clipboard import Clipboard
+        self._clipboard = Clipboard
+
+    def read(self) -> str:
+        return self._clipboard.paste() or ""
+
+    def write(self, text: str) -> None:
+        self._clipboard.copy(text)
+
+
+class TermuxBackend(ClipboardBackend):
+    """Polling backend built on the Termux:API clipboard commands."""
+
+    def read(self) -> str:
+        return subprocess.run(["termux-clipboard-get"], capture_output=True, check=True).stdout.decode("utf-8")
+
+    def write(self, text: str) -> None:
+        subprocess.run(["termux-clipboard-set"], input=text.encode("utf-8"), check=True)
+
+
+class FakeClipboard(ClipboardBackend):
+    """In-memory clipboard for tests, with a sequence counter and listeners."""
+
+    def __init__(self, text: str = "", sequenced: bool = True):
+        self.text = text
+        self.sequence = 0
+        self.reads = 0
+        self.sequenced = sequenced
+        self._listener: Optional[Callable[[], None]] = None
+
+    def copy(self, text: str) -> None:
+        self.text = text
+        self.sequence += 1
+        if self._listener:
+            self._listener()
+
+    def read(self) -> str:
+        self.reads += 1
+        return self.text
+
+    def write(self, text: str) -> None:
+        self.copy(text)
+
+    def change_token(self) -> Optional[int]:
+        return self.sequence if self.sequenced else None
+
+    def set_listener(self, callback: Callable[[], None]) -> bool:
+        self._listener = callback
+        return True
+
+
+def create_backend() -> ClipboardBackend:
+    """Pick the lowest-latency backend available on this platform."""
+    if sys.platform == "win32":
+        try:
+            return WindowsSequenceBackend()
+        except (ImportError, AttributeError, OSError):
+            pass
+    return PyperclipBackend()
+
+
+class ChangeDetector:
+    """
+    Detects clipboard changes by digest with an adaptive polling interval.
+
+    The interval drops to min_interval right after a change and grows by
+    `backoff` on every idle check up to max_interval. Backends with a change
+    token are checked at min_interval all the time, because checking the
+    token is far cheaper than reading the clipboard. Backends with
+    notifications wake the detector immediately.
+    """
+
+    def __init__(
+        self,
+        backend: ClipboardBackend,
+        min_interval: float = 0.05,
+        max_interval: float = 1.0,
+        backoff: float = 1.5,
+    ):
+        self.backend = backend
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+
+        self._last_digest: Optional[bytes] = None
+        self._last_token: Optional[int] = None
+        self._wake = threading.Event()
+        self.on_notify: Optional[Callable[[], None]] = None
+        self.notifying = backend.set_listener(self.notify)
+
+    def prime(self) -> None:
+        """Record the current clipboard as already seen."""
+        self._last_token = self.backend.change_token()
+        self._last_digest = digest(self.backend.read())
+
+    def notify(self) -> None:
+        """Wake the detector; safe to call from any thread."""
+        self._wake.set()
+        if self.on_notify:
+            self.on_notify()
+
+    def poll(self) -> Optional[str]:
+        """Return the clipboard text if it changed since the last poll."""
+        started = time.perf_counter()
+        token = self.backend.change_token()
+        if token is not None and token == self._last_token:
+            self._idle()
+            return None
+        self._last_token = token
+
+        text = self.backend.read()
+        current = digest(text)
+        if current == self._last_digest:
+            self._idle()
+            return None
+
+        self._last_digest = current
+        self.interval = self.min_interval
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="detect")
+        return text
+
+    def next_interval(self) -> float:
+        """Return how long to wait before the next poll."""
+        return self.interval
+
+    def wait(self) -> None:
+        """Sleep until the next poll is due or a notification arrives."""
+        self._wake.wait(self.interval)
+        self._wake.clear()
+
+    def watch(self, stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yield clipboard text on every change until `stop` is set."""
+        while stop is None or not stop.is_set():
+            text = self.poll()
+            if text is not None:
+                yield text
+            self.wait()
+
+    def _idle(self) -> None:
+        if self._last_token is not None:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
@@ -0,0 +1,172 @@
+import base64
+import math
+import os
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from Crypto.Cipher import AES
+
+T = TypeVar("T")
+
+# Every encrypted clipboard body, whichever route or frame carries it, is an
+# envelope:
+#
+#   version u8 | flags u8 | nonce (12) | AES-GCM ciphertext | tag (16)
+#
+# The version and flags bytes are authenticated along with the ciphertext and
+# every envelope gets a fresh random nonce. Callers can bind more context as
+# associated data (`aad`), which must match when the envelope is opened; the
+# wire format binds each frame's flags, seq and origin this way, so a body
+# cannot be replayed under a rewritten header. Any other version, including
+# the unauthenticated AES-CBC of version 1, is rejected.
+FORMAT_GCM = 2
+FORMAT_VERSION = FORMAT_GCM
+HEADER_SIZE = 2
+NONCE_SIZE = 12
+TAG_SIZE = 16
+FLAG_ZLIB = 0x01
+
+COMPRESS_MIN_SIZE = 512      # smaller payloads never shrink enough to pay off
+ENTROPY_SAMPLE_SIZE = 4096   # bytes sampled when estimating compressibility
+MAX_ENTROPY = 7.0            # bits/byte above which data is treated as incompressible
+# Compression dominates encoding time; level 1 takes about a quarter of the
+# time of level 6 for about a third more bytes (benchmarks/bench_pipeline.py).
+COMPRESS_LEVEL = 1
+
+
+def estimate_entropy(data: bytes) -> float:
+    """Return the Shannon entropy of `data` in bits per byte."""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(n / total * math.log2(n / total) for n in Counter(data).values())
+
+
+def should_compress(data: bytes) -> bool:
+    """Decide from size and a sampled entropy estimate whether to compress."""
+    if len(data) < COMPRESS_MIN_SIZE:
+        return False
+    return estimate_entropy(data[:ENTROPY_SAMPLE_SIZE]) <= MAX_ENTROPY
+
+
+def compress_payload(data: bytes, compress: Optional[bool] = None) -> Tuple[int, bytes]:
+    """Return (flags, body), compressing when it helps or when forced."""
+    if compress is None:
+        compress = should_compress(data)
+    if compress:
+        compressed = zlib.compress(data, COMPRESS_LEVEL)
+        if len(compressed) < len(data):
+            return FLAG_ZLIB, compressed
+    return 0, data
+
+
+def decompress_payload(flags: int, body: bytes) -> bytes:
+    """Undo compress_payload() according to the header flags."""
+    if flags & FLAG_ZLIB:
+        return zlib.decompress(body)
+    return body
+
+
+class KeyContext:
+    """
+    Everything derived from one key, built once and shared by all calls.
+
+    pycryptodome has no GCM object that can be reused across nonces, so the
+    context holds the validated key; callers look it up once per key instead
+    of checking it on every message.
+    """
+
+    def __init__(self, key: bytes):
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"Invalid AES key length: {len(key)} bytes")
+        self.key = bytes(key)
+
+    def seal(self, data: bytes, compress: Optional[bool] = None, aad: bytes = b"") -> bytes:
+        flags, body = compress_payload(data, compress)
+        return self.encrypt(flags, body, aad)
+
+    def encrypt(self, flags: int, body: bytes, aad: bytes = b"") -> bytes:
+        """Seal a body that compress_payload() already produced."""
+        header = bytes((FORMAT_GCM, flags))
+        nonce = os.urandom(NONCE_SIZE)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header + aad)
+        ciphertext, tag = cipher.encrypt_and_digest(body)
+        return header + nonce + ciphertext + tag
+
+    def open(self, raw: bytes, aad: bytes = b"") -> bytes:
+        if len(raw) < HEADER_SIZE:
+            raise ValueError("Payload too short")
+        version, flags = raw[0], raw[1]
+        if version != FORMAT_GCM:
+            raise ValueError(f"Unsupported payload version: {version}")
+        if len(raw) < HEADER_SIZE + NONCE_SIZE + TAG_SIZE:
+            raise ValueError("Payload too short")
+        view = memoryview(raw)
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=view[HEADER_SIZE:HEADER_SIZE + NONCE_SIZE])
+        cipher.update(bytes(view[:HEADER_SIZE]) + aad)
+        body = cipher.decrypt_and_verify(view[HEADER_SIZE + NONCE_SIZE:-TAG_SIZE], view[-TAG_SIZE:])
+        try:
+            return decompress_payload(flags, body)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt payload: {e}")
+
+
+@lru_cache(maxsize=8)
+def key_context(key: bytes) -> KeyContext:
+    """Return the shared context for `key`."""
+    return KeyContext(key)
+
+
+def try_keys(fn: Callable[[bytes], T], keys: Sequence[bytes]) -> Tuple[T, bytes]:
+    """
+    Call `fn` with each key until one does not raise ValueError; returns (result, key).
+
+    Used while a key rotation settles, when a message may be sealed under
+    either key. GCM rejects a wrong key from the tag alone, so each miss
+    costs one pass over the ciphertext. Raises the first key's error if no
+    key works.
+    """
+    error: Optional[ValueError] = None
+    for key in keys:
+        try:
+            return fn(key), key
+        except ValueError as e:
+            error = error or e
+    raise error or ValueError("No key to open the message with")
+
+
+def encode(data: bytes, key: bytes, compress: Optional[bool] = None, aad: bytes = b"") -> bytes:
+    """Encrypt raw bytes into an envelope."""
+    return key_context(key).seal(data, compress, aad)
+
+
+def decode(raw: bytes, key: bytes, aad: bytes = b"") -> bytes:
+    """Decrypt an envelope, raising ValueError if it is malformed, was tampered with or `aad` differs."""
+    return key_context(key).open(raw, aad)
+
+
+def encode_many(items: Iterable[bytes], key: bytes, compress: Optional[bool] = None) -> List[bytes]:
+    """Encrypt several payloads with one key lookup, e.g. when draining a queue."""
+    context = key_context(key)
+    return [context.seal(data, compress) for data in items]
+
+
+def decode_many(raws: Iterable[bytes], key: bytes, aads: Optional[Iterable[bytes]] = None) -> List[bytes]:
+    """Decrypt several envelopes, each with its own associated data if given, raising ValueError if any is bad."""
+    context = key_context(key)
+    if aads is None:
+        return [context.open(raw) for raw in raws]
+    return [context.open(raw, aad) for raw, aad in zip(raws, aads)]
+
+
+def encode_text(text: str, key: bytes, compress: Optional[bool] = None, aad: bytes = b"") -> str:
+    """Encrypt text into a base64 envelope for the JSON route."""
+    return base64.b64encode(encode(text.encode("utf-8"), key, compress, aad)).decode()
+
+
+def decode_text(encoded: str, key: bytes, aad: bytes = b"") -> str:
+    """Reverse encode_text()."""
+    return decode(base64.b64decode(encoded), key, aad).decode("utf-8")
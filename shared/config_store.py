@@ -0,0 +1,172 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+CHECK_INTERVAL = 1.0
+# After a key rotation the previous key is still accepted for this long, and
+# used to seal updates for the first half of it, so devices rotated within
+# half the window of each other never see an update they cannot open.
+KEY_GRACE_SECONDS = 600.0
+
+
+def load_config(path: str = CONFIG_PATH) -> Optional[Dict[str, Any]]:
+    """Load shared/config.json, returning None if it is missing or invalid."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load config from %s: %s", path, e)
+        return None
+
+
+class Settings(NamedTuple):
+    """
+    One parsed config and the key material derived from it.
+
+    `key` seals outgoing updates and `keys` are all keys incoming updates are
+    opened with, most likely first; both are None and empty without an
+    `aes_key`.
+    """
+    config: Dict[str, Any]
+    key: Optional[bytes]
+    keys: Tuple[bytes, ...]
+
+
+class ConfigStore:
+    """
+    Cached config that follows changes to its file without a restart.
+
+    The file is parsed once and re-read only when it is replaced or its
+    modification time or size changes; every change produces a new
+    Settings, swapped in as a whole, so readers always see one consistent
+    config. A file that cannot be parsed, e.g. one caught halfway through
+    being written, is ignored and the last good settings stay in place.
+
+    When `aes_key` changes, the previous key is kept for `key_grace_seconds`
+    (KEY_GRACE_SECONDS by default). setup_config.py records it as
+    `previous_aes_key` with `key_rotated_at`, so processes started during the
+    window know it too; a key edited by hand is rotated from the moment the
+    change was seen. Subscribers are called with the new Settings after
+    every change, including the end of each half of the window, from the
+    thread that called check().
+    """
+
+    def __init__(self, path: str = CONFIG_PATH, interval: float = CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.settings: Optional[Settings] = None
+        self.reloads = 0
+
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._config: Optional[Dict[str, Any]] = None
+        # (previous key, rotation time) of a rotation not recorded in the file
+        self._rotation: Optional[Tuple[bytes, float]] = None
+        self._subscribers: List[Callable[[Settings], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.check()
+
+    @property
+    def config(self) -> Optional[Dict[str, Any]]:
+        return self.settings.config if self.settings else None
+
+    def subscribe(self, callback: Callable[[Settings], None]) -> None:
+        self._subscribers.append(callback)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clipsync-config", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def check(self, now: Optional[float] = None) -> bool:
+        """Reload the file if it changed and re-derive the keys; returns True if the settings changed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._reload(now)
+            if self._config is None:
+                return False
+            settings = self._derive(self._config, now)
+            if settings == self.settings:
+                return False
+            self.settings = settings
+        self.reloads += 1
+        for callback in list(self._subscribers):
+            try:
+                callback(settings)
+            except Exception as e:
+                logger.error("Config subscriber failed: %s", e)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def _reload(self, now: float) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        # The inode changes when the file is replaced, even within one mtime tick.
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        config = load_config(self.path)
+        if not isinstance(config, dict):
+            return
+        self._signature = signature
+        old = _decode_key(self._config.get("aes_key")) if self._config else None
+        try:
+            key = _decode_key(config.get("aes_key"))
+        except ValueError as e:
+            logger.warning("Ignoring config with an invalid aes_key: %s", e)
+            return
+        if self._config is not None:
+            logger.info("Reloaded config from %s", self.path)
+        if old and key != old:
+            # A rotation recorded in the file wins; a key edited by hand rotates now.
+            self._rotation = None if config.get("previous_aes_key") else (old, now)
+        self._config = config
+
+    def _derive(self, config: Dict[str, Any], now: float) -> Settings:
+        key = _decode_key(config.get("aes_key"))
+        if key is None:
+            return Settings(config, None, ())
+        grace = float(config.get("key_grace_seconds", KEY_GRACE_SECONDS))
+        previous, rotated_at = self._rotation or (None, 0.0)
+        if config.get("previous_aes_key"):
+            try:
+                previous, rotated_at = _decode_key(config["previous_aes_key"]), float(config.get("key_rotated_at", 0))
+            except (ValueError, TypeError):
+                previous = None
+        if previous is None or previous == key or now >= rotated_at + grace:
+            return Settings(config, key, (key,))
+        if now < rotated_at + grace / 2:
+            return Settings(config, previous, (previous, key))
+        return Settings(config, key, (key, previous))
+
+
+def _decode_key(value: Any) -> Optional[bytes]:
+    if not value:
+        return None
+    try:
+        key = base64.b64decode(value, validate=True)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid base64 key: {e}")
+    if len(key) not in (16, 24, 32):
+        raise ValueError(f"Invalid AES key length: {len(key)} bytes")
+    return key
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import os
+import string
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".content_cache")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def content_id(text: str, key: bytes) -> str:
+    """
+    Return the ID that large clipboard contents are announced and fetched by.
+
+    The digest is keyed with the sync key, so the IDs that appear in fetch
+    URLs on the LAN reveal nothing about the content to anyone without it.
+    """
+    return bytes_id(text.encode("utf-8", "surrogatepass"), key)
+
+
+def bytes_id(data: bytes, key: bytes) -> str:
+    """Return the content ID of raw bytes, as content_id() does for text."""
+    return hashlib.blake2b(data, digest_size=16, key=key[:64]).hexdigest()
+
+
+class ContentCache:
+    """
+    Encrypted frames of large clipboard contents, one file per content ID.
+
+    The watcher stores a frame when it announces it and the receiver serves
+    it from here, so the two can run as separate processes; receivers also
+    store what they fetch, so repeated fetches of the same content are free.
+    Least recently used files are removed once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, cid: str, data: bytes) -> None:
+        path = self._path(cid)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def get(self, cid: str) -> Optional[bytes]:
+        path = self._path(cid)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def __contains__(self, cid: str) -> bool:
+        return os.path.exists(self._path(cid))
+
+    def _path(self, cid: str) -> str:
+        if len(cid) != 32 or any(c not in string.hexdigits for c in cid):
+            raise ValueError("Invalid content ID")
+        return os.path.join(self.directory, cid.lower())
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.warning("Could not evict %s: %s", path, e)
@@ -0,0 +1,156 @@
+import json
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+# Texts shorter than this are always sent in full; a delta cannot save much.
+DELTA_MIN_SIZE = 4096
+
+# Above this many differing lines (after trimming the common prefix and
+# suffix) the middle is sent as one insert instead of being diffed. Matching
+# is anchored on lines that occur once in each text and takes O(n log n)
+# however the lines were reordered; highly repetitive texts have few such
+# anchors and may not shrink, so those are sent in full.
+MAX_DIFF_LINES = 200000
+
+# An op is either [start, end], copying base lines start..end, or a string
+# of new text to insert.
+Op = Union[List[int], str]
+
+
+class Delta(NamedTuple):
+    base: str
+    target: str
+    ops: List[Op]
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def make_ops(base: str, text: str) -> List[Op]:
+    """Return line-level ops that rebuild `text` from `base`."""
+    old, new = _lines(base), _lines(text)
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    ops: List[Op] = []
+    if prefix:
+        ops.append([0, prefix])
+    old_mid, new_mid = old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+    if len(old_mid) + len(new_mid) > MAX_DIFF_LINES:
+        if new_mid:
+            ops.append("".join(new_mid))
+    else:
+        j = 0
+        for i1, j1, size in _matching_blocks(old_mid, new_mid):
+            if j1 > j:
+                ops.append("".join(new_mid[j:j1]))
+            ops.append([prefix + i1, prefix + i1 + size])
+            j = j1 + size
+        if j < len(new_mid):
+            ops.append("".join(new_mid[j:]))
+    if suffix:
+        ops.append([len(old) - suffix, len(old)])
+    return ops
+
+
+def _matching_blocks(old: List[str], new: List[str]) -> List[Tuple[int, int, int]]:
+    """
+    Return (old index, new index, length) runs of equal lines, in order in both.
+
+    The runs grow from the longest increasing sequence of lines that occur
+    exactly once in each text, as in patience diff, so no line pair is ever
+    compared more than a few times.
+    """
+    old_counts, new_counts = Counter(old), Counter(new)
+    old_index = {line: i for i, line in enumerate(old) if old_counts[line] == 1}
+    anchors = [(old_index[line], j) for j, line in enumerate(new) if new_counts[line] == 1 and line in old_index]
+
+    # Longest run of anchors increasing in both texts (patience sorting).
+    tails: List[int] = []
+    tail_at: List[int] = []
+    previous: List[int] = []
+    for k, (i, _) in enumerate(anchors):
+        pos = bisect_left(tails, i)
+        if pos == len(tails):
+            tails.append(i)
+            tail_at.append(k)
+        else:
+            tails[pos] = i
+            tail_at[pos] = k
+        previous.append(tail_at[pos - 1] if pos else -1)
+    chain = []
+    k = tail_at[-1] if tail_at else -1
+    while k >= 0:
+        chain.append(anchors[k])
+        k = previous[k]
+    chain.reverse()
+
+    blocks: List[Tuple[int, int, int]] = []
+    end_i = end_j = 0
+    for i, j in chain:
+        if i < end_i:
+            continue  # already inside the previous run
+        start_i, start_j = i, j
+        while start_i > end_i and start_j > end_j and old[start_i - 1] == new[start_j - 1]:
+            start_i -= 1
+            start_j -= 1
+        end_i, end_j = i + 1, j + 1
+        while end_i < len(old) and end_j < len(new) and old[end_i] == new[end_j]:
+            end_i += 1
+            end_j += 1
+        blocks.append((start_i, start_j, end_i - start_i))
+    return blocks
+
+
+def apply_ops(base: str, ops: List[Op]) -> str:
+    """Rebuild text from `base`, raising ValueError if an op does not fit it."""
+    old = _lines(base)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif isinstance(op, list) and len(op) == 2 and 0 <= op[0] <= op[1] <= len(old):
+            parts.extend(old[op[0]:op[1]])
+        else:
+            raise ValueError("Delta does not match its base")
+    return "".join(parts)
+
+
+def encode_delta(delta: Delta) -> bytes:
+    return json.dumps(delta._asdict(), separators=(",", ":")).encode("utf-8")
+
+
+def decode_delta(raw: bytes) -> Delta:
+    """Parse an encoded delta, raising ValueError if it is malformed."""
+    try:
+        fields = json.loads(raw)
+        return Delta(str(fields["base"]), str(fields["target"]), list(fields["ops"]))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed delta: {e}")
+
+
+class BaseCache:
+    """The most recently received large texts, by content ID, for rebuilding deltas."""
+
+    def __init__(self, capacity: int = 4):
+        self.capacity = capacity
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+
+    def add(self, cid: str, text: str) -> None:
+        self._texts[cid] = text
+        self._texts.move_to_end(cid)
+        while len(self._texts) > self.capacity:
+            self._texts.popitem(last=False)
+
+    def get(self, cid: str) -> Optional[str]:
+        text = self._texts.get(cid)
+        if text is not None:
+            self._texts.move_to_end(cid)
+        return text
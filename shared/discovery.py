@@ -0,0 +1,331 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_PORT = 47821
+DEFAULT_PEER_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".peers.json")
+BEACON_INTERVAL = 5.0
+# A peer is considered gone once no beacon from it arrived for this long.
+PEER_TTL = 3 * BEACON_INTERVAL
+# Beacons older or further in the future than this are ignored, and nonces
+# are remembered for as long to reject replays.
+MAX_BEACON_AGE = 60.0
+
+# Peers find each other with small authenticated UDP beacons:
+#
+#   magic "CSB" | version u8 | kind u8 | origin length u8 | time ms u64 | nonce (16) | reply-to (16) | port u16
+#   origin (UTF-8) | HMAC-SHA256 of everything before it, truncated to 16 bytes
+#
+# Every node broadcasts an ANNOUNCE on start and every BEACON_INTERVAL, and
+# answers each ANNOUNCE it hears with a unicast REPLY whose reply-to is the
+# announce's nonce, so the announcer learns the round-trip time. A peer's
+# address is the source address of its beacons and `port` is its receiver's
+# HTTP port. The MAC key is derived from the shared AES key.
+BEACON = struct.Struct("!3sBBBQ16s16sH")
+BEACON_MAGIC = b"CSB"
+BEACON_VERSION = 1
+ANNOUNCE = 1
+REPLY = 2
+NONCE_SIZE = 16
+MAC_SIZE = 16
+
+Address = Tuple[str, int]
+
+
+class Beacon(NamedTuple):
+    kind: int
+    origin: str
+    port: int
+    time: float
+    nonce: bytes
+    reply_to: bytes = bytes(NONCE_SIZE)
+
+
+class PeerRecord(NamedTuple):
+    origin: str
+    host: str
+    port: int
+    last_seen: float
+    rtt: Optional[float] = None
+
+
+def beacon_key(key: bytes) -> bytes:
+    """Derive the beacon MAC key from the shared AES key."""
+    return hmac.new(key, b"clipsync-discovery", hashlib.sha256).digest()
+
+
+def encode_beacon(beacon: Beacon, mac_key: bytes) -> bytes:
+    origin = beacon.origin.encode("utf-8")
+    if len(origin) > 255:
+        raise ValueError("Origin ID too long")
+    body = BEACON.pack(
+        BEACON_MAGIC, BEACON_VERSION, beacon.kind, len(origin), int(beacon.time * 1000),
+        beacon.nonce, beacon.reply_to, beacon.port,
+    ) + origin
+    return body + hmac.new(mac_key, body, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def decode_beacon(raw: bytes, mac_key: bytes) -> Beacon:
+    """Parse and authenticate a beacon, raising ValueError if it is malformed or forged."""
+    if len(raw) < BEACON.size + MAC_SIZE:
+        raise ValueError("Beacon too short")
+    magic, version, kind, origin_len, millis, nonce, reply_to, port = BEACON.unpack_from(raw)
+    if magic != BEACON_MAGIC or version != BEACON_VERSION:
+        raise ValueError("Not a beacon")
+    if len(raw) != BEACON.size + origin_len + MAC_SIZE:
+        raise ValueError("Beacon length mismatch")
+    body, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+    if not hmac.compare_digest(mac, hmac.new(mac_key, body, hashlib.sha256).digest()[:MAC_SIZE]):
+        raise ValueError("Bad beacon MAC")
+    if kind not in (ANNOUNCE, REPLY):
+        raise ValueError(f"Unknown beacon kind: {kind}")
+    return Beacon(kind, raw[BEACON.size:-MAC_SIZE].decode("utf-8"), port, millis / 1000, nonce, reply_to)
+
+
+class PeerCache:
+    """
+    Last-seen endpoint, round-trip time and liveness of every discovered peer.
+
+    With a `path`, endpoints are kept in a small JSON file so a restarted
+    sender goes straight to the addresses its peers last had. A peer is
+    alive while its last beacon is no older than `ttl`.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = PEER_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._peers: Dict[str, PeerRecord] = {}
+        self._lost: set = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, origin: str) -> Optional[PeerRecord]:
+        return self._peers.get(origin)
+
+    def peers(self) -> List[PeerRecord]:
+        return list(self._peers.values())
+
+    def alive(self, origin: str, now: Optional[float] = None) -> bool:
+        record = self._peers.get(origin)
+        now = time.time() if now is None else now
+        return record is not None and now - record.last_seen <= self.ttl
+
+    def update(self, origin: str, host: str, port: int, rtt: Optional[float] = None, when: Optional[float] = None) -> Tuple[PeerRecord, bool]:
+        """Record a beacon; returns the record and whether the peer is new, moved or came back."""
+        when = time.time() if when is None else when
+        with self._lock:
+            old = self._peers.get(origin)
+            record = PeerRecord(origin, host, port, when, rtt if rtt is not None else (old.rtt if old else None))
+            self._peers[origin] = record
+            changed = old is None or (old.host, old.port) != (host, port) or origin in self._lost
+            self._lost.discard(origin)
+            if old is None or (old.host, old.port) != (host, port):
+                self._save()
+        return record, changed
+
+    def expire(self, now: Optional[float] = None) -> List[PeerRecord]:
+        """Return the peers that went silent since the last call."""
+        now = time.time() if now is None else now
+        with self._lock:
+            lost = [r for r in self._peers.values() if r.origin not in self._lost and now - r.last_seen > self.ttl]
+            self._lost.update(r.origin for r in lost)
+        return lost
+
+    def _load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+            for entry in entries:
+                record = PeerRecord(str(entry["origin"]), str(entry["host"]), int(entry["port"]), float(entry["last_seen"]), entry.get("rtt"))
+                self._peers[record.origin] = record
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unreadable peer cache %s: %s", self.path, e)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump([r._asdict() for r in self._peers.values()], f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save peer cache: %s", e)
+
+
+class Discovery:
+    """
+    Finds peers on the local network and keeps the PeerCache up to date.
+
+    Announces go to every address in `targets` (the LAN broadcast address by
+    default; tests list several loopback ports instead). Beacons that fail
+    the MAC, are too old or reuse a nonce are dropped. `on_found` is called
+    with the record of a peer that is new, moved to another address or came
+    back after going silent, and `on_lost` once a peer has been silent for
+    the cache's TTL; both run on the discovery thread.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        origin: str,
+        http_port: int,
+        port: int = DISCOVERY_PORT,
+        targets: Optional[List[Address]] = None,
+        cache: Optional[PeerCache] = None,
+        interval: float = BEACON_INTERVAL,
+        on_found: Optional[Callable[[PeerRecord], None]] = None,
+        on_lost: Optional[Callable[[PeerRecord], None]] = None,
+    ):
+        self.origin = origin
+        self.http_port = http_port
+        self.port = port
+        self.targets = targets or [("255.255.255.255", port)]
+        self.cache = cache or PeerCache()
+        self.interval = interval
+        self.on_found = on_found
+        self.on_lost = on_lost
+        self.rejected = 0
+
+        self._mac_keys = [beacon_key(key)]
+        self._sent: Dict[bytes, float] = {}
+        self._seen: Dict[bytes, float] = {}
+        self._sock: Optional[socket.socket] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind(("", self.port))
+        sock.settimeout(0.5)
+        self.port = sock.getsockname()[1]
+        self._sock = sock
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clipsync-discovery", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def rekey(self, keys: Sequence[bytes]) -> None:
+        """Sign beacons with the first of `keys` and accept beacons signed with any of them."""
+        self._mac_keys = [beacon_key(key) for key in keys]
+
+    def announce(self) -> None:
+        """Broadcast an ANNOUNCE to every target now."""
+        nonce = os.urandom(NONCE_SIZE)
+        raw = encode_beacon(Beacon(ANNOUNCE, self.origin, self.http_port, time.time(), nonce), self._mac_keys[0])
+        self._sent[nonce] = time.monotonic()
+        for target in self.targets:
+            try:
+                self._sock.sendto(raw, target)
+            except OSError as e:
+                logger.debug("Could not announce to %s: %s", target, e)
+
+    def _run(self) -> None:
+        started = next_announce = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_announce:
+                self.announce()
+                self._prune(now)
+                # Cached peers get one interval to answer before they count as gone.
+                if now - started >= self.interval:
+                    for record in self.cache.expire():
+                        logger.info("Peer %s at %s:%d went silent", record.origin, record.host, record.port)
+                        self._notify(self.on_lost, record)
+                next_announce = now + self.interval
+            try:
+                raw, address = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    return
+                raise
+            self._handle(raw, address)
+
+    def _handle(self, raw: bytes, address: Address) -> None:
+        beacon = None
+        for mac_key in self._mac_keys:
+            try:
+                beacon = decode_beacon(raw, mac_key)
+                break
+            except (ValueError, UnicodeDecodeError):
+                continue
+        if beacon is None:
+            self.rejected += 1
+            return
+        if beacon.origin == self.origin:
+            return
+        if abs(time.time() - beacon.time) > MAX_BEACON_AGE or beacon.nonce in self._seen:
+            self.rejected += 1
+            return
+        self._seen[beacon.nonce] = time.monotonic()
+
+        rtt = None
+        if beacon.kind == REPLY:
+            sent_at = self._sent.get(beacon.reply_to)
+            if sent_at is None:
+                self.rejected += 1
+                return
+            rtt = time.monotonic() - sent_at
+        else:
+            reply = Beacon(REPLY, self.origin, self.http_port, time.time(), os.urandom(NONCE_SIZE), beacon.nonce)
+            try:
+                self._sock.sendto(encode_beacon(reply, self._mac_keys[0]), address)
+            except OSError as e:
+                logger.debug("Could not reply to %s: %s", address, e)
+
+        record, changed = self.cache.update(beacon.origin, address[0], beacon.port, rtt)
+        if changed:
+            logger.info("Found peer %s at %s:%d", record.origin, record.host, record.port)
+            self._notify(self.on_found, record)
+
+    def _prune(self, now: float) -> None:
+        for nonces in (self._sent, self._seen):
+            for nonce, at in list(nonces.items()):
+                if now - at > MAX_BEACON_AGE:
+                    del nonces[nonce]
+
+    @staticmethod
+    def _notify(callback: Optional[Callable[[PeerRecord], None]], record: PeerRecord) -> None:
+        if callback:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error("Discovery callback failed: %s", e)
+
+
+def create_discovery(config: Dict[str, Any], origin: str, cache_path: Optional[str] = DEFAULT_PEER_CACHE_PATH) -> Optional[Discovery]:
+    """Build a Discovery for `config`, or None if it is disabled or unconfigured."""
+    if not config.get("discovery", True) or not config.get("aes_key"):
+        return None
+    port = config.get("discovery_port", DISCOVERY_PORT)
+    return Discovery(
+        base64.b64decode(config["aes_key"]), origin, config.get("local_port", 5000), port,
+        cache=PeerCache(cache_path),
+    )
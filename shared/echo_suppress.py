@@ -0,0 +1,232 @@
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from clipboard_detect import digest
+from file_lock import exclusive
+
+Version = Tuple[int, str]
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".echo_state.json")
+# This device's random origin ID. Kept out of config.json, which is copied
+# between devices, so every device gets its own.
+DEFAULT_DEVICE_ID_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".device_id")
+# Furthest an incoming version may be ahead of the local wall clock, in
+# milliseconds; generous enough for devices whose clocks disagree by hours.
+MAX_CLOCK_AHEAD = 24 * 60 * 60 * 1000
+
+
+def default_origin(config: Optional[Dict[str, Any]] = None, path: Optional[str] = DEFAULT_DEVICE_ID_PATH) -> str:
+    """
+    Return this device's origin ID: `device_id` from config if set, else the
+    one saved at `path` (created on first use), or a random one for this run
+    without a path. Host names are not used; every Android device is
+    "localhost".
+    """
+    if config and config.get("device_id"):
+        return str(config["device_id"])
+    if path is None:
+        return secrets.token_hex(8)
+    return load_device_id(path)
+
+
+def load_device_id(path: str = DEFAULT_DEVICE_ID_PATH) -> str:
+    """Return the device ID saved at `path`, creating it if there is none yet."""
+    try:
+        with open(path, "r") as f:
+            device_id = f.read().strip()
+        if device_id:
+            return device_id
+    except OSError:
+        pass
+    device_id = secrets.token_hex(8)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(device_id)
+        try:
+            # Linking fails if the file exists, so when a receiver and a
+            # watcher start together only the first ID is kept.
+            os.link(tmp_path, path)
+        except FileExistsError:
+            with open(path, "r") as f:
+                return f.read().strip() or device_id
+        return device_id
+    except OSError:
+        return device_id
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def plausible_seq(seq: int, now: Optional[float] = None) -> bool:
+    """Return True if `seq` could be a version clock: not negative and not far ahead of the wall clock."""
+    now = time.time() if now is None else now
+    return 0 <= seq <= int(now * 1000) + MAX_CLOCK_AHEAD
+
+
+class EchoSuppressor:
+    """
+    Recognises clipboard changes that were caused by applying a remote update.
+
+    Receivers call record_applied() right before writing a remote update to
+    the clipboard, so a watcher that sees the change at once already knows
+    it, and discard_applied() if the write fails; watchers call is_echo()
+    before sending a local change, and the
+    matching entry is consumed so a later manual copy of the same text is still
+    sent. The ring is bounded and, when `path` is set, mirrored to a small
+    state file so a receiver and a watcher running as separate processes share
+    it; every call reads and writes that file under a lock file, so neither
+    process loses the other's entries. Receivers also use is_duplicate() to drop updates that originated here
+    or whose (origin, seq) was already applied.
+
+    Sequence numbers double as a Lamport clock shared by all devices: every
+    update is versioned (seq, origin), next_seq() is always later than any
+    version seen so far, and receivers apply an update only if its version is
+    newer than the clipboard's current one. is_stale() drops older updates
+    before they are decrypted, and advance() adopts a version once it has
+    been authenticated. Ties on seq are broken by origin, so every device
+    picks the same winner of concurrent copies. The clock starts from the wall clock in milliseconds,
+    so it keeps increasing across restarts; versions too far ahead of it
+    (plausible_seq()) are never adopted, so one forged update cannot push
+    the clock out of range.
+    """
+
+    def __init__(self, origin: str, capacity: int = 32, path: Optional[str] = None):
+        self.origin = origin
+        self.capacity = capacity
+        self.path = path
+        self.suppressed = 0
+
+        self._applied: "deque[Tuple[str, str, int]]" = deque(maxlen=capacity)
+        self._seen: "deque[Tuple[str, int]]" = deque(maxlen=capacity)
+        self._seq = int(time.time() * 1000)
+        self._version: Optional[Version] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+        self._lock_file = open(path + ".lock", "a+b") if path else None
+        if self._lock_file:
+            with exclusive(self._lock_file):
+                self._load()
+
+    def next_seq(self) -> int:
+        """Return the version clock of a local change, making it the current version."""
+        with self._state():
+            self._seq = max(self._seq + 1, int(time.time() * 1000))
+            self._version = (self._seq, self.origin)
+            self._save()
+            return self._seq
+
+    def is_stale(self, origin: Optional[str], seq: Optional[int]) -> bool:
+        """Return True if an incoming update is not newer than the current clipboard version."""
+        if origin is None or seq is None:
+            return False
+        with self._state():
+            return self._version is not None and (seq, origin) <= self._version
+
+    def advance(self, origin: Optional[str], seq: Optional[int]) -> bool:
+        """Make an incoming update the current version; returns False if it is stale."""
+        if origin is None or seq is None:
+            return True
+        if not plausible_seq(seq):
+            return False
+        with self._state():
+            if self._version is not None and (seq, origin) <= self._version:
+                return False
+            self._version = (seq, origin)
+            self._seq = max(self._seq, seq)
+            self._save()
+            return True
+
+    def record_applied(self, text: str, origin: str, seq: Optional[int] = None) -> None:
+        """Remember a remote update that is about to be written to the clipboard."""
+        with self._state():
+            self._applied.append((digest(text).hex(), origin, seq or 0))
+            if seq is not None:
+                self._seen.append((origin, seq))
+            self._save()
+
+    def discard_applied(self, text: str, origin: str, seq: Optional[int] = None) -> None:
+        """Forget a record_applied() whose clipboard write failed."""
+        entry = (digest(text).hex(), origin, seq or 0)
+        with self._state():
+            if entry in self._applied:
+                self._applied.remove(entry)
+            if seq is not None and (origin, seq) in self._seen:
+                self._seen.remove((origin, seq))
+            self._save()
+
+    def is_echo(self, text: str) -> bool:
+        """Return True (and consume the entry) if text came from a remote update."""
+        key = digest(text).hex()
+        with self._state():
+            for entry in self._applied:
+                if entry[0] == key:
+                    self._applied.remove(entry)
+                    self._save()
+                    self.suppressed += 1
+                    return True
+        return False
+
+    def is_duplicate(self, origin: Optional[str], seq: Optional[int]) -> bool:
+        """Return True if an incoming update looped back or was already applied."""
+        if origin is None:
+            return False
+        with self._state():
+            if origin == self.origin or (seq is not None and (origin, seq) in self._seen):
+                self.suppressed += 1
+                return True
+        return False
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        """Hold the thread lock and, with a state file, the lock file, with the file's state loaded."""
+        with self._lock:
+            if self._lock_file is None:
+                yield
+                return
+            with exclusive(self._lock_file):
+                self._load()
+                yield
+
+    def _load(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        # The inode changes when the file is replaced, even within one mtime tick.
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._signature = signature
+        self._applied = deque((tuple(e) for e in state.get("applied", [])), maxlen=self.capacity)
+        self._seen = deque((tuple(e) for e in state.get("seen", [])), maxlen=self.capacity)
+        version = state.get("version")
+        # An out-of-range version, e.g. one adopted before versions were checked, is dropped.
+        if version and plausible_seq(version[0]):
+            self._version = tuple(version)
+            self._seq = max(self._seq, self._version[0])
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"applied": list(self._applied), "seen": list(self._seen), "version": self._version}, f)
+            os.replace(tmp_path, self.path)
+            stat = os.stat(self.path)
+            self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            pass
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def exclusive(lock_file: IO[bytes]) -> Iterator[None]:
+    """Hold an exclusive lock on an open lock file, shared with other processes."""
+    fd = lock_file.fileno()
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+    try:
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,342 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from clipboard_detect import digest
+from file_lock import exclusive
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".history.log")
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# The history is an append-only log of records:
+#
+#   kind u8 | source length u8 | digest (16) | id u64 | time f64 | text length u32
+#   source (UTF-8 origin, "local" for copies made here) | text (UTF-8)
+#
+# ENTRY records hold one clipboard text. Copying a text that is already in
+# the history appends a TOUCH record instead (no source or text), which makes
+# that entry the newest again with the TOUCH record's time.
+RECORD = struct.Struct("!BB16sQdI")
+ENTRY = 1
+TOUCH = 2
+
+# Compact once evicted entries and TOUCH records take more space than this
+# and more than the live entries.
+COMPACT_MIN_BYTES = 1024 * 1024
+SCAN_BLOCK_SIZE = 256 * 1024
+
+
+class HistoryEntry(NamedTuple):
+    id: int
+    time: float
+    source: str
+    text: str
+
+
+class ClipboardHistory:
+    """
+    Bounded, searchable history of clipboard texts.
+
+    The in-memory index holds only the offset of each live entry, in order of
+    last use, and the entry ids by digest for deduplication; the log is
+    memory-mapped and texts are only read when an entry is fetched or
+    searched. The index is rebuilt by scanning record headers, evicting the
+    least recently used entries beyond `max_entries` or `max_bytes` as it
+    goes, and the log rewrites itself without dead records once they
+    outweigh the live ones.
+
+    A watcher and a receiver running as separate processes can share one
+    log: appends and compaction take a lock file, and every call first picks
+    up whatever the other process appended or rewrote.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._order: "OrderedDict[int, int]" = OrderedDict()
+        self._by_digest: Dict[bytes, int] = {}
+        self._touched: Dict[int, float] = {}
+        self._sorted: Optional[List[int]] = None
+        self._next_id = 1
+        self._end = 0
+        self._live_bytes = 0
+        self._dead_bytes = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._lock_file = open(path + ".lock", "a+b")
+        self._open()
+
+    def add(self, text: str, source: str = "local", when: Optional[float] = None) -> int:
+        """Record a clipboard text, or make an identical earlier entry the newest. Returns its id."""
+        data = text.encode("utf-8", "surrogatepass")
+        key = digest(text)
+        when = time.time() if when is None else when
+        with self._lock, exclusive(self._lock_file):
+            self._refresh()
+            if os.fstat(self._file.fileno()).st_size > self._end:
+                # A crash mid-append leaves a partial record; drop it.
+                self._close_map()
+                self._file.truncate(self._end)
+            entry_id = self._by_digest.get(key)
+            if entry_id is not None:
+                offset, size = self._write(RECORD.pack(TOUCH, 0, key, entry_id, when, 0))
+                self._apply_touch(entry_id, when, size)
+            else:
+                entry_id = self._next_id
+                source_bytes = source.encode("utf-8")[:255]
+                record = RECORD.pack(ENTRY, len(source_bytes), key, entry_id, when, len(data)) + source_bytes
+                offset, size = self._write(record, data)
+                self._remap()
+                self._apply_entry(entry_id, offset, size, key)
+            self._maybe_compact()
+            return entry_id
+
+    def get(self, entry_id: int) -> Optional[HistoryEntry]:
+        """Return an entry by id, or None if it was evicted or never existed."""
+        with self._lock:
+            self._refresh()
+            offset = self._order.get(entry_id)
+            return None if offset is None else self._entry(offset)
+
+    def recent(self, limit: int = 20, since: Optional[float] = None) -> List[HistoryEntry]:
+        """Return up to `limit` entries, newest first, optionally only those used after `since`."""
+        with self._lock:
+            self._refresh()
+            return self._recent(limit, since)
+
+    def search(self, query: str, limit: int = 20, prefix: bool = False) -> List[HistoryEntry]:
+        """Return up to `limit` entries containing (or starting with) `query`, newest first; case-sensitive."""
+        needle = query.encode("utf-8", "surrogatepass")
+        with self._lock:
+            self._refresh()
+            if prefix:
+                return self._search_prefix(needle, limit)
+            return self._search_substring(needle, limit)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def size(self) -> int:
+        """Return the current size of the log in bytes."""
+        return self._live_bytes + self._dead_bytes
+
+    def compact(self) -> None:
+        """Rewrite the log with only the live entries."""
+        with self._lock, exclusive(self._lock_file):
+            self._refresh()
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_map()
+            if self._file:
+                self._file.close()
+                self._file = None
+            self._lock_file.close()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "a+b")
+        self._load()
+
+    def _load(self) -> None:
+        self._close_map()
+        self._order.clear()
+        self._by_digest.clear()
+        self._touched.clear()
+        self._sorted = None
+        self._end = 0
+        self._live_bytes = self._dead_bytes = 0
+        self._remap()
+        self._scan()
+
+    def _refresh(self) -> None:
+        try:
+            on_disk = os.stat(self.path)
+        except OSError:
+            on_disk = None
+        current = os.fstat(self._file.fileno())
+        if on_disk is None or (on_disk.st_ino, on_disk.st_dev) != (current.st_ino, current.st_dev):
+            # Another process compacted the log into a new file.
+            self._close_map()
+            self._file.close()
+            self._open()
+        elif current.st_size < self._end:
+            self._load()
+        elif current.st_size > self._end:
+            self._remap()
+            self._scan()
+
+    def _scan(self) -> None:
+        """Index the records from the current end of the index to the end of the map."""
+        end = len(self._map) if self._map else 0
+        offset = self._end
+        # Headers are read through the file in blocks rather than through the
+        # map, so opening a large log does not fault all of it into memory.
+        block, block_start = b"", offset
+        while offset + RECORD.size <= end:
+            if offset + RECORD.size > block_start + len(block):
+                self._file.seek(offset)
+                block, block_start = self._file.read(SCAN_BLOCK_SIZE), offset
+            kind, source_len, key, record_id, when, length = RECORD.unpack_from(block, offset - block_start)
+            size = RECORD.size + source_len + length
+            if kind not in (ENTRY, TOUCH) or offset + size > end:
+                break
+            if kind == ENTRY:
+                self._apply_entry(record_id, offset, size, key)
+            else:
+                self._apply_touch(record_id, when, size)
+            offset += size
+        self._end = offset
+
+    def _apply_entry(self, entry_id: int, offset: int, size: int, key: bytes) -> None:
+        self._order[entry_id] = offset
+        self._by_digest[key] = entry_id
+        self._live_bytes += size
+        self._next_id = max(self._next_id, entry_id + 1)
+        self._sorted = None
+        while len(self._order) > self.max_entries or (self._live_bytes > self.max_bytes and len(self._order) > 1):
+            self._evict()
+
+    def _apply_touch(self, entry_id: int, when: float, size: int) -> None:
+        self._dead_bytes += size
+        if entry_id in self._order:
+            self._order.move_to_end(entry_id)
+            self._touched[entry_id] = when
+
+    def _evict(self) -> None:
+        entry_id, offset = self._order.popitem(last=False)
+        self._file.seek(offset)
+        _, source_len, key, _, _, length = RECORD.unpack(self._file.read(RECORD.size))
+        size = RECORD.size + source_len + length
+        if self._by_digest.get(key) == entry_id:
+            del self._by_digest[key]
+        self._touched.pop(entry_id, None)
+        self._live_bytes -= size
+        self._dead_bytes += size
+        self._sorted = None
+
+    def _entry(self, offset: int) -> HistoryEntry:
+        _, source_len, _, entry_id, when, length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        source = self._map[start:start + source_len].decode("utf-8", "replace")
+        text = self._map[start + source_len:start + source_len + length].decode("utf-8", "surrogatepass")
+        return HistoryEntry(entry_id, self._touched.get(entry_id, when), source, text)
+
+    def _body_range(self, offset: int) -> Tuple[int, int, int]:
+        _, source_len, _, entry_id, _, length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size + source_len
+        return entry_id, start, start + length
+
+    def _search_prefix(self, needle: bytes, limit: int) -> List[HistoryEntry]:
+        result = []
+        for offset in reversed(self._order.values()):
+            _, start, end = self._body_range(offset)
+            if end - start >= len(needle) and self._map[start:start + len(needle)] == needle:
+                result.append(self._entry(offset))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _search_substring(self, needle: bytes, limit: int) -> List[HistoryEntry]:
+        if not needle:
+            return self._recent(limit)
+        if self._map is None:
+            return []
+        if self._sorted is None:
+            self._sorted = sorted(self._order.values())
+        offsets = self._sorted
+        # One scan of the whole map; each hit is mapped back to the live entry containing it.
+        hits = []
+        position = self._map.find(needle)
+        while position != -1:
+            index = bisect_right(offsets, position) - 1
+            if index >= 0:
+                _, start, end = self._body_range(offsets[index])
+                if start <= position and position + len(needle) <= end:
+                    hits.append(offsets[index])
+                    position = self._map.find(needle, end)
+                    continue
+            position = self._map.find(needle, position + 1)
+        entries = [self._entry(offset) for offset in hits]
+        entries.sort(key=lambda e: e.time, reverse=True)
+        return entries[:limit]
+
+    def _recent(self, limit: int, since: Optional[float] = None) -> List[HistoryEntry]:
+        result = []
+        for offset in reversed(self._order.values()):
+            if len(result) >= limit:
+                break
+            entry = self._entry(offset)
+            if since is not None and entry.time < since:
+                break
+            result.append(entry)
+        return result
+
+    def _write(self, record: bytes, body: bytes = b"") -> Tuple[int, int]:
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(record)
+        self._file.write(body)
+        self._file.flush()
+        self._end = offset + len(record) + len(body)
+        return offset, len(record) + len(body)
+
+    def _remap(self) -> None:
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is not None and len(self._map) >= size:
+            return
+        self._close_map()
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _maybe_compact(self) -> None:
+        if self._dead_bytes > COMPACT_MIN_BYTES and self._dead_bytes > self._live_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as tmp:
+            # Least recently used first, with touches folded into each entry's time,
+            # so reloading reproduces the same order.
+            for entry_id, offset in self._order.items():
+                kind, source_len, key, _, when, length = RECORD.unpack_from(self._map, offset)
+                start = offset + RECORD.size
+                tmp.write(RECORD.pack(kind, source_len, key, entry_id, self._touched.get(entry_id, when), length))
+                tmp.write(self._map[start:start + source_len + length])
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        self._close_map()
+        self._file.close()
+        try:
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # On Windows the log cannot be replaced while another process has it open.
+            logger.warning("Could not compact history: %s", e)
+            os.remove(tmp_path)
+        self._open()
+
+
+def open_history(config: Optional[Dict[str, Any]], path: Optional[str] = DEFAULT_HISTORY_PATH) -> Optional[ClipboardHistory]:
+    """Open the history at `path` with the bounds from `config`, or return None if `path` is None."""
+    if path is None:
+        return None
+    config = config or {}
+    return ClipboardHistory(
+        path, config.get("history_max_entries", DEFAULT_MAX_ENTRIES), config.get("history_max_bytes", DEFAULT_MAX_BYTES),
+    )
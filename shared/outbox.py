@@ -0,0 +1,188 @@
+import logging
+import os
+import struct
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".outbox.log")
+
+# The outbox is an append-only log of records:
+#
+#   kind u8 | peer length u8 | meta length u16 | id u64 | body length u32
+#   peer (UTF-8 "ip:port") | meta (UTF-8 "route\ncontent type") | body
+#
+# ENTRY records hold an encrypted update for one peer. An ACK record for a
+# peer marks every entry of that peer with an id up to its own as delivered.
+RECORD = struct.Struct("!BBHQI")
+ENTRY = 1
+ACK = 2
+
+# Compact once superseded/delivered records take more space than this and
+# more than the live ones.
+COMPACT_MIN_BYTES = 256 * 1024
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    route: str
+    content_type: str
+    body: bytes
+
+
+class Outbox:
+    """
+    Durable per-peer store for updates that could not be delivered.
+
+    Appending is a single buffered write to the end of the log. An in-memory
+    index keeps the offsets of at most `history` entries per peer, so older
+    entries are superseded as soon as a newer one is appended and only the
+    latest clipboard states are ever replayed. The index is rebuilt by
+    scanning record headers when the log is opened, and the log rewrites
+    itself without dead records once they outweigh the live ones.
+    """
+
+    def __init__(self, path: str = DEFAULT_OUTBOX_PATH, history: int = 1, sync: bool = False):
+        self.path = path
+        self.history = history
+        self.sync = sync
+
+        self._index: Dict[str, "deque[Tuple[int, int, int]]"] = {}
+        self._next_id = 1
+        self._live_bytes = 0
+        self._dead_bytes = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._open()
+
+    def append(self, peer: str, route: str, content_type: str, body: bytes) -> int:
+        """Store an update for `peer`, superseding its oldest pending entry if full. Returns its id."""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            offset, size = self._write(ENTRY, peer, entry_id, f"{route}\n{content_type}".encode("utf-8"), body)
+            entries = self._index.setdefault(peer, deque())
+            entries.append((entry_id, offset, size))
+            self._live_bytes += size
+            while len(entries) > self.history:
+                self._retire(entries.popleft()[2])
+            self._maybe_compact()
+            return entry_id
+
+    def pending(self, peer: str) -> List[OutboxEntry]:
+        """Return the stored entries for `peer`, oldest first."""
+        with self._lock:
+            entries = list(self._index.get(peer, ()))
+            result = []
+            for entry_id, offset, size in entries:
+                record = self._read_at(offset, size)
+                _, peer_len, meta_len, _, _ = RECORD.unpack_from(record)
+                data = record[RECORD.size:]
+                route, _, content_type = data[peer_len:peer_len + meta_len].decode("utf-8").partition("\n")
+                result.append(OutboxEntry(entry_id, route, content_type, data[peer_len + meta_len:]))
+            return result
+
+    def count(self, peer: str) -> int:
+        """Return the number of entries stored for `peer`."""
+        return len(self._index.get(peer, ()))
+
+    def ack(self, peer: str, upto: int) -> None:
+        """Mark entries of `peer` with id <= `upto` as delivered."""
+        with self._lock:
+            entries = self._index.get(peer)
+            if not entries or entries[0][0] > upto:
+                return
+            while entries and entries[0][0] <= upto:
+                self._retire(entries.popleft()[2])
+            if not entries:
+                del self._index[peer]
+            _, size = self._write(ACK, peer, upto)
+            self._dead_bytes += size
+            self._maybe_compact()
+
+    def size(self) -> int:
+        """Return the current size of the log in bytes."""
+        return self._live_bytes + self._dead_bytes
+
+    def compact(self) -> None:
+        """Rewrite the log with only the pending entries."""
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> None:
+        self._file = open(self.path, "a+b")
+        self._fd = self._file.fileno()
+        self._load()
+
+    def _load(self) -> None:
+        self._index.clear()
+        self._live_bytes = self._dead_bytes = 0
+        end = os.fstat(self._fd).st_size
+        offset = 0
+        while offset + RECORD.size <= end:
+            kind, peer_len, meta_len, record_id, length = RECORD.unpack(self._read_at(offset, RECORD.size))
+            size = RECORD.size + peer_len + meta_len + length
+            if kind not in (ENTRY, ACK) or offset + size > end:
+                break
+            peer = self._read_at(offset + RECORD.size, peer_len).decode("utf-8", "replace")
+            entries = self._index.setdefault(peer, deque())
+            if kind == ENTRY:
+                entries.append((record_id, offset, size))
+                self._live_bytes += size
+                while len(entries) > self.history:
+                    self._retire(entries.popleft()[2])
+                self._next_id = max(self._next_id, record_id + 1)
+            else:
+                while entries and entries[0][0] <= record_id:
+                    self._retire(entries.popleft()[2])
+                self._dead_bytes += size
+            if not entries:
+                del self._index[peer]
+            offset += size
+        if offset < end:
+            # A crash mid-append leaves a partial record; drop it.
+            logger.warning("Discarding %d bytes of incomplete outbox records", end - offset)
+            self._file.truncate(offset)
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def _write(self, kind: int, peer: str, record_id: int, meta: bytes = b"", body: bytes = b"") -> Tuple[int, int]:
+        peer_bytes = peer.encode("utf-8")
+        record = RECORD.pack(kind, len(peer_bytes), len(meta), record_id, len(body)) + peer_bytes + meta
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(record)
+        self._file.write(body)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._fd)
+        return offset, len(record) + len(body)
+
+    def _retire(self, size: int) -> None:
+        self._live_bytes -= size
+        self._dead_bytes += size
+
+    def _maybe_compact(self) -> None:
+        if self._dead_bytes > COMPACT_MIN_BYTES and self._dead_bytes > self._live_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as tmp:
+            for entries in self._index.values():
+                for _, offset, size in entries:
+                    tmp.write(self._read_at(offset, size))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._open()
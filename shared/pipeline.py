@@ -0,0 +1,140 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from metrics import STAGE_SECONDS, UPDATES
+
+logger = logging.getLogger(__name__)
+
+# A clipboard update goes through these stages on its way to the peers:
+#
+#   detect -> normalize -> dedup -> delta -> compress -> encrypt -> frame -> fanout -> send
+#
+# detect (ChangeDetector), normalize and dedup run on the SyncService thread,
+# delta to fanout on the ClipboardSender's pipeline, and send on one
+# transport (PeerChannel) per peer. Every stage is observed under its own
+# name in STAGE_SECONDS.
+
+
+def put_latest(q: "queue.Queue", item) -> bool:
+    """Put without blocking, discarding the oldest item if full. Returns True if one was dropped."""
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class Stage(NamedTuple):
+    """One step of a pipeline; `fn` returns the next stage's input, or None to drop the item."""
+    name: str
+    fn: Callable[[Any], Any]
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages.
+
+    Once started, every stage runs on its own thread behind a bounded queue,
+    so consecutive updates overlap: one can be encrypted while the next is
+    compressed. Queues discard their oldest item when full, since only the
+    newest clipboard state matters, and a stage that raises drops the item,
+    which is logged and counted in UPDATES. process() runs one item through
+    every stage on the calling thread instead, letting exceptions through;
+    it suits cheap stages and measuring stages one by one.
+    """
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = 16, name: str = "clipsync"):
+        self.stages = list(stages)
+        self.name = name
+        self.dropped = 0
+
+        self._queues: List["queue.Queue"] = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self._inflight = 0
+        self._idle = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(index,), name=f"{self.name}-{stage.name}", daemon=True)
+            for index, stage in enumerate(self.stages)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, item) -> None:
+        """Queue an item for the first stage without blocking."""
+        with self._idle:
+            self._inflight += 1
+        self._put(0, item)
+
+    def pending(self) -> int:
+        """Return the number of items queued or being processed."""
+        return self._inflight
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted item has left the pipeline."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._inflight == 0, timeout)
+
+    def process(self, item) -> Any:
+        """Run an item through every stage on the calling thread; returns the last result or None."""
+        for stage in self.stages:
+            item = self._timed(stage, item)
+            if item is None:
+                return None
+        return item
+
+    def _put(self, index: int, item) -> None:
+        if put_latest(self._queues[index], item):
+            self.dropped += 1
+            UPDATES.inc(stage=self.stages[index].name, result="superseded")
+            self._done()
+
+    def _done(self) -> None:
+        with self._idle:
+            self._inflight -= 1
+            self._idle.notify_all()
+
+    def _run(self, index: int) -> None:
+        stage, q = self.stages[index], self._queues[index]
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                result = self._timed(stage, item)
+            except Exception as e:
+                logger.error("Stage %s failed: %s", stage.name, e)
+                UPDATES.inc(stage=stage.name, result="error")
+                result = None
+            if result is not None and index + 1 < len(self.stages):
+                self._put(index + 1, result)
+            else:
+                self._done()
+
+    @staticmethod
+    def _timed(stage: Stage, item) -> Any:
+        started = time.perf_counter()
+        try:
+            return stage.fn(item)
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage.name)
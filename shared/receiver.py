@@ -0,0 +1,761 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import IO, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import parse_qsl
+
+import requests
+
+from codec import decode_text, try_keys
+from config_store import ConfigStore, Settings
+from apply_worker import ClipboardApplyWorker
+from content_cache import DEFAULT_CACHE_DIR, ContentCache, content_id
+from delta import DELTA_MIN_SIZE, BaseCache, apply_ops
+from transfer import (
+    CHUNK_ROUTE, DEFAULT_TRANSFER_DIR, TEXT, TRANSFER_ROUTE, Payload, TransferStore, open_manifest, save_payload,
+)
+from echo_suppress import DEFAULT_DEVICE_ID_PATH, DEFAULT_STATE_PATH, EchoSuppressor, default_origin, plausible_seq
+from history import DEFAULT_HISTORY_PATH, ClipboardHistory, open_history
+from metrics import BYTES, REGISTRY, STAGE_SECONDS, TIMING_HEADER, UPDATES, parse_timing
+from wire import (
+    BATCH_ROUTE, BINARY_ROUTE, CONTENT_ROUTE, CONTENT_TYPE, FLAG_ANNOUNCE, FLAG_DELTA, Announcement, Frame,
+    decode_batch, decode_frame, frame_aad, open_announcement, open_delta, open_frame, open_frames,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_HEADER_LINE = 8 * 1024
+MAX_HEADERS = 64
+BODY_READ_SIZE = 64 * 1024
+FETCH_ROUTE = "/clipboard/fetch"
+FETCH_TIMEOUT = 30.0
+
+# Admission control. Bodies larger than MAX_BODY_SIZE are refused with 413
+# before they are read, and bodies larger than SPILL_SIZE are spooled to a
+# temporary file instead of memory while they arrive. At most MAX_PENDING
+# requests, declaring at most MAX_PENDING_BYTES between them, are read and
+# decoded at once; beyond that the receiver answers 429 or 503 with a
+# Retry-After hint. Decryption runs on DECODE_WORKERS threads.
+MAX_BODY_SIZE = 64 * 1024 * 1024
+SPILL_SIZE = 1024 * 1024
+MAX_PENDING = 32
+MAX_PENDING_BYTES = 32 * 1024 * 1024
+DECODE_WORKERS = min(4, os.cpu_count() or 1)
+RETRY_AFTER = 1
+# Refused requests with more unread body than this close the connection
+# instead of draining it.
+MAX_DRAIN_SIZE = 64 * 1024
+
+
+class HTTPError(Exception):
+    """Raised while parsing a request; answered with `status` and the connection closed."""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    def response(self) -> "Response":
+        response = json_response({"error": str(self)}, self.status)
+        if self.retry_after is not None:
+            response.headers["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class Request:
+    """A parsed HTTP request whose body is read from the socket on demand."""
+
+    def __init__(self, method: str, path: str, version: str, headers: Dict[str, str], reader: asyncio.StreamReader, query: str = ""):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.query = dict(parse_qsl(query))
+        self.remote: Optional[str] = None
+        self.content_length = int(headers.get("content-length", "0") or 0)
+        self._reader = reader
+        self._remaining = self.content_length
+
+    async def iter_body(self, size: int = BODY_READ_SIZE):
+        """Yield the body in pieces of at most `size` bytes as they arrive."""
+        while self._remaining > 0:
+            chunk = await self._reader.read(min(size, self._remaining))
+            if not chunk:
+                raise HTTPError(400, "Connection closed mid-body")
+            self._remaining -= len(chunk)
+            yield chunk
+
+    async def body(self) -> bytes:
+        """Read the whole body."""
+        parts = bytearray()
+        async for chunk in self.iter_body():
+            parts += chunk
+        return bytes(parts)
+
+    async def spool(self, max_memory: Optional[int] = None) -> IO[bytes]:
+        """Read the whole body into a file that moves to disk beyond `max_memory` (default SPILL_SIZE) bytes."""
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPILL_SIZE if max_memory is None else max_memory)
+        try:
+            async for chunk in self.iter_body():
+                spooled.write(chunk)
+        except BaseException:
+            spooled.close()
+            raise
+        spooled.seek(0)
+        return spooled
+
+    @property
+    def unread(self) -> int:
+        return self._remaining
+
+    async def json(self):
+        try:
+            return json.loads(await self.body())
+        except ValueError:
+            return None
+
+    async def drain(self) -> None:
+        """Discard any unread body so the connection can be reused."""
+        async for _ in self.iter_body():
+            pass
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+class Response:
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain; charset=utf-8", headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    def encode(self, keep_alive: bool) -> bytes:
+        lines = [
+            f"HTTP/1.1 {self.status} {HTTPStatus(self.status).phrase}",
+            f"Content-Type: {self.content_type}",
+            f"Content-Length: {len(self.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in self.headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+def json_response(payload, status: int = 200) -> Response:
+    return Response(status, json.dumps(payload).encode(), "application/json")
+
+
+def _read_spooled(spooled: IO[bytes], parse: Callable[[bytes], T]) -> T:
+    """Read and close a body from Request.spool(), returning parse(body)."""
+    with spooled:
+        return parse(spooled.read())
+
+
+def _parse_json(raw: bytes):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class AsyncHTTPServer:
+    """
+    Minimal HTTP/1.1 server on asyncio streams.
+
+    Every connection is a coroutine rather than a thread, connections are
+    kept alive between requests, and handlers read request bodies
+    incrementally from the socket. Requests declaring a body over
+    `max_body_size` are answered 413 without reading it.
+    """
+
+    def __init__(self, max_body_size: int = MAX_BODY_SIZE):
+        self.max_body_size = max_body_size
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        self.routes[(method, path)] = handler
+
+    async def start(self, host: str, port: int) -> int:
+        """Start listening; returns the bound port."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_LINE)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    writer.write(e.response().encode(keep_alive=False))
+                    break
+                if request is None:
+                    break
+                peername = writer.get_extra_info("peername")
+                request.remote = peername[0] if peername else None
+
+                response = await self._dispatch(request)
+                keep_alive = request.keep_alive and request.unread <= MAX_DRAIN_SIZE
+                try:
+                    if keep_alive:
+                        await request.drain()
+                except HTTPError:
+                    keep_alive = False
+                writer.write(response.encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            request_line = await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            raise HTTPError(414, "Request line too long")
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, version = parts
+
+        headers: Dict[str, str] = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except (asyncio.LimitOverrunError, ValueError):
+                raise HTTPError(431, "Header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "Chunked bodies are not supported")
+        if not headers.get("content-length", "0").isdigit():
+            raise HTTPError(400, "Invalid Content-Length")
+        path, _, query = target.partition("?")
+        return Request(method, path, version, headers, reader, query)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return json_response({"error": "Method not allowed"}, 405)
+            return json_response({"error": "Not found"}, 404)
+        if request.content_length > self.max_body_size:
+            return json_response({"error": f"Body exceeds {self.max_body_size} bytes"}, 413)
+        try:
+            return await handler(request)
+        except HTTPError as e:
+            return e.response()
+        except Exception as e:
+            logger.exception("Handler for %s failed", request.path)
+            return json_response({"error": str(e)}, 500)
+
+
+class ClipboardReceiver:
+    """
+    Shared receive logic for every platform.
+
+    Accepts encrypted updates as JSON on /clipboard ({"data": ..., "origin":
+    ..., "seq": ...}, with data from codec.encode_text), as binary frames
+    on /clipboard/bin, or as a batch of frames replayed from a sender's
+    outbox on /clipboard/batch. Echoes, duplicates and updates not newer
+    than the clipboard's current version (last writer wins, see
+    EchoSuppressor) are dropped before their body is decrypted. The (seq,
+    origin) version is sealed into the envelope as associated data, so a
+    header rewritten to look newer fails to open, and only an authenticated
+    version becomes the current one; versions too far ahead of the wall
+    clock are rejected outright. The plaintext is queued for the platform's
+    `apply_fn` on a coalescing ClipboardApplyWorker. The response (202) is sent as soon as
+    the update is queued.
+
+    Announced content is only remembered, unless it is already in the
+    content cache or no larger than `autofetch_bytes`; a local POST to
+    /clipboard/fetch pulls the newest announcement from the sender's
+    /clipboard/content route, verifies its content ID and applies it.
+    Content announced by this device is served from the same cache.
+
+    Update routes are admitted at most `max_pending` at a time and
+    `max_pending_bytes` of declared bodies between them; further requests
+    are answered 429 or 503 with Retry-After before their body is read.
+    Bodies are spooled (to disk beyond SPILL_SIZE) and decrypted on a pool
+    of `workers` threads.
+
+    Stage timings from the sender's X-ClipSync-Timing header are recorded as
+    "remote_<stage>", and "transit" is the receive time minus the sender's
+    wall-clock send time (so it includes any clock skew). The header is not
+    authenticated, so only known stages are kept and only once the update
+    they came with has been opened. Everything is exposed in Prometheus text
+    format on GET /metrics.
+
+    Updates are opened with each of `keys` in turn, so both keys work while
+    a rotation settles; reconfigure() swaps the keys and limits in place.
+    """
+
+    def __init__(
+        self,
+        key: bytes,
+        apply_fn: Callable[[str], None],
+        suppressor: EchoSuppressor,
+        content_cache: Optional[ContentCache] = None,
+        autofetch_bytes: int = 0,
+        transfers: Optional[TransferStore] = None,
+        apply_payload_fn: Callable[[Payload], object] = save_payload,
+        workers: int = DECODE_WORKERS,
+        max_pending: int = MAX_PENDING,
+        max_pending_bytes: int = MAX_PENDING_BYTES,
+        history: Optional[ClipboardHistory] = None,
+        keys: Sequence[bytes] = (),
+    ):
+        self.keys: Sequence[bytes] = tuple(keys) or (key,)
+        self.suppressor = suppressor
+        self.content_cache = content_cache
+        self.autofetch_bytes = autofetch_bytes
+        self.transfers = transfers
+        self.apply_payload_fn = apply_payload_fn
+        self.history = history
+        self.worker = ClipboardApplyWorker(apply_fn)
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.pending = 0
+        self.pending_bytes = 0
+        # The server routes were registered on, whose body limit reconfigure() updates
+        self.server: Optional[AsyncHTTPServer] = None
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="clipsync-decode")
+        self.bases = BaseCache()
+        # Newest announcement not yet fetched: (announcement, origin, seq, sender address)
+        self.announced: Optional[Tuple[Announcement, Optional[str], Optional[int], str]] = None
+        # Key each transfer's manifest was opened with, for its chunks
+        self._transfer_keys: Dict[str, bytes] = {}
+
+    @property
+    def key(self) -> bytes:
+        """The key content IDs are computed with: the one peers currently seal with."""
+        return self.keys[0]
+
+    def reconfigure(self, settings: Settings) -> None:
+        """Apply reloaded settings; requests already being handled keep the keys they started with."""
+        config = settings.config
+        if settings.keys:
+            self.keys = settings.keys
+        self.autofetch_bytes = config.get("announce_autofetch_bytes", 0)
+        self.max_pending = config.get("max_pending_requests", MAX_PENDING)
+        self.max_pending_bytes = config.get("max_pending_bytes", MAX_PENDING_BYTES)
+        if self.server is not None:
+            self.server.max_body_size = config.get("max_body_size", MAX_BODY_SIZE)
+
+    def register(self, server: AsyncHTTPServer) -> None:
+        self.server = server
+        server.route("POST", "/clipboard", self._admitted(self.handle_json))
+        server.route("POST", BINARY_ROUTE, self._admitted(self.handle_binary))
+        server.route("POST", BATCH_ROUTE, self._admitted(self.handle_batch))
+        server.route("GET", CONTENT_ROUTE, self.handle_content)
+        server.route("POST", FETCH_ROUTE, self.handle_fetch)
+        if self.transfers:
+            server.route("POST", TRANSFER_ROUTE, self._admitted(self.handle_transfer))
+            server.route("POST", CHUNK_ROUTE, self._admitted(self.handle_chunk))
+        server.route("GET", "/metrics", self.handle_metrics)
+
+    def _admitted(self, handler: Handler) -> Handler:
+        """Wrap `handler` so it only runs while the receiver has room for the request."""
+        async def admitted(request: Request) -> Response:
+            if self.pending >= self.max_pending:
+                UPDATES.inc(stage="receive", result="throttled")
+                raise HTTPError(429, "Too many pending requests", RETRY_AFTER)
+            if self.pending and self.pending_bytes + request.content_length > self.max_pending_bytes:
+                UPDATES.inc(stage="receive", result="throttled")
+                raise HTTPError(503, "Receiver is busy", RETRY_AFTER)
+            self.pending += 1
+            self.pending_bytes += request.content_length
+            try:
+                return await handler(request)
+            finally:
+                self.pending -= 1
+                self.pending_bytes -= request.content_length
+        return admitted
+
+    async def handle_metrics(self, request: Request) -> Response:
+        return Response(200, REGISTRY.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+
+    def _record_request(self, request: Request) -> Dict[str, float]:
+        """Count the request's bytes; returns the stage timings it reports, for _record_timings()."""
+        received_at = time.time()
+        BYTES.inc(request.content_length, direction="received")
+        timings = {f"remote_{stage}": seconds for stage, seconds in parse_timing(request.headers.get(TIMING_HEADER.lower())).items()}
+        sent_at = timings.pop("remote_sent", None)
+        if sent_at is not None and received_at >= sent_at:
+            timings["transit"] = received_at - sent_at
+        return timings
+
+    @staticmethod
+    def _record_timings(timings: Optional[Dict[str, float]]) -> None:
+        """Record a request's timings once its update has been authenticated; later calls do nothing."""
+        if not timings:
+            return
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        timings.clear()
+
+    async def _decode(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="decode")
+
+    async def _open(self, fn: Callable[[bytes], T]) -> Tuple[T, bytes]:
+        """Run `fn` on the decode pool with each accepted key in turn; returns (result, key)."""
+        return await self._decode(try_keys, fn, self.keys)
+
+    async def handle_json(self, request: Request) -> Response:
+        timings = self._record_request(request)
+        data = await self._decode(_read_spooled, await request.spool(), _parse_json)
+        if not isinstance(data, dict) or "data" not in data:
+            return self._rejected("Missing 'data' field")
+        origin = data["origin"] if isinstance(data.get("origin"), str) else None
+        seq = data["seq"] if isinstance(data.get("seq"), int) else None
+        if seq is not None and not plausible_seq(seq):
+            return self._rejected("Update version is too far ahead")
+        if self.suppressor.is_duplicate(origin, seq):
+            return self._ignored()
+        if self.suppressor.is_stale(origin, seq):
+            return self._stale()
+        aad = frame_aad(0, seq or 0, origin)
+        try:
+            text, _ = await self._open(lambda key: decode_text(data["data"], key, aad))
+        except (ValueError, TypeError, UnicodeDecodeError, base64.binascii.Error):
+            return self._rejected("Could not decrypt payload")
+        self._record_timings(timings)
+        return await self._apply(text, origin, seq)
+
+    async def handle_binary(self, request: Request) -> Response:
+        timings = self._record_request(request)
+        try:
+            frame = await self._decode(_read_spooled, await request.spool(), decode_frame)
+        except ValueError as e:
+            return self._rejected(str(e))
+        return await self._handle_frame(frame, request.remote, timings=timings)
+
+    async def handle_batch(self, request: Request) -> Response:
+        timings = self._record_request(request)
+        try:
+            frames = await self._decode(_read_spooled, await request.spool(), decode_batch)
+        except ValueError as e:
+            return self._rejected(str(e))
+        # Only the newest version in a batch can win, so older frames are
+        # skipped without being decrypted, as is the newest if it is stale;
+        # the rest is authenticated like any other frame. The remaining
+        # plain text frames are decrypted together in one executor call.
+        newest = max((_version(frame) for frame in frames if _version(frame)), default=None)
+        frames = [frame for frame in frames if not _version(frame) or _version(frame) == newest]
+        plain = [
+            frame for frame in frames
+            if not frame.flags & (FLAG_ANNOUNCE | FLAG_DELTA) and not self.suppressor.is_stale(frame.origin, frame.seq or None)
+        ]
+        try:
+            texts = dict(zip(map(id, plain), await self._decode(_open_frames, plain, self.keys)))
+        except (ValueError, UnicodeDecodeError):
+            return self._rejected("Could not decrypt payload")
+        if texts:
+            self._record_timings(timings)
+        queued = 0
+        for frame in frames:
+            response = await self._handle_frame(frame, request.remote, texts.get(id(frame)), timings)
+            if response.status == 400:
+                return response
+            queued += response.status == 202
+        return json_response({"status": "queued" if queued else "ignored", "count": queued}, 202 if queued else 200)
+
+    async def handle_content(self, request: Request) -> Response:
+        """Serve the encrypted frame of content this device announced."""
+        try:
+            data = self.content_cache.get(request.query.get("id", "")) if self.content_cache else None
+        except ValueError as e:
+            return self._rejected(str(e))
+        if data is None:
+            return json_response({"error": "Unknown content"}, 404)
+        BYTES.inc(len(data), direction="sent")
+        return Response(200, data, CONTENT_TYPE)
+
+    async def handle_fetch(self, request: Request) -> Response:
+        """Fetch and apply the newest announced content; only allowed from this device."""
+        if request.remote not in ("127.0.0.1", "::1"):
+            return json_response({"error": "Forbidden"}, 403)
+        if self.announced is None:
+            return json_response({"error": "Nothing announced"}, 404)
+        return await self._fetch_announced()
+
+    async def handle_transfer(self, request: Request) -> Response:
+        """Start or resume a chunked transfer from its manifest."""
+        timings = self._record_request(request)
+        try:
+            frame = await self._decode(_read_spooled, await request.spool(), decode_frame)
+            manifest, key = await self._open(lambda key: open_manifest(frame, key))
+        except ValueError as e:
+            return self._rejected(str(e))
+        self._record_timings(timings)
+        if self.transfers.is_complete(manifest.id):
+            return json_response({"have": [], "complete": True})
+        try:
+            have = self.transfers.begin(manifest)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 413)
+        self._transfer_keys[manifest.id] = key
+        return json_response({"have": have, "complete": False})
+
+    async def handle_chunk(self, request: Request) -> Response:
+        timings = self._record_request(request)
+        transfer_id = request.query.get("id", "")
+        try:
+            index = int(request.query.get("index", ""))
+        except ValueError:
+            return self._rejected("Missing chunk index")
+        spooled = await request.spool()
+        loop = asyncio.get_running_loop()
+        key = self._transfer_keys.get(transfer_id, self.key)
+        try:
+            done = await self._decode(
+                _read_spooled, spooled, lambda sealed: self.transfers.write_chunk(transfer_id, index, sealed, key),
+            )
+        except KeyError:
+            return json_response({"error": "Unknown transfer"}, 404)
+        except ValueError as e:
+            UPDATES.inc(stage="transfer", result="bad_chunk")
+            return self._rejected(str(e))
+        self._record_timings(timings)
+        if not done:
+            return json_response({"status": "stored"})
+
+        try:
+            payload = await loop.run_in_executor(self._pool, self.transfers.finish, transfer_id, key)
+        except ValueError as e:
+            UPDATES.inc(stage="transfer", result="corrupt")
+            return self._rejected(str(e))
+        finally:
+            self._transfer_keys.pop(transfer_id, None)
+        UPDATES.inc(stage="transfer", result="complete")
+        if payload.kind == TEXT:
+            return await self._apply(payload.data.decode("utf-8"), None, None)
+        result = await loop.run_in_executor(None, self.apply_payload_fn, payload)
+        logger.info("Received %s %s (%d bytes): %s", payload.kind, payload.name, len(payload.data), result)
+        return json_response({"status": "complete"}, 202)
+
+    async def _handle_frame(self, frame: Frame, remote: Optional[str], text: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> Response:
+        """Handle one decoded frame; `text` is its content if already decrypted, `timings` its request's."""
+        seq = frame.seq or None
+        if seq is not None and not plausible_seq(seq):
+            return self._rejected("Update version is too far ahead")
+        if self.suppressor.is_duplicate(frame.origin, seq):
+            return self._ignored()
+        if self.suppressor.is_stale(frame.origin, seq):
+            return self._stale()
+        if frame.flags & FLAG_ANNOUNCE:
+            try:
+                announcement, _ = await self._open(lambda key: open_announcement(frame, key))
+            except ValueError:
+                return self._rejected("Could not decrypt announcement")
+            self._record_timings(timings)
+            return await self._announce(announcement, frame.origin, seq, remote)
+        if frame.flags & FLAG_DELTA:
+            response = await self._apply_delta(frame, seq)
+            if response.status != 400:
+                self._record_timings(timings)
+            return response
+        if text is None:
+            try:
+                text, _ = await self._open(lambda key: open_frame(frame, key))
+            except (ValueError, UnicodeDecodeError):
+                return self._rejected("Could not decrypt payload")
+        self._record_timings(timings)
+        return await self._apply(text, frame.origin, seq)
+
+    async def _apply_delta(self, frame: Frame, seq: Optional[int]) -> Response:
+        def rebuild(key):
+            delta = open_delta(frame, key)
+            base = self.bases.get(delta.base)
+            if base is None:
+                return None
+            text = apply_ops(base, delta.ops)
+            return text if content_id(text, key) == delta.target else None
+
+        try:
+            text, _ = await self._open(rebuild)
+        except (ValueError, UnicodeDecodeError):
+            return self._rejected("Could not decrypt delta")
+        if text is None:
+            UPDATES.inc(stage="receive", result="delta_miss")
+            return json_response({"error": "Unknown delta base"}, 409)
+        UPDATES.inc(stage="receive", result="delta")
+        return await self._apply(text, frame.origin, seq)
+
+    async def _announce(self, announcement: Announcement, origin: Optional[str], seq: Optional[int], remote: Optional[str]) -> Response:
+        self.announced = (announcement, origin, seq, remote or "")
+        UPDATES.inc(stage="receive", result="announced")
+        cached = self.content_cache is not None and announcement.id in self.content_cache
+        if cached or announcement.size <= self.autofetch_bytes:
+            return await self._fetch_announced()
+        logger.info("Large clipboard (%d bytes) available from %s: %r", announcement.size, remote, announcement.preview)
+        return json_response({"status": "announced"}, 202)
+
+    async def _fetch_announced(self) -> Response:
+        announcement, origin, seq, remote = self.announced
+        data = self.content_cache.get(announcement.id) if self.content_cache else None
+        if data is None:
+            url = f"http://{remote}:{announcement.port}{CONTENT_ROUTE}?id={announcement.id}"
+            started = time.perf_counter()
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, self._download, url)
+            except requests.RequestException as e:
+                UPDATES.inc(stage="fetch", result="error")
+                logger.warning("Fetching %s failed: %s", url, e)
+                return json_response({"error": f"Fetch failed: {e}"}, 502)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="fetch")
+            BYTES.inc(len(data), direction="received")
+        try:
+            text, key = await self._open(lambda key: open_frame(decode_frame(data), key))
+        except (ValueError, UnicodeDecodeError):
+            return self._rejected("Could not decrypt fetched content")
+        if content_id(text, key) != announcement.id:
+            return self._rejected("Fetched content does not match announcement")
+        if self.content_cache is not None:
+            self.content_cache.put(announcement.id, data)
+        UPDATES.inc(stage="fetch", result="ok")
+        self.announced = None
+        return await self._apply(text, origin, seq)
+
+    @staticmethod
+    def _download(url: str) -> bytes:
+        response = requests.get(url, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    async def _apply(self, text: str, origin: Optional[str], seq: Optional[int]) -> Response:
+        # Adopted only now the version is authenticated, so a forged or
+        # replayed header can neither win nor move the clock.
+        if not self.suppressor.advance(origin, seq):
+            return self._stale()
+        if len(text) >= DELTA_MIN_SIZE:
+            cid = await asyncio.get_running_loop().run_in_executor(self._pool, content_id, text, self.key)
+            self.bases.add(cid, text)
+
+        # Recorded before the write: a watcher polling the clipboard may see
+        # the change before the write returns, and must know it is an echo.
+        def applying():
+            self.suppressor.record_applied(text, origin or "remote", seq)
+
+        def failed():
+            self.suppressor.discard_applied(text, origin or "remote", seq)
+
+        def applied():
+            if self.history is not None:
+                self.history.add(text, origin or "remote")
+            logger.info("Clipboard updated (%d characters)", len(text))
+
+        self.worker.submit(text, applied, before_apply=applying, on_failed=failed)
+        UPDATES.inc(stage="receive", result="queued")
+        return json_response({"status": "queued"}, 202)
+
+    def _ignored(self) -> Response:
+        UPDATES.inc(stage="receive", result="ignored")
+        logger.info("Ignored looped or duplicate update (%d suppressed)", self.suppressor.suppressed)
+        return json_response({"status": "ignored"})
+
+    def _stale(self) -> Response:
+        UPDATES.inc(stage="receive", result="stale")
+        logger.info("Ignored update older than the current clipboard")
+        return json_response({"status": "stale"})
+
+    def _rejected(self, message: str) -> Response:
+        UPDATES.inc(stage="receive", result="rejected")
+        return json_response({"error": message}, 400)
+
+
+def _open_frames(frames: List[Frame], keys: Sequence[bytes]) -> List[str]:
+    """Decrypt a batch under the first key that opens all of it, or frame by frame if it spans a rotation."""
+    try:
+        return try_keys(lambda key: open_frames(frames, key), keys)[0]
+    except ValueError:
+        return [try_keys(lambda key: open_frame(frame, key), keys)[0] for frame in frames]
+
+
+def _version(frame: Frame) -> Optional[Tuple[int, str]]:
+    """Return the (seq, origin) version of a frame, or None if it is unversioned."""
+    return (frame.seq, frame.origin) if frame.seq and frame.origin else None
+
+
+async def start_receiver(config: dict, apply_fn: Callable[[str], None], host: str = "0.0.0.0", port: Optional[int] = None, state_path: Optional[str] = DEFAULT_STATE_PATH, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, transfer_dir: Optional[str] = DEFAULT_TRANSFER_DIR, apply_payload_fn: Callable[[Payload], object] = save_payload, history_path: Optional[str] = DEFAULT_HISTORY_PATH, config_store: Optional[ConfigStore] = None) -> Tuple[AsyncHTTPServer, ClipboardReceiver, int]:
+    """
+    Create and start a receiver for `config`; returns (server, receiver, port).
+
+    With a `config_store`, its current config is used instead and the
+    receiver follows its changes; the caller starts and stops the store.
+    """
+    if config_store:
+        config = config_store.config
+    key = base64.b64decode(config["aes_key"])
+    # Without a state file (tests, benchmarks) the device ID is not saved either.
+    suppressor = EchoSuppressor(default_origin(config, DEFAULT_DEVICE_ID_PATH if state_path else None), path=state_path)
+    cache = ContentCache(cache_dir) if cache_dir else None
+    transfers = TransferStore(transfer_dir) if transfer_dir else None
+    history = open_history(config, history_path)
+    receiver = ClipboardReceiver(
+        key, apply_fn, suppressor, cache, config.get("announce_autofetch_bytes", 0), transfers, apply_payload_fn,
+        max_pending=config.get("max_pending_requests", MAX_PENDING),
+        max_pending_bytes=config.get("max_pending_bytes", MAX_PENDING_BYTES), history=history,
+    )
+    server = AsyncHTTPServer(config.get("max_body_size", MAX_BODY_SIZE))
+    receiver.register(server)
+    if config_store:
+        receiver.reconfigure(config_store.settings)
+        config_store.subscribe(receiver.reconfigure)
+    bound_port = await server.start(host, config.get("local_port", 5000) if port is None else port)
+    return server, receiver, bound_port
+
+
+def run_receiver(config: dict, apply_fn: Callable[[str], None], host: str = "0.0.0.0", state_path: Optional[str] = DEFAULT_STATE_PATH, history_path: Optional[str] = DEFAULT_HISTORY_PATH, config_store: Optional[ConfigStore] = None) -> None:
+    """Run a receiver until interrupted, following changes to `config_store` if given."""
+    async def main():
+        server, _, port = await start_receiver(config, apply_fn, host, state_path=state_path, history_path=history_path, config_store=config_store)
+        logger.info("ClipSync receiver listening on %s:%d", host, port)
+        await server.serve_forever()
+
+    if config_store:
+        config_store.start()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nStopped receiver.")
+    finally:
+        if config_store:
+            config_store.stop()
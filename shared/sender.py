@@ -0,0 +1,734 @@
+import base64
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from codec import compress_payload, key_context
+from content_cache import ContentCache, content_id
+from delta import DELTA_MIN_SIZE, Delta, make_ops
+from discovery import Discovery, PeerRecord
+from metrics import BYTES, STAGE_SECONDS, TIMING_HEADER, UPDATES, format_timing
+from outbox import Outbox
+from pipeline import Pipeline, Stage, put_latest
+from transfer import CHUNK_ROUTE, DEFAULT_CHUNK_SIZE, TRANSFER_ROUTE, Payload, Upload
+from wire import BATCH_ROUTE, BINARY_ROUTE, CONTENT_TYPE, Announcement, encode_frame, frame_aad, seal_announcement, seal_delta
+
+logger = logging.getLogger(__name__)
+
+ANNOUNCE_PREVIEW_CHARS = 80
+# Longest a peer's Retry-After hint is honoured for.
+MAX_RETRY_AFTER = 60.0
+
+Peer = Tuple[str, int]
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Return a full-jitter exponential backoff delay for the given attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Return the response's Retry-After delay in seconds, if it has a usable one."""
+    value = response.headers.get("Retry-After", "").strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def load_peers(config: Dict[str, Any]) -> List[Peer]:
+    """Return the configured peers, accepting the legacy peer_ip/peer_port fields."""
+    peers = [(p["ip"], int(p["port"])) for p in config.get("peers", [])]
+    if not peers and config.get("peer_ip"):
+        peers.append((config["peer_ip"], int(config["peer_port"])))
+    return peers
+
+
+class PostResult(NamedTuple):
+    """
+    The outcome of one POST to a peer.
+
+    `ok` is True if the peer took the update, False if it rejected it and
+    None if it should be retried, after at least `retry_after` seconds.
+    """
+    ok: Optional[bool]
+    status: Optional[int] = None
+    retry_after: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Envelope(NamedTuple):
+    """
+    An encrypted, framed update ready to be posted to any peer.
+
+    `base` is the (content ID, text) a peer holds once this is delivered, and
+    `fallback` is sent instead if the peer cannot apply a delta.
+    """
+    route: str
+    body: bytes
+    content_type: str
+    timings: Dict[str, float] = {}
+    encoded_at: float = 0.0
+    base: Optional[Tuple[str, str]] = None
+    fallback: Optional["Envelope"] = None
+
+
+class Update(NamedTuple):
+    """A clipboard text on its way through the sender's pipeline."""
+    text: str
+    seq: Optional[int]
+    queued_at: float
+    started_at: float = 0.0
+    deltas: Dict[str, Envelope] = {}
+    size: int = 0
+    flags: int = 0
+    body: bytes = b""
+    envelope: Optional[Envelope] = None
+
+
+class PeerChannel:
+    """
+    Delivery to one peer: its own keep-alive session, bounded queue, worker
+    thread and health state, so a slow or offline peer only delays itself.
+
+    With an `outbox`, updates that still fail after retrying are stored
+    instead of lost. While anything is stored, new updates are appended
+    behind it, and the stored entries are replayed to the peer in a single
+    /clipboard/batch request whenever a backed-off probe succeeds.
+
+    `base` is the last large text this peer acknowledged, which the sender
+    diffs new updates against.
+
+    A busy peer answering 429 or 503 is retried like an unreachable one,
+    waiting at least as long as its Retry-After header asks.
+
+    Typed payloads go through a separate latest-wins transfer queue and
+    thread, so a large upload never holds up text updates. Missing chunks
+    are uploaded `pool_size` at a time over the pooled session, and after a
+    failure the transfer resumes from the chunks the peer reports it has.
+
+    With discovery, relocate() points the channel at a peer's new address
+    and retries at once, and while the peer is `offline` updates are stored
+    (or, without an outbox, the newest one is held) instead of waiting on
+    connection timeouts. `name`, which keys the outbox, stays the same.
+
+    Every POST reports its own PostResult, since the text worker and the
+    chunk uploads share the channel; only the health summary (last_status,
+    last_error) is kept on the channel, under a lock.
+    """
+
+    def __init__(
+        self,
+        peer: Peer,
+        queue_size: int = 16,
+        max_retries: int = 5,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+        timeout: float = 5.0,
+        pool_size: int = 4,
+        outbox: Optional[Outbox] = None,
+        connect_timeout: float = 1.0,
+        name: Optional[str] = None,
+    ):
+        self.peer = peer
+        self.name = name or f"{peer[0]}:{peer[1]}"
+        self.base_url = f"http://{peer[0]}:{peer[1]}"
+        self.origin: Optional[str] = None
+        self.offline = False
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.outbox = outbox
+        self.parallel = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+
+        self._queue: "queue.Queue[Optional[Envelope]]" = queue.Queue(maxsize=queue_size)
+        self._transfers: "queue.Queue[Upload]" = queue.Queue(maxsize=1)
+        self._unfinished_transfers = 0
+        self._transfer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._held: Optional[Envelope] = None
+        self._thread: Optional[threading.Thread] = None
+        self._transfer_thread: Optional[threading.Thread] = None
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.transfers_sent = 0
+        self.transfers_failed = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[float] = None
+        self.last_status: Optional[int] = None
+        self._health_lock = threading.Lock()
+        self.base: Optional[Tuple[str, str]] = None
+        self._replay_at = 0.0
+        self._replay_attempts = 0
+        # Bumped whenever the peer comes back, so a replay that was already
+        # failing against the old address does not back off the new one.
+        self._returns = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.consecutive_failures == 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"clipsync-peer-{self.name}", daemon=True)
+        self._thread.start()
+        self._transfer_thread = threading.Thread(target=self._run_transfers, name=f"clipsync-transfer-{self.name}", daemon=True)
+        self._transfer_thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in (self._thread, self._transfer_thread):
+            if thread:
+                thread.join(timeout)
+        self.session.close()
+
+    def enqueue(self, envelope: Envelope) -> None:
+        if put_latest(self._queue, envelope):
+            self.dropped += 1
+
+    def relocate(self, peer: Peer) -> None:
+        """Send to `peer` from now on, retrying anything pending right away."""
+        if peer != self.peer:
+            logger.info("Peer %s moved to %s:%d", self.name, *peer)
+            self.peer = peer
+            self.base_url = f"http://{peer[0]}:{peer[1]}"
+        self.set_offline(False)
+
+    def set_offline(self, offline: bool) -> None:
+        """Mark the peer as gone (updates are stored without trying it) or back."""
+        self.offline = offline
+        if not offline:
+            self._returns += 1
+            self._replay_at = 0.0
+            self._replay_attempts = 0
+            held, self._held = self._held, None
+            if held is not None:
+                self.enqueue(held)
+            elif self.stored():
+                try:
+                    self._queue.put_nowait(None)  # wakes the worker to replay now
+                except queue.Full:
+                    pass
+            self._wake.set()
+
+    def enqueue_transfer(self, upload: Upload) -> None:
+        """Queue a typed payload, replacing one that has not started yet."""
+        with self._transfer_lock:
+            if put_latest(self._transfers, upload):
+                UPDATES.inc(stage="transfer", result="superseded")
+            else:
+                self._unfinished_transfers += 1
+
+    def transfer_idle(self) -> bool:
+        return self._unfinished_transfers == 0
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stored(self) -> int:
+        return self.outbox.count(self.name) if self.outbox else 0
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                envelope = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                envelope = None
+            if envelope is not None:
+                if self.offline:
+                    self._record(False)
+                    if self.outbox:
+                        self._store(envelope)
+                    else:
+                        self._held = envelope
+                elif self.outbox and self.outbox.count(self.name):
+                    # Keep order behind what is already stored and try the peer now.
+                    self._store(envelope)
+                    self._replay_at = 0.0
+                else:
+                    result = self._deliver(envelope)
+                    self._record(result)
+                    if result is None:
+                        self._store(envelope)
+            if self.outbox and not self.offline and self.outbox.count(self.name) and time.monotonic() >= self._replay_at:
+                self._replay()
+
+    def _run_transfers(self) -> None:
+        while not self._stop.is_set():
+            try:
+                upload = self._transfers.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if self.transfer(upload):
+                    self.transfers_sent += 1
+                else:
+                    self.transfers_failed += 1
+            finally:
+                with self._transfer_lock:
+                    self._unfinished_transfers -= 1
+
+    def transfer(self, upload: Upload) -> bool:
+        """Upload a payload's missing chunks, resuming after failures; True once the peer has all of it."""
+        manifest = upload.manifest
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            state, retry_after = self._begin_transfer(upload)
+            if state is not None:
+                if state.get("complete"):
+                    return True
+                have = set(state.get("have", ()))
+                missing = [i for i in range(manifest.chunks) if i not in have]
+                with ThreadPoolExecutor(self.parallel, thread_name_prefix=f"clipsync-chunk-{self.name}") as pool:
+                    results = list(pool.map(lambda i: self._post_chunk(upload, i), missing))
+                if all(result.ok for result in results):
+                    STAGE_SECONDS.observe(time.monotonic() - started, stage="transfer")
+                    UPDATES.inc(stage="transfer", result="ok")
+                    return True
+                retry_after = max((r.retry_after for r in results if r.retry_after is not None), default=None)
+                logger.info("Transfer of %s to %s interrupted; resuming", manifest.name or manifest.kind, self.name)
+
+            # A newer payload supersedes this one.
+            if attempt == self.max_retries or not self._transfers.empty():
+                break
+            if self._sleep(self._retry_delay(attempt, retry_after)):
+                break
+        UPDATES.inc(stage="transfer", result="failed")
+        return False
+
+    def _begin_transfer(self, upload: Upload) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """Post the manifest; returns the peer's transfer state, or None and its Retry-After."""
+        url = self.base_url + TRANSFER_ROUTE
+        try:
+            response = self.session.post(url, data=upload.frame, headers={"Content-Type": CONTENT_TYPE}, timeout=(self.connect_timeout, self.timeout))
+        except requests.RequestException as e:
+            self._note(PostResult(None, error=str(e)))
+            logger.warning("Starting transfer to %s failed: %s", url, e)
+            return None, None
+        if response.status_code != 200:
+            self._note(PostResult(None, response.status_code, error=f"HTTP {response.status_code}"))
+            logger.warning("Peer %s refused transfer: HTTP %s", url, response.status_code)
+            return None, parse_retry_after(response)
+        return response.json(), None
+
+    def _post_chunk(self, upload: Upload, index: int) -> PostResult:
+        route = f"{CHUNK_ROUTE}?id={upload.manifest.id}&index={index}"
+        return self._post(route, upload.chunk(index), {"Content-Type": CONTENT_TYPE})
+
+    def _record(self, result: Optional[bool]) -> None:
+        if result:
+            self.sent += 1
+            self.consecutive_failures = 0
+            self.last_success = time.time()
+        else:
+            self.failed += 1
+            self.consecutive_failures += 1
+
+    def _store(self, envelope: Envelope) -> None:
+        if self.outbox:
+            # Deltas depend on what the peer holds by the time they are replayed.
+            envelope = envelope.fallback or envelope
+            self.outbox.append(self.name, envelope.route, envelope.content_type, envelope.body)
+            UPDATES.inc(stage="send", result="stored")
+
+    def _replay(self) -> None:
+        """Send everything stored for this peer; one batch when all entries are frames."""
+        entries = self.outbox.pending(self.name)
+        if all(e.route == BINARY_ROUTE for e in entries):
+            posts = [(BATCH_ROUTE, b"".join(e.body for e in entries), CONTENT_TYPE)]
+        else:
+            posts = [(e.route, e.body, e.content_type) for e in entries]
+        returns = self._returns
+        for route, body, content_type in posts:
+            result = self._post(route, body, {"Content-Type": content_type})
+            if result.ok is None:
+                if returns != self._returns:
+                    return  # the peer moved meanwhile; try it again right away
+                self._replay_attempts += 1
+                self._replay_at = time.monotonic() + self._retry_delay(self._replay_attempts, result.retry_after)
+                return
+        # Delivered or rejected: either way these entries are done.
+        self.outbox.ack(self.name, entries[-1].id)
+        self._replay_attempts = 0
+        self._record(result.ok)
+        logger.info("Replayed %d stored update(s) to %s", len(entries), self.name)
+
+    def _deliver(self, envelope: Envelope) -> Optional[bool]:
+        """Post with retries; True if delivered, False if rejected, None if the peer was unreachable."""
+        result = None
+        for attempt in range(self.max_retries + 1):
+            timings = dict(envelope.timings, send_queue=time.monotonic() - envelope.encoded_at)
+            headers = {
+                "Content-Type": envelope.content_type,
+                TIMING_HEADER: format_timing(timings, time.time()),
+            }
+            result = self._post(envelope.route, envelope.body, headers)
+            if result.ok is False and result.status == 409 and envelope.fallback:
+                # The peer does not have the delta's base; send the update in full.
+                UPDATES.inc(stage="send", result="delta_fallback")
+                return self._deliver(envelope.fallback)
+            if result.ok and envelope.base:
+                self.base = envelope.base
+            if result.ok is not None:
+                return result.ok
+
+            # Stop retrying once a newer update is waiting; it supersedes this one.
+            if attempt == self.max_retries or not self._queue.empty():
+                break
+            if self._sleep(self._retry_delay(attempt, result.retry_after)):
+                break
+        return None
+
+    def _sleep(self, delay: float) -> bool:
+        """Wait before a retry, cut short by relocate(); returns True once stopped."""
+        self._wake.wait(delay)
+        self._wake.clear()
+        return self._stop.is_set()
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Back off exponentially, but no less than the peer's Retry-After."""
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _note(self, result: PostResult) -> None:
+        """Fold one POST's outcome into the channel's health summary."""
+        with self._health_lock:
+            self.last_status = result.status
+            if result.error:
+                self.last_error = result.error
+
+    def _post(self, route: str, body: bytes, headers: Dict[str, str]) -> PostResult:
+        url = self.base_url + route
+        started = time.monotonic()
+        try:
+            response = self.session.post(url, data=body, headers=headers, timeout=(self.connect_timeout, self.timeout))
+        except requests.RequestException as e:
+            UPDATES.inc(stage="send", result="error")
+            logger.warning("Send to %s failed: %s", url, e)
+            result = PostResult(None, error=str(e))
+            self._note(result)
+            return result
+        status = response.status_code
+        STAGE_SECONDS.observe(time.monotonic() - started, stage="send")
+        BYTES.inc(len(body), direction="sent")
+        if status >= 500 or status == 429:
+            UPDATES.inc(stage="send", result="busy" if status in (429, 503) else "error")
+            logger.warning("Peer %s error: HTTP %s", url, status)
+            result = PostResult(None, status, parse_retry_after(response), f"HTTP {status}")
+        elif status >= 400:
+            UPDATES.inc(stage="send", result="rejected")
+            logger.warning("Peer %s rejected update: HTTP %s", url, status)
+            result = PostResult(False, status, error=f"HTTP {status}")
+        else:
+            UPDATES.inc(stage="send", result="ok")
+            result = PostResult(True, status)
+        self._note(result)
+        return result
+
+
+class ClipboardSender:
+    """
+    Sends clipboard updates to one or more peers from background workers.
+
+    Each update is encoded exactly once by a Pipeline of delta, compress,
+    encrypt, frame and fanout stages, each on its own thread, and the same
+    bytes are handed to every peer's transport. The default transport,
+    PeerChannel, posts them over a persistent keep-alive session with
+    jittered-backoff retries; `transport` is called as transport(peer,
+    queue_size=..., outbox=..., **channel_options) for each peer and may
+    return anything with the same enqueue/start/stop/pending interface.
+    Bounded drop-oldest queues decouple the clipboard watcher from the
+    network, since only the newest clipboard state matters to a peer.
+    Updates are sent as binary frames unless `binary` is False, in which case
+    the JSON /clipboard route is used. Passing an Outbox keeps updates for
+    unreachable peers across restarts (see PeerChannel).
+
+    With `announce_threshold` and a ContentCache, updates of at least that
+    many bytes are only announced: the encrypted frame goes into the cache,
+    to be served by this device's receiver on `content_port`, and peers get
+    a small descriptor to fetch it by when the content is actually needed.
+
+    With `delta`, texts of DELTA_MIN_SIZE or more are diffed against the last
+    large text each peer acknowledged, once per distinct base, and sent as a
+    delta frame when that is less than half the size of the text.
+
+    With a `discovery`, peers found on the LAN are matched to channels by
+    origin, or by address the first time, and channels follow them to new
+    addresses; peers not configured at all get a channel of their own, named
+    by origin. Peers remembered in the discovery's cache are used from the
+    start, and channels of peers that went silent are marked offline.
+    """
+
+    def __init__(
+        self,
+        peers: List[Peer],
+        key: bytes,
+        queue_size: int = 16,
+        origin: Optional[str] = None,
+        binary: bool = True,
+        outbox: Optional[Outbox] = None,
+        announce_threshold: Optional[int] = None,
+        content_cache: Optional[ContentCache] = None,
+        content_port: int = 5000,
+        delta: bool = True,
+        transport: Callable[..., PeerChannel] = PeerChannel,
+        discovery: Optional[Discovery] = None,
+        **channel_options,
+    ):
+        self.key = key
+        self.origin = origin
+        self.binary = binary
+        self.outbox = outbox
+        self.announce_threshold = announce_threshold
+        self.content_cache = content_cache
+        self.content_port = content_port
+        self.delta = delta
+        self.discovery = discovery
+        self.transport = transport
+        self.channel_options = dict(channel_options, queue_size=queue_size, outbox=outbox)
+        self.channels = [transport(peer, **self.channel_options) for peer in peers]
+        self._channels_lock = threading.Lock()
+        self._started = False
+        self.pipeline = Pipeline([
+            Stage("delta", self._delta),
+            Stage("compress", self._compress),
+            Stage("encrypt", self._encrypt),
+            Stage("frame", self._frame),
+            Stage("fanout", self._fan_out),
+        ], queue_size, name="clipsync-encoder")
+
+        if discovery:
+            for record in discovery.cache.peers():
+                self.discovered(record)
+            discovery.on_found = self.discovered
+            discovery.on_lost = self.lost
+
+    @property
+    def dropped(self) -> int:
+        return self.pipeline.dropped
+
+    @property
+    def sent(self) -> int:
+        return sum(c.sent for c in self.channels)
+
+    @property
+    def failed(self) -> int:
+        return sum(c.failed for c in self.channels)
+
+    def start(self) -> None:
+        """Start the encoder stages, per-peer workers and discovery."""
+        with self._channels_lock:
+            self._started = True
+            for channel in self.channels:
+                channel.start()
+        self.pipeline.start()
+        if self.discovery:
+            try:
+                self.discovery.start()
+            except OSError as e:
+                logger.warning("LAN discovery unavailable: %s", e)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop all workers and close the pooled connections."""
+        if self.discovery:
+            self.discovery.stop(timeout)
+        self.pipeline.stop(timeout)
+        for channel in self.channels:
+            channel.stop(timeout)
+
+    def send(self, text: str, seq: Optional[int] = None) -> None:
+        """
+        Queue text for sending without blocking.
+
+        `seq` is sent along with the sender's origin so receivers can drop
+        duplicates.
+        """
+        self.pipeline.submit(Update(text, seq, time.monotonic()))
+
+    def discovered(self, record: PeerRecord) -> None:
+        """Route updates for a discovered peer to its current address."""
+        address = (record.host, record.port)
+        with self._channels_lock:
+            channel = next((c for c in self.channels if c.origin == record.origin), None)
+            if channel is None:
+                channel = next((c for c in self.channels if c.origin is None and c.peer == address), None)
+            if channel is None:
+                channel = self.transport(address, name=record.origin, **self.channel_options)
+                # Replaced rather than appended, so the fanout stage can iterate without the lock.
+                self.channels = self.channels + [channel]
+                if self._started:
+                    channel.start()
+            channel.origin = record.origin
+        channel.relocate(address)
+
+    def rekey(self, key: bytes, accepted: Sequence[bytes] = ()) -> None:
+        """
+        Seal updates queued from now on with `key`; discovery accepts beacons under any of `accepted`.
+
+        Delta bases acknowledged under the old key no longer match the
+        peers' content IDs, so the first delta after a rotation falls back
+        to the full update.
+        """
+        self.key = key
+        if self.discovery:
+            self.discovery.rekey([key, *accepted])
+
+    def set_peers(self, peers: List[Peer]) -> None:
+        """Replace the configured peers; channels bound to discovered peers are kept."""
+        with self._channels_lock:
+            kept = [c for c in self.channels if c.origin is not None or c.peer in peers]
+            known = {c.peer for c in kept}
+            added = [self.transport(peer, **self.channel_options) for peer in peers if peer not in known]
+            removed = [c for c in self.channels if c not in kept]
+            self.channels = kept + added
+            if self._started:
+                for channel in added:
+                    channel.start()
+        for channel in removed:
+            channel.stop()
+
+    def lost(self, record: PeerRecord) -> None:
+        """Stop trying a peer that went silent until it is discovered again."""
+        for channel in self.channels:
+            if channel.origin == record.origin:
+                channel.set_offline(True)
+
+    def send_payload(self, payload: Payload, seq: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """Queue a typed payload (image, file) as a chunked transfer to every peer."""
+        upload = Upload(payload, self.key, seq or 0, self.origin, chunk_size)
+        for channel in self.channels:
+            channel.enqueue_transfer(upload)
+
+    def wait_transfers(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued transfer has finished or failed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(c.transfer_idle() for c in self.channels):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def pending(self) -> int:
+        """Return the number of updates waiting to be encoded or sent."""
+        return self.pipeline.pending() + sum(c.pending() for c in self.channels)
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-peer delivery state keyed by "ip:port"."""
+        return {
+            c.name: {
+                "healthy": c.healthy,
+                "sent": c.sent,
+                "failed": c.failed,
+                "dropped": c.dropped,
+                "pending": c.pending(),
+                "stored": c.stored(),
+                "last_error": c.last_error,
+            }
+            for c in self.channels
+        }
+
+    def encode(self, text: str, seq: Optional[int] = None) -> Envelope:
+        """Encrypt and frame text once for all peers, on the calling thread."""
+        update = Update(text, seq, time.monotonic(), time.monotonic())
+        return self._frame(self._encrypt(self._compress(update))).envelope
+
+    def encode_deltas(self, text: str, seq: Optional[int] = None) -> Dict[str, Envelope]:
+        """Return delta envelopes keyed by the base content ID they apply to."""
+        if not (self.binary and self.delta and len(text) >= DELTA_MIN_SIZE):
+            return {}
+        bases: Dict[str, str] = {}
+        for channel in self.channels:
+            base = channel.base
+            if base:
+                bases[base[0]] = base[1]
+        if not bases:
+            return {}
+        target = content_id(text, self.key)
+        deltas = {}
+        for base_id, base_text in bases.items():
+            body = seal_delta(Delta(base_id, target, make_ops(base_text, text)), self.key, seq or 0, self.origin)
+            if len(body) < len(text) // 2:
+                deltas[base_id] = Envelope(BINARY_ROUTE, body, CONTENT_TYPE, base=(target, text))
+        return deltas
+
+    def _delta(self, update: Update) -> Update:
+        return update._replace(started_at=time.monotonic(), deltas=self.encode_deltas(update.text, update.seq))
+
+    @staticmethod
+    def _compress(update: Update) -> Update:
+        data = update.text.encode("utf-8")
+        flags, body = compress_payload(data)
+        return update._replace(size=len(data), flags=flags, body=body)
+
+    def _encrypt(self, update: Update) -> Update:
+        # Plain text frames and the JSON route both bind flags 0, this seq and origin.
+        aad = frame_aad(0, update.seq or 0, self.origin)
+        return update._replace(body=key_context(self.key).encrypt(update.flags, update.body, aad))
+
+    def _frame(self, update: Update) -> Update:
+        text, seq = update.text, update.seq
+        if not self.binary:
+            payload = {"data": base64.b64encode(update.body).decode()}
+            if self.origin:
+                payload["origin"] = self.origin
+            if seq is not None:
+                payload["seq"] = seq
+            envelope = Envelope("/clipboard", json.dumps(payload).encode(), "application/json")
+        elif self.announce_threshold is not None and self.content_cache is not None and update.size >= self.announce_threshold:
+            envelope = Envelope(BINARY_ROUTE, self._announce(update), CONTENT_TYPE)
+        else:
+            base = (content_id(text, self.key), text) if self.delta and len(text) >= DELTA_MIN_SIZE else None
+            envelope = Envelope(BINARY_ROUTE, encode_frame(update.body, seq or 0, self.origin), CONTENT_TYPE, base=base)
+        encoded_at = time.monotonic()
+        timings = {"encode_queue": update.started_at - update.queued_at, "encode": encoded_at - update.started_at}
+        for stage, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        return update._replace(envelope=envelope._replace(timings=timings, encoded_at=encoded_at))
+
+    def _announce(self, update: Update) -> bytes:
+        text = update.text
+        cid = content_id(text, self.key)
+        if cid not in self.content_cache:
+            self.content_cache.put(cid, encode_frame(update.body, update.seq or 0, self.origin))
+        preview = text[:ANNOUNCE_PREVIEW_CHARS].replace("\n", " ")
+        announcement = Announcement(cid, update.size, "text/plain", preview, self.content_port)
+        UPDATES.inc(stage="send", result="announced")
+        return seal_announcement(announcement, self.key, update.seq or 0, self.origin)
+
+    def _fan_out(self, update: Update) -> None:
+        envelope = update.envelope
+        for channel in self.channels:
+            base = channel.base
+            delta = update.deltas.get(base[0]) if base else None
+            if delta:
+                channel.enqueue(delta._replace(timings=envelope.timings, encoded_at=envelope.encoded_at, fallback=envelope))
+            else:
+                channel.enqueue(envelope)
@@ -0,0 +1,249 @@
+import base64
+import logging
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from clipboard_detect import ChangeDetector, ClipboardBackend, create_backend
+from config_store import ConfigStore, Settings, load_config
+from echo_suppress import DEFAULT_DEVICE_ID_PATH, DEFAULT_STATE_PATH, EchoSuppressor, default_origin
+from history import DEFAULT_HISTORY_PATH, ClipboardHistory, open_history
+from pipeline import Pipeline, Stage
+
+if TYPE_CHECKING:
+    from sender import ClipboardSender
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 30
+
+Status = Dict[str, Any]
+
+
+def create_sender(config: Optional[Dict[str, Any]], origin: str) -> Optional["ClipboardSender"]:
+    """Build a sender for the configured and discovered peers, or None if sync is not configured."""
+    if not config or not config.get("aes_key"):
+        return None
+    # Imported here so a service without peers never loads requests.
+    from content_cache import ContentCache
+    from discovery import create_discovery
+    from outbox import DEFAULT_OUTBOX_PATH, Outbox
+    from sender import ClipboardSender, load_peers
+
+    peers = load_peers(config)
+    discovery = create_discovery(config, origin)
+    if not peers and discovery is None:
+        return None
+    outbox = Outbox(DEFAULT_OUTBOX_PATH, history=config.get("outbox_history", 1))
+    return ClipboardSender(
+        peers, base64.b64decode(config["aes_key"]), origin=origin, outbox=outbox,
+        announce_threshold=config.get("announce_threshold"), content_cache=ContentCache(),
+        content_port=config.get("local_port", 5000), discovery=discovery,
+    )
+
+
+def make_preview(text: str, length: int = PREVIEW_LENGTH) -> str:
+    """Return a short single-line preview of clipboard text."""
+    preview = text[:length] + "..." if len(text) > length else text
+    return preview.replace("\n", " ")
+
+
+class SyncService:
+    """
+    Owns clipboard reading, hashing, encryption and sending on a background thread.
+
+    Each change goes through the detect, normalize (`prepare`) and dedup
+    stages on the service thread and is then handed to the sender's own
+    pipeline. Every change that is not an echo is also recorded in
+    `history`, if given.
+
+    With a `config_store`, the service watches the config file while it
+    runs and applies new keys and peers to the sender as they change,
+    creating the sender if sync was not configured before.
+
+    Front-ends never touch clipboard content: they only receive small status
+    dicts through `on_status`, called from the service thread, and are
+    expected to coalesce them onto their own UI thread.
+    """
+
+    def __init__(
+        self,
+        detector: ChangeDetector,
+        sender: Optional["ClipboardSender"] = None,
+        suppressor: Optional[EchoSuppressor] = None,
+        prepare: Callable[[str], str] = str.strip,
+        on_status: Optional[Callable[[Status], None]] = None,
+        error_delay: float = 1.0,
+        history: Optional[ClipboardHistory] = None,
+        config_store: Optional[ConfigStore] = None,
+    ):
+        self.detector = detector
+        self.sender = sender
+        self.suppressor = suppressor
+        self.prepare = prepare
+        self.on_status = on_status
+        self.error_delay = error_delay
+        self.history = history
+        self.config_store = config_store
+        self.changes = 0
+        self.pipeline = Pipeline([Stage("normalize", self._normalize), Stage("dedup", self._dedup)])
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if config_store:
+            config_store.subscribe(self.reconfigure)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        if self.sender:
+            self.sender.start()
+        if self.config_store:
+            self.config_store.start()
+        self._thread = threading.Thread(target=self._run, name="clipsync-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self.detector.notify()
+        if self.config_store:
+            self.config_store.stop(timeout)
+        if self._thread:
+            self._thread.join(timeout)
+        if self.sender:
+            self.sender.stop(timeout)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Stop for good and release the history; stop() alone can be followed by start()."""
+        self.stop(timeout)
+        if self.history is not None:
+            self.history.close()
+
+    def reconfigure(self, settings: Settings) -> None:
+        """Apply reloaded settings to the sender without restarting anything."""
+        sender = self.sender
+        if sender is None:
+            origin = self.suppressor.origin if self.suppressor else default_origin(settings.config)
+            sender = create_sender(settings.config, origin)
+            if sender is None:
+                return
+            if self.running:
+                sender.start()
+            self.sender = sender
+        else:
+            from sender import load_peers
+            sender.set_peers(load_peers(settings.config))
+        if settings.key:
+            sender.rekey(settings.key, settings.keys)
+        self._emit("reconfigured")
+
+    def _run(self) -> None:
+        self._emit("started")
+        while not self._stop.is_set():
+            try:
+                text = self.detector.poll()
+                if text is not None:
+                    self._handle_change(text)
+            except Exception as e:
+                logger.error("Clipboard sync error: %s", e)
+                self._emit("error", message=str(e))
+                self._stop.wait(self.error_delay)
+                continue
+            self.detector.wait()
+        self._emit("stopped")
+
+    def _normalize(self, text: str) -> str:
+        return self.prepare(text)
+
+    def _dedup(self, text: str) -> Optional[str]:
+        if self.suppressor and self.suppressor.is_echo(text):
+            self._emit("echo")
+            return None
+        return text
+
+    def _handle_change(self, text: str) -> None:
+        prepared = self.pipeline.process(text)
+        if prepared is None:
+            return
+        self.changes += 1
+        # Versioned even without peers, so a late remote update cannot replace it.
+        seq = self.suppressor.next_seq() if self.suppressor and prepared else None
+        if self.sender and prepared:
+            self.sender.send(prepared, seq)
+        if self.history is not None and prepared:
+            self.history.add(prepared)
+        self._emit("changed", length=len(text), preview=make_preview(text))
+
+    def _emit(self, event: str, **fields: Any) -> None:
+        if not self.on_status:
+            return
+        status: Status = {
+            "event": event,
+            "time": time.time(),
+            "changes": self.changes,
+            "suppressed": self.suppressor.suppressed if self.suppressor else 0,
+            "sent": self.sender.sent if self.sender else 0,
+            "failed": self.sender.failed if self.sender else 0,
+            "pending": self.sender.pending() if self.sender else 0,
+        }
+        status.update(fields)
+        try:
+            self.on_status(status)
+        except Exception as e:
+            logger.error("Status callback failed: %s", e)
+
+
+def create_service(
+    config: Optional[Dict[str, Any]],
+    backend: Optional[ClipboardBackend] = None,
+    state_path: Optional[str] = DEFAULT_STATE_PATH,
+    on_status: Optional[Callable[[Status], None]] = None,
+    history_path: Optional[str] = DEFAULT_HISTORY_PATH,
+    config_store: Optional[ConfigStore] = None,
+) -> SyncService:
+    """
+    Build a SyncService for `config` on the given or best available clipboard backend.
+
+    With a `config_store`, its current config is used instead and later
+    changes to the file are applied while the service runs.
+    """
+    if config_store:
+        config = config_store.config
+    detector = ChangeDetector(backend or create_backend(), min_interval=0.1, max_interval=2.0)
+    # Without a state file (tests, benchmarks) the device ID is not saved either.
+    origin = default_origin(config, DEFAULT_DEVICE_ID_PATH if state_path else None)
+    sender = create_sender(config, origin)
+    if sender is None:
+        logger.warning("No peers or key configured, changes will not be sent")
+    history = open_history(config, history_path)
+    service = SyncService(
+        detector, sender, EchoSuppressor(origin, path=state_path), on_status=on_status, history=history,
+        config_store=config_store,
+    )
+    if sender and config_store and config_store.settings and config_store.settings.key:
+        # The sealing key may still be the previous one during a rotation.
+        sender.rekey(config_store.settings.key, config_store.settings.keys)
+    return service
+
+
+def run_headless(service: SyncService) -> None:
+    """Run a service without any UI until interrupted or terminated."""
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    service.start()
+    logger.info("ClipSync daemon running")
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        logger.info("ClipSync daemon stopped")
@@ -0,0 +1,59 @@
+from content_cache import ContentCache, content_id
+from metrics import BYTES
+from receiver import start_receiver
+from sender import ClipboardSender
+import asyncio
+import base64
+import os
+import tempfile
+import threading
+import time
+import requests
+
+key = os.urandom(32)
+config = {"aes_key": base64.b64encode(key).decode()}
+applied = []
+loop = asyncio.new_event_loop()
+
+# Device A serves what it announces from its cache; device B receives
+cache_a = tempfile.mkdtemp()
+_, _, port_a = loop.run_until_complete(start_receiver(config, lambda t: None, "127.0.0.1", 0, None, cache_a, history_path=None))
+_, receiver_b, port_b = loop.run_until_complete(start_receiver(config, applied.append, "127.0.0.1", 0, None, tempfile.mkdtemp(), history_path=None))
+threading.Thread(target=loop.run_forever, daemon=True).start()
+
+sender = ClipboardSender([("127.0.0.1", port_b)], key, origin="device-a", announce_threshold=1024,
+                         content_cache=ContentCache(cache_a), content_port=port_a)
+sender.start()
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+big = "log line\n" * 100000
+sender.send("small", seq=1)
+sender.send(big, seq=2)
+assert wait_for(lambda: receiver_b.announced is not None), " Large copy was not announced"
+receiver_b.worker.wait_idle(2)
+assert applied == ["small"], " Large copy was pushed instead of announced"
+assert receiver_b.announced[0].size == len(big) and receiver_b.announced[0].preview.startswith("log line")
+
+# Only a local request makes B pull the content
+response = requests.post(f"http://127.0.0.1:{port_b}/clipboard/fetch")
+assert response.status_code == 202, response.text
+receiver_b.worker.wait_idle(2)
+assert applied[-1] == big
+
+# Announcing the same content again is served from B's cache without a fetch
+served = BYTES.value(direction="sent")
+sender.send("small again", seq=3)
+sender.send(big, seq=4)
+assert wait_for(lambda: len(applied) == 4 and receiver_b.worker.wait_idle(0.1)) and applied[-1] == big
+assert BYTES.value(direction="sent") - served < 10000, " Cached content was fetched again"
+
+assert requests.get(f"http://127.0.0.1:{port_a}/clipboard/content?id={'0' * 32}").status_code == 404
+assert requests.get(f"http://127.0.0.1:{port_a}/clipboard/content?id=../config").status_code == 400
+assert content_id(big, key) != content_id(big, os.urandom(32))
+sender.stop()
+print("Announce then fetch tests passed!!")
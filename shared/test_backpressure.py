@@ -0,0 +1,65 @@
+from receiver import start_receiver
+from sender import ClipboardSender
+from wire import CONTENT_TYPE, seal_text
+import asyncio
+import base64
+import os
+import socket
+import threading
+import time
+import requests
+
+key = os.urandom(32)
+config = {"aes_key": base64.b64encode(key).decode(), "max_body_size": 4 * 1024 * 1024, "max_pending_requests": 1}
+applied = []
+loop = asyncio.new_event_loop()
+_, receiver, port = loop.run_until_complete(start_receiver(config, applied.append, "127.0.0.1", 0, None, None, None, history_path=None))
+threading.Thread(target=loop.run_forever, daemon=True).start()
+url = f"http://127.0.0.1:{port}/clipboard/bin"
+
+# A body larger than the spill size arrives through a temporary file and still applies
+big = base64.b64encode(os.urandom(2 * 1024 * 1024)).decode()
+response = requests.post(url, data=seal_text(big, key, 1, "desktop"), headers={"Content-Type": CONTENT_TYPE})
+assert response.status_code == 202, response.text
+receiver.worker.wait_idle(2)
+assert applied == [big], " Spooled body was not applied"
+
+# Bodies over the limit are refused without being read
+response = requests.post(url, data=b"x" * (5 * 1024 * 1024), headers={"Content-Type": CONTENT_TYPE})
+assert response.status_code == 413, " Oversized body was accepted"
+
+# While a slow upload holds the only slot, other updates are told to come back later
+def hold_slot(length=1000):
+    slow = socket.create_connection(("127.0.0.1", port))
+    slow.sendall(f"POST /clipboard/bin HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode() + b"x" * 10)
+    deadline = time.time() + 2
+    while receiver.pending == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    return slow
+
+slow = hold_slot()
+response = requests.post(url, data=seal_text("busy", key, 2, "desktop"), headers={"Content-Type": CONTENT_TYPE})
+assert response.status_code == 429 and response.headers["Retry-After"] == "1", " Saturated receiver did not push back"
+receiver.max_pending = 2
+receiver.max_pending_bytes = 1500
+response = requests.post(url, data=b"x" * 1000, headers={"Content-Type": CONTENT_TYPE})
+assert response.status_code == 503 and response.headers["Retry-After"] == "1", " Byte budget was not enforced"
+slow.close()
+receiver.max_pending = 1
+
+# The sender waits as long as Retry-After asks before trying again
+slow = hold_slot()
+threading.Timer(0.5, slow.close).start()
+sender = ClipboardSender([("127.0.0.1", port)], key, origin="desktop", max_retries=3, backoff_base=0.01, backoff_max=0.05)
+sender.start()
+started = time.time()
+sender.send("after backoff", seq=3)
+deadline = time.time() + 5
+while sender.sent < 1 and time.time() < deadline:
+    time.sleep(0.01)
+elapsed = time.time() - started
+sender.stop()
+assert sender.sent == 1, " Update was not delivered once the receiver had room"
+assert elapsed >= 0.9, f" Sender retried after {elapsed:.2f}s despite Retry-After"
+
+print("Receiver backpressure tests passed!!")
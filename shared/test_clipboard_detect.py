@@ -0,0 +1,36 @@
+from clipboard_detect import ChangeDetector, FakeClipboard
+
+# Sequenced backend: unchanged token means the clipboard is never read
+clipboard = FakeClipboard("initial")
+detector = ChangeDetector(clipboard, min_interval=0.01, max_interval=0.5)
+detector.prime()
+
+reads = clipboard.reads
+assert detector.poll() is None
+assert clipboard.reads == reads, "Clipboard read despite unchanged sequence"
+
+clipboard.copy("hello")
+assert detector.poll() == "hello"
+
+# Re-copying identical content bumps the sequence but not the digest
+clipboard.copy("hello")
+assert detector.poll() is None
+
+# Polling backend: interval backs off while idle and resets on change
+polled = FakeClipboard("a", sequenced=False)
+detector = ChangeDetector(polled, min_interval=0.01, max_interval=0.08, backoff=2)
+assert detector.poll() == "a"
+for _ in range(10):
+    assert detector.poll() is None
+assert detector.next_interval() == 0.08, "Idle interval did not back off"
+polled.copy("b")
+assert detector.poll() == "b"
+assert detector.next_interval() == 0.01, "Interval did not reset after change"
+
+# Notifications wake a waiting detector immediately
+notified = []
+detector.on_notify = lambda: notified.append(True)
+polled.copy("c")
+assert notified and detector._wake.is_set()
+
+print("Clipboard change detection tests passed!!")
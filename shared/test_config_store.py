@@ -0,0 +1,96 @@
+from clipboard_detect import FakeClipboard
+from config_store import KEY_GRACE_SECONDS, ConfigStore
+from receiver import start_receiver
+from sync_service import create_service
+from wire import BINARY_ROUTE, CONTENT_TYPE, seal_text
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+
+old_key, new_key, other_key = os.urandom(32), os.urandom(32), os.urandom(32)
+path = os.path.join(tempfile.mkdtemp(), "config.json")
+
+
+def b64(key):
+    return base64.b64encode(key).decode()
+
+
+def write(config):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(config, f)
+    os.replace(f"{path}.tmp", path)
+
+
+# The parsed config is cached until the file changes, and a broken file keeps the last good one
+write({"aes_key": b64(old_key), "peers": [], "discovery": False})
+store = ConfigStore(path)
+seen = []
+store.subscribe(seen.append)
+assert store.settings.key == old_key and store.settings.keys == (old_key,)
+assert not store.check() and store.reloads == 1, " Unchanged config was reloaded"
+with open(path, "w") as f:
+    f.write('{"aes_key": ')
+assert not store.check() and store.settings.key == old_key, " Half-written config replaced the last good one"
+
+# A key edited by hand: the old key seals for the first half of the window, both open, then only the new one
+write({"aes_key": b64(new_key), "peers": [], "discovery": False})
+rotated = time.time()
+assert store.check(rotated) and seen[-1] is store.settings
+assert store.settings.key == old_key and store.settings.keys == (old_key, new_key)
+assert store.check(rotated + KEY_GRACE_SECONDS / 2 + 1) and store.settings.keys == (new_key, old_key)
+assert store.check(rotated + KEY_GRACE_SECONDS + 1) and store.settings.keys == (new_key,)
+
+# A rotation saved by setup_config.py is known to processes started during the window
+write({"aes_key": b64(new_key), "previous_aes_key": b64(old_key), "key_rotated_at": rotated, "discovery": False})
+assert ConfigStore(path).settings.keys == (old_key, new_key), " Recorded rotation was ignored"
+write({"aes_key": b64(new_key), "previous_aes_key": b64(old_key), "key_rotated_at": rotated - KEY_GRACE_SECONDS})
+assert ConfigStore(path).settings.keys == (new_key,)
+
+# A running receiver opens updates sealed with either key during the window
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+write({"aes_key": b64(old_key), "device_id": "phone"})
+receiver_store = ConfigStore(path)
+applied = []
+_, receiver, port = asyncio.run_coroutine_threadsafe(start_receiver(
+    None, applied.append, "127.0.0.1", 0, None, None, None, history_path=None, config_store=receiver_store), loop).result(5)
+url = f"http://127.0.0.1:{port}{BINARY_ROUTE}"
+
+
+def post(text, key, seq):
+    return requests.post(url, data=seal_text(text, key, seq, "desktop"), headers={"Content-Type": CONTENT_TYPE})
+
+
+assert post("before", old_key, 1).status_code == 202
+write({"aes_key": b64(new_key), "device_id": "phone", "max_pending_requests": 8, "max_body_size": 1024})
+rotated = time.time()
+receiver_store.check(rotated)
+assert receiver.max_pending == 8, " Reloaded limits were not applied"
+assert post(os.urandom(1024).hex(), new_key, 2).status_code == 413, " Reloaded body limit was not applied"
+assert post("late sender", old_key, 2).status_code == 202 and post("rotated sender", new_key, 3).status_code == 202
+assert post("stranger", other_key, 4).status_code == 400
+receiver_store.check(rotated + KEY_GRACE_SECONDS + 1)
+assert post("too late", old_key, 5).status_code == 400 and post("after", new_key, 6).status_code == 202
+receiver.worker.wait_idle(2)
+assert applied[0] == "before" and applied[-1] == "after", applied
+
+# A running service picks up a key and peers it did not have at start
+write({"discovery": False})
+service_store = ConfigStore(path)
+service = create_service(None, FakeClipboard(), state_path=None, history_path=None, config_store=service_store)
+assert service.sender is None
+write({"aes_key": b64(new_key), "peers": [{"ip": "127.0.0.1", "port": 9}], "discovery": False})
+service_store.check()
+sender = service.sender
+assert sender is not None and [c.peer for c in sender.channels] == [("127.0.0.1", 9)], " Sender was not created"
+write({"aes_key": b64(other_key), "peers": [{"ip": "127.0.0.1", "port": 10}], "discovery": False})
+service_store.check()
+assert service.sender is sender and [c.peer for c in sender.channels] == [("127.0.0.1", 10)], " Peers were not replaced"
+assert sender.key == new_key, " Sender stopped sealing with the previous key during the window"
+
+print("Config reload tests passed!!")
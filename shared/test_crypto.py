@@ -1,4 +1,4 @@
-from aes_crypto import encrypt, decrypt
+from codec import decode_text as decrypt, encode_text as encrypt
 import os
 
 key = os.urandom(32)  # AES-256 key
@@ -12,3 +12,46 @@ print("Decrypted:", decrypted)
 
 assert decrypted == message, " Decryption failed"
 print("AES encryption/decryption test passed!!")
+
+# Large, repetitive payloads are compressed before encryption
+log_text = "\n".join(f"2025-07-01 12:00:{i % 60:02d} INFO request handled in {i} ms" for i in range(500))
+compressed = encrypt(log_text, key)
+uncompressed = encrypt(log_text, key, compress=False)
+assert len(compressed) < len(uncompressed) / 3, " Compression did not shrink payload"
+assert decrypt(compressed, key) == log_text, " Compressed round trip failed"
+assert decrypt(uncompressed, key) == log_text, " Uncompressed round trip failed"
+print("Compression test passed!!")
+
+# Envelopes are authenticated, and unauthenticated AES-CBC (version 1) envelopes are refused
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from codec import decode, decode_many, encode, encode_many
+
+sealed = encode(b"envelope", key)
+assert sealed != encode(b"envelope", key), " Nonce was reused"
+for damaged in (sealed[:-1] + bytes([sealed[-1] ^ 1]), bytes([sealed[0], sealed[1] ^ 1]) + sealed[2:], sealed[:10]):
+    try:
+        decode(damaged, key)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(" Tampered envelope was accepted")
+
+iv = os.urandom(16)
+legacy = bytes((1, 0)) + iv + AES.new(key, AES.MODE_CBC, iv).encrypt(pad(b"downgrade", 16))
+try:
+    decode(legacy, key)
+except ValueError:
+    pass
+else:
+    raise AssertionError(" CBC envelope was accepted")
+
+items = [os.urandom(n) for n in (0, 1, 5000)] + [log_text.encode()]
+assert decode_many(encode_many(items, key), key) == items, " Batch round trip failed"
+try:
+    encode(b"x", os.urandom(20))
+except ValueError:
+    pass
+else:
+    raise AssertionError(" Invalid key length was accepted")
+print("Envelope codec test passed!!")
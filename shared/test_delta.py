@@ -0,0 +1,70 @@
+from delta import BaseCache, Delta, apply_ops, decode_delta, encode_delta, make_ops
+from metrics import BYTES, UPDATES
+from receiver import start_receiver
+from sender import ClipboardSender
+import asyncio
+import base64
+import os
+import random
+import threading
+import time
+
+rng = random.Random(1)
+document = "".join(f"line {i}: {rng.random()}\n" for i in range(50000))
+lines = document.splitlines(keepends=True)
+lines[10] = "edited near the top\n"
+lines[30000:30002] = ["replaced two lines\n"]
+lines.append("appended at the end")
+edited = "".join(lines)
+
+ops = make_ops(document, edited)
+assert apply_ops(document, ops) == edited, " Delta did not rebuild the text"
+assert len(encode_delta(Delta("a", "b", ops))) < 500, " Delta is not compact"
+assert decode_delta(encode_delta(Delta("a", "b", ops))).ops == ops
+assert apply_ops("", make_ops("", "new")) == "new" and apply_ops("old\n", make_ops("old\n", "")) == ""
+# Reordered lines diff in about linear time, where a quadratic matcher took minutes
+reordered = "".join(lines[::2] + lines[1::2])
+started = time.time()
+ops = make_ops(edited, reordered)
+assert time.time() - started < 2, " Diffing reordered lines was too slow"
+assert apply_ops(edited, ops) == reordered
+try:
+    apply_ops("short\n", [[0, 5]])
+except ValueError:
+    pass
+else:
+    raise AssertionError(" Delta for another base was applied")
+
+# Over the wire: the second copy is sent as a delta against what the peer acknowledged
+key = os.urandom(32)
+config = {"aes_key": base64.b64encode(key).decode()}
+applied = []
+received = []
+loop = asyncio.new_event_loop()
+_, receiver, port = loop.run_until_complete(start_receiver(config, applied.append, "127.0.0.1", 0, None, None, history_path=None))
+threading.Thread(target=loop.run_forever, daemon=True).start()
+
+def send(text, seq, timeout=5):
+    before = BYTES.value(direction="received")
+    count = len(applied) + 1
+    sender.send(text, seq)
+    deadline = time.time() + timeout
+    while (len(applied) < count or sender.sent < count) and time.time() < deadline:
+        time.sleep(0.01)
+    receiver.worker.wait_idle(2)
+    received.append(BYTES.value(direction="received") - before)
+
+sender = ClipboardSender([("127.0.0.1", port)], key, origin="desktop")
+sender.start()
+send(document, 1)
+send(edited, 2)
+assert applied == [document, edited]
+assert received[1] * 100 < received[0], f" Delta was not much smaller: {received}"
+
+# A peer that lost its base gets the update in full instead
+receiver.bases = BaseCache()
+send(document, 3)
+assert applied[-1] == document, " Fallback after a missing base failed"
+assert UPDATES.value(stage="send", result="delta_fallback") == 1
+sender.stop()
+print("Delta sync tests passed!!")
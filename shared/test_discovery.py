@@ -0,0 +1,101 @@
+from discovery import ANNOUNCE, Beacon, Discovery, PeerCache, beacon_key, encode_beacon
+from outbox import Outbox
+from receiver import start_receiver
+from sender import ClipboardSender
+import asyncio
+import base64
+import os
+import socket
+import tempfile
+import threading
+import time
+
+key = os.urandom(32)
+tmp = tempfile.mkdtemp()
+
+
+def free_port(kind=socket.SOCK_DGRAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+# Several peers on loopback find each other, and learn round-trip times from the replies
+names = ["desktop", "phone", "laptop"]
+ports = [free_port() for _ in names]
+targets = [("127.0.0.1", port) for port in ports]
+nodes = {
+    name: Discovery(key, name, 6000 + i, port, targets, PeerCache(os.path.join(tmp, f"{name}.json")), interval=60)
+    for i, (name, port) in enumerate(zip(names, ports))
+}
+for node in nodes.values():
+    node.start()
+for node in nodes.values():
+    node.announce()
+assert wait_for(lambda: all(len(node.cache.peers()) == 2 for node in nodes.values())), " Peers did not find each other"
+phone = nodes["desktop"].cache.get("phone")
+assert (phone.host, phone.port) == ("127.0.0.1", 6001) and wait_for(lambda: nodes["desktop"].cache.get("phone").rtt is not None)
+assert nodes["desktop"].cache.alive("phone")
+assert PeerCache(os.path.join(tmp, "desktop.json")).get("laptop").port == 6002, " Peer cache was not saved"
+
+# Forged and replayed beacons are ignored
+probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+forged = encode_beacon(Beacon(ANNOUNCE, "mallory", 6666, time.time(), os.urandom(16)), beacon_key(os.urandom(32)))
+valid = encode_beacon(Beacon(ANNOUNCE, "tablet", 6003, time.time(), os.urandom(16)), beacon_key(key))
+rejected = nodes["desktop"].rejected
+for raw in (forged, valid, valid):
+    probe.sendto(raw, targets[0])
+assert wait_for(lambda: nodes["desktop"].rejected == rejected + 2), " Forged or replayed beacon was accepted"
+assert nodes["desktop"].cache.get("mallory") is None and nodes["desktop"].cache.get("tablet") is not None
+for node in nodes.values():
+    node.stop()
+
+# A sender follows a peer to its new address at once instead of backing off
+applied = []
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+config = {"aes_key": base64.b64encode(key).decode(), "device_id": "phone"}
+_, receiver, http_port = asyncio.run_coroutine_threadsafe(
+    start_receiver(config, applied.append, "127.0.0.1", 0, None, None, None, history_path=None), loop).result(5)
+
+ports = [free_port(), free_port()]
+targets = [("127.0.0.1", port) for port in ports]
+dead_port = free_port(socket.SOCK_STREAM)
+desktop = Discovery(key, "desktop", 6000, ports[0], targets, interval=60)
+phone = Discovery(key, "phone", dead_port, ports[1], targets, interval=60)
+sender = ClipboardSender(
+    [], key, origin="desktop", outbox=Outbox(os.path.join(tmp, "outbox.log")), discovery=desktop,
+    max_retries=0, backoff_base=30, backoff_max=30,
+)
+phone.start()
+sender.start()
+assert wait_for(lambda: len(sender.channels) == 1), " Discovered peer got no channel"
+channel = sender.channels[0]
+assert channel.name == "phone"
+sender.send("while away", seq=1)
+assert wait_for(lambda: channel.stored() == 1), " Update for the unreachable address was not stored"
+
+phone.http_port = http_port
+started = time.time()
+phone.announce()
+assert wait_for(lambda: applied == ["while away"]), " Sender did not reconnect to the new address"
+assert time.time() - started < 2 and channel.peer == ("127.0.0.1", http_port)
+
+# A peer that went silent is skipped without connecting, then caught up when it is back
+sender.lost(nodes["desktop"].cache.get("phone"))
+failed = channel.failed
+sender.send("while silent", seq=2)
+assert wait_for(lambda: channel.failed == failed + 1 and channel.stored() == 1), " Offline peer was tried"
+sender.discovered(sender.discovery.cache.get("phone"))
+assert wait_for(lambda: applied[-1:] == ["while silent"]), " Peer was not caught up when it came back"
+sender.stop()
+phone.stop()
+
+print("LAN discovery tests passed!!")
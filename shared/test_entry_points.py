@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+scripts = ["windows/receive.py", "windows/send_file.py", "windows/watch_and_send.py", "android/receive.py", "android/watch_and_send.py"]
+if importlib.util.find_spec("kivy"):
+    scripts.append("android/floating_ui.py")
+
+# Every entry point imports cleanly, so a refactor of shared/ cannot break one unnoticed
+for script in scripts:
+    name = "entry_" + script.replace("/", "_")[:-3]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(root, script))
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+
+print("Entry point import tests passed!!")
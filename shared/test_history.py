@@ -0,0 +1,51 @@
+from history import ClipboardHistory
+import history as history_module
+import os
+import tempfile
+
+tmp = tempfile.mkdtemp()
+path = os.path.join(tmp, "history.log")
+
+box = ClipboardHistory(path, max_entries=3)
+first = box.add("alpha one", when=1.0)
+box.add("beta two", source="phone", when=2.0)
+box.add("gamma three", when=3.0)
+
+# Copying a text again reuses its entry and makes it the newest
+assert box.add("alpha one", when=4.0) == first, " Repeated copy was stored twice"
+assert [e.text for e in box.recent()] == ["alpha one", "gamma three", "beta two"]
+assert box.recent(since=2.5)[-1].text == "gamma three"
+assert box.get(first).time == 4.0 and box.get(first).source == "local"
+
+# The least recently used entry is evicted beyond the bound
+box.add("delta four", when=5.0)
+assert len(box) == 3 and [e.text for e in box.search("two")] == [], " Entry was not evicted"
+assert [e.text for e in box.search("a", prefix=True)] == ["alpha one"]
+assert [e.text for e in box.search("e")] == ["delta four", "alpha one", "gamma three"]
+assert box.search("zzz") == [] and box.get(999) is None
+
+# The index is rebuilt from the log, including touches and evictions
+box.close()
+box = ClipboardHistory(path, max_entries=3)
+assert [e.text for e in box.recent()] == ["delta four", "alpha one", "gamma three"], " History did not survive reopening"
+
+# A second handle on the same log (another process) sees new entries, and compaction
+other = ClipboardHistory(path, max_entries=3)
+entry_id = other.add("from the receiver 👋", source="laptop")
+assert box.get(entry_id).text == "from the receiver 👋" and box.get(entry_id).source == "laptop"
+box.compact()
+assert os.path.getsize(path) == box.size(), " Compaction kept dead records"
+assert [e.text for e in other.recent()] == [e.text for e in box.recent()], " Other handle missed the compaction"
+other.close()
+box.close()
+
+# Dead records are compacted away automatically and disk use stays bounded
+history_module.COMPACT_MIN_BYTES = 64 * 1024
+box = ClipboardHistory(os.path.join(tmp, "bounded.log"), max_bytes=256 * 1024)
+for i in range(200):
+    box.add(f"{i} " + "x" * 4096)
+assert box.size() < 2 * 256 * 1024 + 64 * 1024, " History grew without bound"
+assert box.recent(1)[0].text.startswith("199 ")
+box.close()
+
+print("Clipboard history tests passed!!")
@@ -0,0 +1,49 @@
+from metrics import STAGE_SECONDS, TIMING_HEADER, Registry, format_timing, parse_timing
+from receiver import start_receiver
+from wire import BINARY_ROUTE, CONTENT_TYPE, seal_text
+import asyncio
+import base64
+import os
+import threading
+import time
+import requests
+
+# Only known stages with finite, non-negative values survive parsing
+timings = parse_timing("encode=0.5,send_queue=nan,encode_queue=-1,bogus=1,sent=12.5,encode_queue=inf,broken")
+assert timings == {"encode": 0.5, "sent": 12.5}, timings
+assert parse_timing(format_timing({"encode_queue": 0.25, "encode": 0.001}, 100.0)) == {"encode_queue": 0.25, "encode": 0.001, "sent": 100.0}
+
+# Label values are escaped, so no value can break the exposition format
+registry = Registry()
+counter = registry.counter("test_total", "Escaping test.", ["name"])
+counter.inc(name='a"}\\\nb')
+assert 'test_total{name="a\\"}\\\\\\nb"} 1' in registry.render(), registry.render()
+
+# Remote timings are recorded only for updates that open, and never under new names
+key = os.urandom(32)
+config = {"aes_key": base64.b64encode(key).decode(), "device_id": "phone"}
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+_, receiver, port = asyncio.run_coroutine_threadsafe(
+    start_receiver(config, lambda text: None, "127.0.0.1", 0, None, None, None, history_path=None), loop).result(5)
+url = f"http://127.0.0.1:{port}{BINARY_ROUTE}"
+
+
+def post(body, header):
+    return requests.post(url, data=body, headers={"Content-Type": CONTENT_TYPE, TIMING_HEADER: header})
+
+
+def remote_count():
+    return sum(line.startswith("clipsync_stage_seconds_count") and "remote_" in line for line in STAGE_SECONDS.render())
+
+
+before = remote_count()
+forged = seal_text("forged", os.urandom(32), int(time.time() * 1000), "desktop")
+assert post(forged, "encode=0.1,spam1=1,spam2=2").status_code == 400
+assert remote_count() == before, " Timings of an update that did not open were recorded"
+assert post(seal_text("real", key, int(time.time() * 1000), "desktop"), "encode=0.1,spam3=1").status_code == 202
+series = [line for line in STAGE_SECONDS.render() if line.startswith("clipsync_stage_seconds_count") and "remote_" in line]
+assert any('stage="remote_encode"' in line for line in series) and not any("spam" in line for line in series), series
+receiver.worker.wait_idle(2)
+
+print("Metrics tests passed!!")
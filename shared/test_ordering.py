@@ -0,0 +1,89 @@
+from clipboard_detect import digest
+from receiver import start_receiver
+from wire import BATCH_ROUTE, BINARY_ROUTE, CONTENT_TYPE, decode_frame, encode_frame, seal_text
+import asyncio
+import base64
+import os
+import threading
+import time
+import requests
+
+key = os.urandom(32)
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+
+
+def start(device_id):
+    applied = []
+    config = {"aes_key": base64.b64encode(key).decode(), "device_id": device_id}
+    future = asyncio.run_coroutine_threadsafe(
+        start_receiver(config, applied.append, "127.0.0.1", 0, None, None, None, history_path=None), loop)
+    _, receiver, port = future.result(5)
+    return receiver, f"http://127.0.0.1:{port}", applied
+
+
+def post(url, body, route=BINARY_ROUTE):
+    return requests.post(url + route, data=body, headers={"Content-Type": CONTENT_TYPE})
+
+
+phone, phone_url, phone_applied = start("phone")
+laptop, laptop_url, laptop_applied = start("laptop")
+
+# Both devices copy at once with the same clock; both settle on the same winner in one round
+clock = int(time.time() * 1000) + 10 ** 6
+phone.suppressor._seq = laptop.suppressor._seq = clock - 1
+assert phone.suppressor.next_seq() == laptop.suppressor.next_seq() == clock
+assert post(phone_url, seal_text("from laptop", key, clock, "laptop")).json()["status"] == "stale"
+assert post(laptop_url, seal_text("from phone", key, clock, "phone")).status_code == 202
+laptop.worker.wait_idle(2)
+assert laptop_applied == ["from phone"] and phone_applied == [], " Devices did not agree on one value"
+
+# A late retry of an older update is dropped
+response = post(phone_url, seal_text("late", key, clock - 5, "desktop"))
+assert response.status_code == 200 and response.json()["status"] == "stale", " Stale update was applied"
+# An older version is dropped before its body is decrypted; lowering a header's version only gets it dropped
+response = post(phone_url, encode_frame(b"not decrypted", clock - 6, "desktop"))
+assert response.status_code == 200 and response.json()["status"] == "stale", " Stale update was decrypted"
+
+# A captured body replayed under a rewritten version neither applies nor moves the clock
+captured = decode_frame(seal_text("captured", key, clock - 4, "desktop"))
+for seq, origin in ((2 ** 64 - 1, "desktop"), (clock + 10, "desktop"), (clock, "zzz")):
+    response = post(phone_url, encode_frame(captured.body, seq, origin))
+    assert response.status_code == 400, f" Rewritten header {seq, origin} was accepted"
+assert post(phone_url, seal_text("far ahead", key, 2 ** 63, "desktop")).status_code == 400, " Implausible version accepted"
+assert phone.suppressor._seq == clock, " Clock was pushed by a rejected update"
+
+# Newer updates apply and move the local clock past them
+assert post(phone_url, seal_text("newer", key, clock + 1, "desktop")).status_code == 202
+phone.worker.wait_idle(2)
+assert phone_applied == ["newer"] and phone.suppressor.next_seq() > clock + 1
+
+# In a replayed batch only the newest frame is decrypted and applied
+clock = phone.suppressor.next_seq()
+batch = encode_frame(b"garbage", clock + 1, "desktop") + seal_text("newest", key, clock + 2, "desktop")
+response = post(phone_url, batch, BATCH_ROUTE)
+assert response.status_code == 202 and response.json()["count"] == 1, response.text
+phone.worker.wait_idle(2)
+assert phone_applied[-1] == "newest"
+
+# An update is known as an echo before the clipboard write starts, and forgotten if the write fails
+echoes = []
+
+
+def write_clipboard(text):
+    echoes.append(digest(text).hex() in [entry[0] for entry in tablet.suppressor._applied])
+    if text == "unwritable":
+        raise OSError("clipboard busy")
+
+
+config = {"aes_key": base64.b64encode(key).decode(), "device_id": "tablet"}
+_, tablet, tablet_port = asyncio.run_coroutine_threadsafe(
+    start_receiver(config, write_clipboard, "127.0.0.1", 0, None, None, None, history_path=None), loop).result(5)
+clock = tablet.suppressor.next_seq()
+for offset, text in enumerate(("written", "unwritable"), 1):
+    assert post(f"http://127.0.0.1:{tablet_port}", seal_text(text, key, clock + offset, "desktop")).status_code == 202
+    tablet.worker.wait_idle(2)
+assert echoes == [True, True], " Echo was recorded only after the clipboard write"
+assert tablet.suppressor.is_echo("written") and not tablet.suppressor.is_echo("unwritable"), " Failed write was kept as an echo"
+
+print("Causal ordering tests passed!!")
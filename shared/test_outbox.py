@@ -0,0 +1,89 @@
+from outbox import Outbox, OutboxEntry
+import outbox as outbox_module
+from sender import ClipboardSender
+from wire import BATCH_ROUTE, decode_batch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import socket
+import tempfile
+import threading
+import time
+
+tmp = tempfile.mkdtemp()
+path = os.path.join(tmp, "outbox.log")
+
+# Newer entries supersede older ones beyond the history bound
+box = Outbox(path, history=2)
+for i in range(5):
+    box.append("phone:9000", "/clipboard/bin", "application/octet-stream", b"update %d" % i)
+box.append("laptop:9000", "/clipboard", "application/json", b"{}")
+assert [e.body for e in box.pending("phone:9000")] == [b"update 3", b"update 4"]
+box.close()
+
+# The index is rebuilt from the log, and a partial record left by a crash is dropped
+with open(path, "ab") as f:
+    f.write(b"\x01\x05")
+box = Outbox(path, history=2)
+entries = box.pending("phone:9000")
+assert [e.body for e in entries] == [b"update 3", b"update 4"], " Outbox did not survive reopening"
+assert box.pending("laptop:9000") == [OutboxEntry(entries[-1].id + 1, "/clipboard", "application/json", b"{}")]
+assert os.path.getsize(path) == box.size()
+
+box.ack("phone:9000", entries[-1].id)
+assert box.count("phone:9000") == 0 and box.count("laptop:9000") == 1
+box.compact()
+assert os.path.getsize(path) == box.size() < 100, " Compaction kept dead records"
+box.close()
+assert Outbox(path).count("laptop:9000") == 1
+
+# Dead records are compacted away automatically
+outbox_module.COMPACT_MIN_BYTES = 64 * 1024
+box = Outbox(os.path.join(tmp, "auto.log"))
+for i in range(100):
+    box.append("phone:9000", "/clipboard/bin", "application/octet-stream", os.urandom(4096))
+assert box.size() < 2 * outbox_module.COMPACT_MIN_BYTES, " Outbox grew without compacting"
+box.close()
+
+# An offline peer gets every stored update in one batch when it comes back
+received = []
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        received.append((self.path, self.rfile.read(int(self.headers["Content-Length"]))))
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+
+box = Outbox(os.path.join(tmp, "replay.log"), history=3)
+sender = ClipboardSender([("127.0.0.1", port)], os.urandom(32), origin="desktop", outbox=box,
+                         max_retries=0, backoff_base=0.05, backoff_max=0.2, timeout=1)
+sender.start()
+for seq in range(1, 6):
+    sender.send(f"offline copy {seq}", seq=seq)
+deadline = time.time() + 5
+while (box.count(f"127.0.0.1:{port}") < 3 or sender.channels[0].pending()) and time.time() < deadline:
+    time.sleep(0.01)
+assert box.count(f"127.0.0.1:{port}") == 3, " Updates for an offline peer were not stored"
+
+server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+deadline = time.time() + 5
+while not received and time.time() < deadline:
+    time.sleep(0.01)
+time.sleep(0.1)
+sender.stop()
+server.shutdown()
+
+assert len(received) == 1 and received[0][0] == BATCH_ROUTE, " Stored updates were not sent as one batch"
+assert [f.seq for f in decode_batch(received[0][1])] == [3, 4, 5]
+assert box.count(f"127.0.0.1:{port}") == 0 and sender.health()[f"127.0.0.1:{port}"]["healthy"]
+print("Offline outbox tests passed!!")
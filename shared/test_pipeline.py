@@ -0,0 +1,63 @@
+from pipeline import Pipeline, Stage
+from sender import ClipboardSender
+from wire import decode_frame, open_frame
+import os
+import threading
+
+# Stages run in order on their own threads; None or an exception drops the item
+release = threading.Event()
+done = []
+
+def slow_double(n):
+    release.wait(5)
+    return n * 2
+
+def check(n):
+    if n == 6:
+        raise ValueError("rejected")
+    return n or None
+
+pipeline = Pipeline([Stage("double", slow_double), Stage("check", check), Stage("collect", done.append)], queue_size=2)
+assert pipeline.process(2) is None and done == [4], " Inline run did not go through every stage"
+done.clear()
+pipeline.start()
+for n in range(6):
+    pipeline.submit(n)
+release.set()
+assert pipeline.wait_idle(5) and pipeline.pending() == 0
+pipeline.stop()
+assert pipeline.dropped >= 3, " Full queue did not drop the oldest items"
+assert done and done[-1] == 10 and 6 not in done, done
+
+# The sender's stages hand frames to whatever transport it is given
+key = os.urandom(32)
+
+
+class MemoryTransport:
+    def __init__(self, peer, **options):
+        self.name, self.base, self.sent, self.failed = f"{peer[0]}:{peer[1]}", None, 0, 0
+        self.frames = []
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=2.0):
+        pass
+
+    def enqueue(self, envelope):
+        self.frames.append(envelope.body)
+        self.sent += 1
+
+    def pending(self):
+        return 0
+
+
+sender = ClipboardSender([("phone", 1), ("laptop", 2)], key, origin="desktop", transport=MemoryTransport)
+sender.start()
+sender.send("through every stage " * 100, seq=7)
+sender.pipeline.wait_idle(5)
+sender.stop()
+frames = [decode_frame(channel.frames[0]) for channel in sender.channels]
+assert frames[0] == frames[1] and frames[0].seq == 7 and frames[0].origin == "desktop", " Update was not framed once for all peers"
+assert open_frame(frames[0], key) == "through every stage " * 100
+print("Pipeline tests passed!!")
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from sender import ClipboardSender, PeerChannel
+from wire import decode_frame
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import socket
+import threading
+import time
+
+key = os.urandom(32)
+received = []
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        received.append((self.server.server_address[1], body))
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+servers = [ThreadingHTTPServer(("127.0.0.1", 0), Handler) for _ in range(2)]
+for server in servers:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+# A port with nothing listening stands in for an offline phone
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    dead_port = s.getsockname()[1]
+
+peers = [("127.0.0.1", dead_port)] + [("127.0.0.1", server.server_address[1]) for server in servers]
+sender = ClipboardSender(peers, key, origin="desktop", backoff_base=0.5, timeout=1)
+sender.start()
+sender.send("Hello from ClipSync!", seq=1)
+
+deadline = time.time() + 2
+dead = f"127.0.0.1:{dead_port}"
+while (len(received) < 2 or not sender.health()[dead]["last_error"]) and time.time() < deadline:
+    time.sleep(0.01)
+health = sender.health()
+sender.stop()
+for server in servers:
+    server.shutdown()
+
+# Live peers get the update despite the dead one, and it was encrypted once
+assert len(received) == 2, " Live peers did not receive the update"
+assert received[0][1] == received[1][1], " Update was encrypted per peer"
+assert decode_frame(received[0][1]).seq == 1
+assert health[dead]["last_error"], " Dead peer error was not recorded"
+
+# Concurrent posts on one channel each get their own status and Retry-After
+class StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        status = int(self.path.strip("/"))
+        self.send_response(status)
+        if status == 503:
+            self.send_header("Retry-After", "7")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+status_server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+threading.Thread(target=status_server.serve_forever, daemon=True).start()
+channel = PeerChannel(("127.0.0.1", status_server.server_address[1]))
+routes = ["/202", "/409", "/503"] * 20
+with ThreadPoolExecutor(8) as pool:
+    results = list(pool.map(lambda route: channel._post(route, b"x", {}), routes))
+for route, result in zip(routes, results):
+    status = int(route.strip("/"))
+    assert result.status == status, " Post result was overwritten by another thread"
+    assert result.ok == {202: True, 409: False, 503: None}[status]
+    assert result.retry_after == (7 if status == 503 else None)
+assert channel.last_error in ("HTTP 409", "HTTP 503")
+channel.session.close()
+status_server.shutdown()
+print("Multi-peer fan-out test passed!!")
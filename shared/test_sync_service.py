@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from clipboard_detect import ChangeDetector, FakeClipboard
+from echo_suppress import EchoSuppressor, default_origin
+from history import ClipboardHistory
+from sync_service import SyncService, create_service, make_preview
+
+statuses = []
+changed = threading.Event()
+
+
+def on_status(status):
+    statuses.append(status)
+    if status["event"] in ("changed", "echo"):
+        changed.set()
+
+
+clipboard = FakeClipboard("initial")
+detector = ChangeDetector(clipboard, min_interval=0.01, max_interval=0.05)
+detector.prime()
+suppressor = EchoSuppressor("this-device")
+history = ClipboardHistory(os.path.join(tempfile.mkdtemp(), "history.log"))
+service = SyncService(detector, suppressor=suppressor, on_status=on_status, history=history)
+service.start()
+assert service.running
+
+# Status callbacks only carry a preview, never the full content
+big = "x" * (10 * 1024 * 1024)
+clipboard.copy(big)
+assert changed.wait(5), "Change never reported"
+status = statuses[-1]
+assert status["event"] == "changed" and status["length"] == len(big)
+assert status["preview"] == make_preview(big) and len(status["preview"]) < 40
+
+# Updates applied from a peer are reported as echoes, not changes
+changed.clear()
+suppressor.record_applied("from peer", "other-device", 1)
+clipboard.copy("from peer")
+assert changed.wait(5), "Echo never reported"
+assert statuses[-1]["event"] == "echo" and service.changes == 1
+
+# Local changes are kept in the history, echoes are not
+assert [len(e.text) for e in history.recent()] == [len(big)], " History missed a change or kept an echo"
+
+service.stop()
+assert not service.running and statuses[-1]["event"] == "stopped"
+
+# Stopped and started again, as the floating UI's toggle does, the service still records changes
+changed.clear()
+service.start()
+clipboard.copy("after restart")
+assert changed.wait(5), "Change after restart never reported"
+assert statuses[-1]["event"] == "changed" and history.recent()[0].text == "after restart", " History was closed by stop()"
+service.close()
+assert not service.running
+
+# A receiver and a watcher sharing the echo state file lose none of each other's entries
+state_path = os.path.join(tempfile.mkdtemp(), "echo_state.json")
+receivers = [EchoSuppressor("this-device", capacity=1000, path=state_path) for _ in range(2)]
+writers = [
+    threading.Thread(target=lambda s=s, n=n: [s.record_applied(f"{n}-{i}", "peer", i) for i in range(100)])
+    for n, s in enumerate(receivers)
+]
+for writer in writers:
+    writer.start()
+for writer in writers:
+    writer.join()
+watcher = EchoSuppressor("this-device", capacity=1000, path=state_path)
+assert all(watcher.is_echo(f"{n}-{i}") for n in range(2) for i in range(100)), " Concurrent echo records were lost"
+
+# Each device gets its own ID, kept outside the config that is copied between devices
+id_path = os.path.join(tempfile.mkdtemp(), ".device_id")
+shared_config = {"aes_key": "not used"}
+device_id = default_origin(shared_config, id_path)
+assert default_origin(shared_config, id_path) == device_id and "device_id" not in shared_config
+assert default_origin(shared_config, os.path.join(tempfile.mkdtemp(), ".device_id")) != device_id, " Copied config shares an origin"
+assert default_origin({"device_id": "desktop"}, id_path) == "desktop"
+
+# Without peers the daemon needs no sender, so the HTTP stack is never imported
+headless = create_service(None, FakeClipboard(), state_path=None, history_path=None)
+assert headless.sender is None
+loaded = subprocess.run(
+    [sys.executable, "-c", "import sys, sync_service; print('requests' in sys.modules)"],
+    cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+).stdout.strip()
+assert loaded == "False", "sync_service imported requests"
+
+print("Sync service tests passed!!")
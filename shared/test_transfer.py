@@ -0,0 +1,68 @@
+from receiver import start_receiver
+from sender import ClipboardSender
+from transfer import IMAGE, Manifest, Payload, TransferStore, Upload, seal_chunk
+import asyncio
+import base64
+import os
+import tempfile
+import threading
+
+key = os.urandom(32)
+
+# Chunks are verified and a restarted receiver resumes from what it stored
+spool_dir = tempfile.mkdtemp()
+upload = Upload(Payload(IMAGE, "image/png", "shot.png", os.urandom(300000)), key, chunk_size=65536)
+manifest = upload.manifest
+store = TransferStore(spool_dir)
+assert store.begin(manifest) == [] and manifest.chunks == 5
+store.write_chunk(manifest.id, 0, upload.chunk(0), key)
+store.write_chunk(manifest.id, 3, upload.chunk(3), key)
+other = "0" * 32  # the same chunk sealed for another transfer
+for index, sealed in ((1, upload.chunk(2)), (1, upload.chunk(1)[:-1] + b"\x00"), (9, upload.chunk(1)), (1, seal_chunk(upload.payload.data[65536:131072], key, other, 1))):
+    try:
+        store.write_chunk(manifest.id, index, sealed, key)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(" Misplaced or tampered chunk was accepted")
+
+resumed = Upload(upload.payload, key, chunk_size=65536)
+store = TransferStore(spool_dir)
+assert store.begin(resumed.manifest) == [0, 3], " Stored chunks were not resumed"
+assert not store.write_chunk(manifest.id, 1, resumed.chunk(1), key)
+assert not store.write_chunk(manifest.id, 2, resumed.chunk(2), key)
+assert store.write_chunk(manifest.id, 4, resumed.chunk(4), key)
+assert store.finish(manifest.id, key) == upload.payload
+assert os.listdir(spool_dir) == []
+
+# Over the wire: a 20 MB screenshot survives dropped chunks without restarting
+config = {"aes_key": base64.b64encode(key).decode()}
+received = []
+loop = asyncio.new_event_loop()
+_, receiver, port = loop.run_until_complete(start_receiver(
+    config, lambda text: None, "127.0.0.1", 0, None, None, tempfile.mkdtemp(), received.append, history_path=None))
+threading.Thread(target=loop.run_forever, daemon=True).start()
+
+writes = []
+failures = {7, 21, 55}
+write_chunk = receiver.transfers.write_chunk
+
+def flaky_write(transfer_id, index, sealed, key):
+    writes.append(index)
+    if index in failures:
+        failures.discard(index)
+        raise ConnectionError("Wi-Fi blip")
+    return write_chunk(transfer_id, index, sealed, key)
+
+receiver.transfers.write_chunk = flaky_write
+screenshot = Payload(IMAGE, "image/png", "screenshot.png", os.urandom(20 * 1024 * 1024))
+sender = ClipboardSender([("127.0.0.1", port)], key, origin="desktop", backoff_base=0.05)
+sender.start()
+sender.send_payload(screenshot, chunk_size=256 * 1024)
+assert sender.wait_transfers(60), " Transfer did not finish"
+sender.stop()
+
+assert received == [screenshot], " Screenshot was not delivered intact"
+assert len(writes) == 80 + 3, f" Transfer restarted instead of resuming ({len(writes)} chunk posts)"
+assert sender.channels[0].transfers_sent == 1
+print("Chunked transfer tests passed!!")
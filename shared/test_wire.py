@@ -0,0 +1,44 @@
+from wire import HEADER, decode_batch, decode_frame, encode_frame, open_frame, open_frames, seal_text
+import os
+
+key = os.urandom(32)
+message = "Hello from ClipSync! 👋"
+
+raw = seal_text(message, key, seq=42, origin="desktop")
+frame = decode_frame(raw)
+assert frame.seq == 42 and frame.origin == "desktop"
+assert open_frame(frame, key) == message, " Frame round trip failed"
+
+# The header is sealed with the body: rewriting its seq, origin or flags breaks the frame
+for rewritten in (frame._replace(seq=2 ** 64 - 1), frame._replace(origin="laptop"), frame._replace(flags=1)):
+    try:
+        open_frame(decode_frame(encode_frame(rewritten.body, rewritten.seq, rewritten.origin, rewritten.flags)), key)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(" Rewritten header was accepted")
+
+# Header overhead is fixed and there is no base64 inflation
+body = os.urandom(4096)
+assert len(encode_frame(body)) == HEADER.size + len(body)
+
+for bad in (raw[:HEADER.size - 1], b"XX" + raw[2:], raw + b"\x00"):
+    try:
+        decode_frame(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(" Malformed frame was accepted")
+
+# Batches are frames back to back, oldest first
+batch = raw + seal_text("newer", key, seq=43, origin="desktop")
+assert [f.seq for f in decode_batch(batch)] == [42, 43]
+assert open_frames(decode_batch(batch), key) == [message, "newer"], " Batch did not decrypt"
+try:
+    decode_batch(batch[:-1])
+except ValueError:
+    pass
+else:
+    raise AssertionError(" Truncated batch was accepted")
+
+print("Binary wire protocol test passed!!")
@@ -0,0 +1,275 @@
+import json
+import logging
+import mimetypes
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from codec import decode, encode
+from content_cache import bytes_id
+from wire import Frame, encode_frame, frame_aad, open_body
+
+logger = logging.getLogger(__name__)
+
+# Typed payloads are sent as a chunked transfer instead of a single frame:
+#
+#   POST /transfer                       encrypted Manifest in a wire frame;
+#                                        answers {"have": [...], "complete": bool}
+#   POST /transfer/chunk?id=..&index=..  one seal_chunk() envelope
+#
+# Chunks can arrive in any order and in parallel. The receiver spools them to
+# disk and records every stored index, so after a drop the sender posts the
+# manifest again and only uploads the chunks missing from "have". Chunks are
+# codec envelopes with the transfer ID and chunk index as associated data, so
+# a chunk only opens at its own place in its own transfer.
+TRANSFER_ROUTE = "/transfer"
+CHUNK_ROUTE = "/transfer/chunk"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_TRANSFER_SIZE = 256 * 1024 * 1024
+
+TEXT = "text"
+IMAGE = "image"
+FILE = "file"
+
+DEFAULT_TRANSFER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".transfers")
+DEFAULT_RECEIVED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "received")
+
+INDEX = struct.Struct("!I")
+
+
+class Payload(NamedTuple):
+    """Typed clipboard content."""
+    kind: str
+    mime: str
+    name: str
+    data: bytes
+
+
+class Manifest(NamedTuple):
+    """Everything a receiver needs to accept the chunks of one payload."""
+    id: str
+    kind: str
+    mime: str
+    name: str
+    size: int
+    chunk_size: int
+
+    @property
+    def chunks(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size) if self.size else 0
+
+
+def payload_from_file(path: str) -> Payload:
+    """Read a file as an image or file payload, by its MIME type."""
+    mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    with open(path, "rb") as f:
+        data = f.read()
+    return Payload(IMAGE if mime.startswith("image/") else FILE, mime, os.path.basename(path), data)
+
+
+def seal_manifest(manifest: Manifest, key: bytes, seq: int = 0, origin: Optional[str] = None) -> bytes:
+    body = json.dumps(manifest._asdict()).encode("utf-8")
+    return encode_frame(encode(body, key, compress=False, aad=frame_aad(0, seq, origin)), seq, origin)
+
+
+def open_manifest(frame: Frame, key: bytes) -> Manifest:
+    """Decrypt a manifest frame, raising ValueError if it is malformed."""
+    try:
+        fields = json.loads(open_body(frame, key))
+        manifest = Manifest(
+            str(fields["id"]), str(fields["kind"]), str(fields["mime"]), os.path.basename(str(fields["name"])),
+            int(fields["size"]), int(fields["chunk_size"]),
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed manifest: {e}")
+    if manifest.chunk_size <= 0 or manifest.size < 0:
+        raise ValueError("Malformed manifest")
+    return manifest
+
+
+def chunk_aad(transfer_id: str, index: int) -> bytes:
+    """The associated data that binds a chunk to its transfer and position."""
+    return transfer_id.encode("ascii") + INDEX.pack(index)
+
+
+def seal_chunk(data: bytes, key: bytes, transfer_id: str, index: int) -> bytes:
+    return encode(data, key, aad=chunk_aad(transfer_id, index))
+
+
+def open_chunk(sealed: bytes, key: bytes, transfer_id: str, index: int) -> bytes:
+    """Decrypt a chunk, raising ValueError if it was tampered with or belongs elsewhere."""
+    return decode(sealed, key, chunk_aad(transfer_id, index))
+
+
+class Upload:
+    """
+    The sending side of one transfer.
+
+    Chunks are encrypted on first use and kept, so every peer and every
+    resumed attempt reuses the same ciphertext.
+    """
+
+    def __init__(self, payload: Payload, key: bytes, seq: int = 0, origin: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.payload = payload
+        self.key = key
+        self.manifest = Manifest(
+            bytes_id(payload.data, key), payload.kind, payload.mime, payload.name,
+            len(payload.data), chunk_size,
+        )
+        self.frame = seal_manifest(self.manifest, key, seq, origin)
+        self._chunks: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+
+    def chunk(self, index: int) -> bytes:
+        with self._lock:
+            sealed = self._chunks.get(index)
+        if sealed is None:
+            start = index * self.manifest.chunk_size
+            sealed = seal_chunk(self.payload.data[start:start + self.manifest.chunk_size], self.key, self.manifest.id, index)
+            with self._lock:
+                self._chunks[index] = sealed
+        return sealed
+
+
+class _Spool:
+    def __init__(self, manifest: Manifest, base: str):
+        self.manifest = manifest
+        self.part_path = base + ".part"
+        self.acks_path = base + ".acks"
+        self.have: Set[int] = set()
+        self.lock = threading.Lock()
+
+
+class TransferStore:
+    """
+    Receiver-side spool for incoming transfers.
+
+    Each transfer is a preallocated .part file that chunks are written into
+    at their offset, plus an append-only .acks file holding the chunk size
+    and then every stored index, so a transfer resumes where it stopped even
+    after the receiver restarts.
+    Spools untouched for `expire_after` seconds are removed.
+    """
+
+    def __init__(self, directory: str = DEFAULT_TRANSFER_DIR, max_size: int = MAX_TRANSFER_SIZE, expire_after: float = 24 * 3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.expire_after = expire_after
+        self._spools: Dict[str, _Spool] = {}
+        self._completed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._expire()
+
+    def begin(self, manifest: Manifest) -> List[int]:
+        """Start or resume a transfer; returns the chunk indices already stored."""
+        if manifest.size > self.max_size:
+            raise ValueError(f"Transfer of {manifest.size} bytes exceeds {self.max_size}")
+        if len(manifest.id) != 32 or any(c not in "0123456789abcdef" for c in manifest.id):
+            raise ValueError("Invalid transfer ID")
+        with self._lock:
+            spool = self._spools.get(manifest.id)
+            if spool and (spool.manifest.size, spool.manifest.chunk_size) != (manifest.size, manifest.chunk_size):
+                spool = None
+            if spool is None:
+                spool = self._spools[manifest.id] = _Spool(manifest, os.path.join(self.directory, manifest.id))
+                self._open(spool)
+            # A resent manifest may carry a new name; the stored chunks are still valid.
+            spool.manifest = manifest
+            return sorted(spool.have)
+
+    def is_complete(self, transfer_id: str) -> bool:
+        return transfer_id in self._completed
+
+    def write_chunk(self, transfer_id: str, index: int, sealed: bytes, key: bytes) -> bool:
+        """Verify and store one chunk; returns True if it was the last one missing."""
+        spool = self._spools.get(transfer_id)
+        if spool is None:
+            raise KeyError(transfer_id)
+        manifest = spool.manifest
+        if not 0 <= index < manifest.chunks:
+            raise ValueError("Chunk index out of range")
+        data = open_chunk(sealed, key, transfer_id, index)
+        if len(data) != manifest.chunk_length(index):
+            raise ValueError("Chunk has the wrong length")
+        with spool.lock:
+            if index in spool.have:
+                return False
+            with open(spool.part_path, "r+b") as f:
+                f.seek(index * manifest.chunk_size)
+                f.write(data)
+            with open(spool.acks_path, "ab") as f:
+                f.write(INDEX.pack(index))
+            spool.have.add(index)
+            return len(spool.have) == manifest.chunks
+
+    def finish(self, transfer_id: str, key: bytes) -> Payload:
+        """Assemble a complete transfer, verify it against its ID and remove the spool."""
+        with self._lock:
+            spool = self._spools.pop(transfer_id)
+        manifest = spool.manifest
+        with open(spool.part_path, "rb") as f:
+            data = f.read()
+        self._remove(spool)
+        if bytes_id(data, key) != manifest.id:
+            raise ValueError("Transfer does not match its ID")
+        with self._lock:
+            self._completed[transfer_id] = None
+            while len(self._completed) > 32:
+                self._completed.popitem(last=False)
+        return Payload(manifest.kind, manifest.mime, manifest.name, data)
+
+    def _open(self, spool: _Spool) -> None:
+        manifest = spool.manifest
+        header = INDEX.pack(manifest.chunk_size)
+        try:
+            with open(spool.acks_path, "rb") as f:
+                raw = f.read()
+            if raw[:INDEX.size] == header and os.path.getsize(spool.part_path) == manifest.size:
+                # Ignore a partially written trailing index.
+                raw = raw[INDEX.size:len(raw) - len(raw) % INDEX.size]
+                spool.have.update(i for (i,) in INDEX.iter_unpack(raw) if i < manifest.chunks)
+                return
+        except OSError:
+            pass
+        with open(spool.part_path, "wb") as f:
+            f.truncate(manifest.size)
+        with open(spool.acks_path, "wb") as f:
+            f.write(header)
+
+    def _remove(self, spool: _Spool) -> None:
+        for path in (spool.part_path, spool.acks_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.expire_after
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning("Could not remove stale transfer %s: %s", entry.path, e)
+
+
+def save_payload(payload: Payload, directory: str = DEFAULT_RECEIVED_DIR) -> str:
+    """Write a received payload into `directory`, never overwriting; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.basename(payload.name) or (payload.kind + (mimetypes.guess_extension(payload.mime) or ""))
+    stem, ext = os.path.splitext(name)
+    path = os.path.join(directory, name)
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem} ({n}){ext}")
+        n += 1
+    with open(path, "wb") as f:
+        f.write(payload.data)
+    return path
@@ -0,0 +1,144 @@
+import json
+import struct
+from typing import List, NamedTuple, Optional
+
+from codec import decode, decode_many, encode
+from delta import Delta, decode_delta, encode_delta
+
+# A frame is a fixed header, the sender's origin ID and a codec envelope,
+# with no JSON or base64 wrapping:
+#
+#   magic "CS" | version u8 | flags u8 | origin length u8 | seq u64 | body length u32
+#   origin (UTF-8) | body
+#
+# The body is sealed with the frame's flags, seq and origin as associated data
+# (frame_aad), so none of them can be changed without the body failing to open.
+# The JSON route binds its "seq" and "origin" fields the same way, with flags 0.
+#
+# Frames are posted as application/octet-stream to the receivers' /clipboard/bin route.
+# A batch is several frames back to back, oldest first, posted to /clipboard/batch.
+#
+# Frames with FLAG_ANNOUNCE carry an encrypted JSON Announcement instead of the
+# content; the receiver fetches the full frame from the sender's
+# /clipboard/content?id=... route only when it is needed.
+#
+# Frames with FLAG_DELTA carry an encrypted Delta against a text the receiver
+# already has; receivers answer 409 when they do not have its base.
+WIRE_MAGIC = b"CS"
+WIRE_VERSION = 1
+HEADER = struct.Struct("!2sBBBQI")
+AAD = struct.Struct("!BQ")
+CONTENT_TYPE = "application/octet-stream"
+BINARY_ROUTE = "/clipboard/bin"
+BATCH_ROUTE = "/clipboard/batch"
+CONTENT_ROUTE = "/clipboard/content"
+FLAG_ANNOUNCE = 0x01
+FLAG_DELTA = 0x02
+
+
+class Frame(NamedTuple):
+    flags: int
+    seq: int
+    origin: Optional[str]
+    body: bytes
+
+
+class Announcement(NamedTuple):
+    """Descriptor of large content available from the sender."""
+    id: str
+    size: int
+    type: str
+    preview: str
+    port: int
+
+
+def frame_aad(flags: int, seq: int = 0, origin: Optional[str] = None) -> bytes:
+    """Return the associated data a frame's body is sealed with."""
+    return AAD.pack(flags, seq) + (origin or "").encode("utf-8")
+
+
+def encode_frame(body: bytes, seq: int = 0, origin: Optional[str] = None, flags: int = 0) -> bytes:
+    """Build a frame around an already encrypted body."""
+    origin_bytes = (origin or "").encode("utf-8")
+    if len(origin_bytes) > 255:
+        raise ValueError("Origin ID too long")
+    header = HEADER.pack(WIRE_MAGIC, WIRE_VERSION, flags, len(origin_bytes), seq, len(body))
+    return header + origin_bytes + body
+
+
+def decode_frame(raw: bytes) -> Frame:
+    """Parse a frame, raising ValueError on malformed input."""
+    if len(raw) < HEADER.size:
+        raise ValueError("Frame too short")
+    magic, version, flags, origin_len, seq, length = HEADER.unpack_from(raw)
+    if magic != WIRE_MAGIC:
+        raise ValueError("Bad frame magic")
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported frame version: {version}")
+    start = HEADER.size + origin_len
+    if len(raw) != start + length:
+        raise ValueError("Frame length mismatch")
+    origin = raw[HEADER.size:start].decode("utf-8") or None
+    return Frame(flags, seq, origin, raw[start:])
+
+
+def decode_batch(raw: bytes) -> List[Frame]:
+    """Split a batch of concatenated frames, raising ValueError on malformed input."""
+    frames = []
+    offset = 0
+    while offset < len(raw):
+        if len(raw) - offset < HEADER.size:
+            raise ValueError("Truncated frame in batch")
+        origin_len, length = HEADER.unpack_from(raw, offset)[3::2]
+        end = offset + HEADER.size + origin_len + length
+        if end > len(raw):
+            raise ValueError("Truncated frame in batch")
+        frames.append(decode_frame(raw[offset:end]))
+        offset = end
+    return frames
+
+
+def seal_text(text: str, key: bytes, seq: int = 0, origin: Optional[str] = None) -> bytes:
+    """Encrypt text and wrap it in a frame."""
+    return encode_frame(encode(text.encode("utf-8"), key, aad=frame_aad(0, seq, origin)), seq, origin)
+
+
+def open_body(frame: Frame, key: bytes) -> bytes:
+    """Decrypt the body of a decoded frame, verifying its header along with it."""
+    return decode(frame.body, key, frame_aad(frame.flags, frame.seq, frame.origin))
+
+
+def open_frame(frame: Frame, key: bytes) -> str:
+    """Decrypt the body of a decoded frame back to text."""
+    return open_body(frame, key).decode("utf-8")
+
+
+def open_frames(frames: List[Frame], key: bytes) -> List[str]:
+    """Decrypt the bodies of several text frames at once, e.g. a replayed batch."""
+    aads = [frame_aad(frame.flags, frame.seq, frame.origin) for frame in frames]
+    return [body.decode("utf-8") for body in decode_many([frame.body for frame in frames], key, aads)]
+
+
+def seal_announcement(announcement: Announcement, key: bytes, seq: int = 0, origin: Optional[str] = None) -> bytes:
+    """Encrypt an announcement and wrap it in a frame flagged FLAG_ANNOUNCE."""
+    body = json.dumps(announcement._asdict()).encode("utf-8")
+    return encode_frame(encode(body, key, compress=False, aad=frame_aad(FLAG_ANNOUNCE, seq, origin)), seq, origin, FLAG_ANNOUNCE)
+
+
+def open_announcement(frame: Frame, key: bytes) -> Announcement:
+    """Decrypt an announcement frame, raising ValueError if it is malformed."""
+    try:
+        fields = json.loads(open_body(frame, key))
+        return Announcement(str(fields["id"]), int(fields["size"]), str(fields["type"]), str(fields["preview"]), int(fields["port"]))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed announcement: {e}")
+
+
+def seal_delta(delta: Delta, key: bytes, seq: int = 0, origin: Optional[str] = None) -> bytes:
+    """Encrypt a delta and wrap it in a frame flagged FLAG_DELTA."""
+    return encode_frame(encode(encode_delta(delta), key, aad=frame_aad(FLAG_DELTA, seq, origin)), seq, origin, FLAG_DELTA)
+
+
+def open_delta(frame: Frame, key: bytes) -> Delta:
+    """Decrypt a delta frame, raising ValueError if it is malformed."""
+    return decode_delta(open_body(frame, key))
@@ -0,0 +1,41 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from config_store import load_config
+from echo_suppress import default_origin
+from sync_service import create_sender
+from transfer import payload_from_file
+
+def send_files(paths, timeout=600):
+    """
+    Send files (screenshots, documents) to every configured peer as chunked,
+    resumable transfers. Returns True if all of them were delivered.
+    """
+    config = load_config()
+    sender = create_sender(config, default_origin(config))
+    if sender is None:
+        print("No peers or key configured, run setup_config.py first")
+        return False
+    sender.start()
+    try:
+        for path in paths:
+            sender.send_payload(payload_from_file(path))
+            # Transfers are latest-wins, so send one file at a time.
+            if not sender.wait_transfers(timeout):
+                print(f"Timed out sending {path}")
+                return False
+        failed = sum(c.transfers_failed for c in sender.channels)
+        if failed:
+            print(f"{failed} transfer(s) failed; see the log above.")
+        return failed == 0
+    finally:
+        sender.stop()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python send_file.py FILE [FILE ...]")
+        sys.exit(2)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    sys.exit(0 if send_files(sys.argv[1:]) else 1)
@@ -1,38 +1,23 @@
-import pyperclip
-import time
-import traceback
+import logging
+import os
+import sys
 
-def monitor_clipboard(interval=1):
-    last_text = ""
-    
-    print("Monitoring clipboard for changes. Press Ctrl+C to stop.")
-    
-    try:
-        while True:
-            try:
-                current_text = pyperclip.paste()
-            except Exception as e:
-                print(f"[Error accessing clipboard]: {e}")
-                traceback.print_exc()
-                time.sleep(interval)
-                continue  
-
-            if current_text != last_text:
-                last_text = current_text
-                print("\n[Clipboard Updated]")
-                prepared_text = prepare_text(current_text)
-                print("Prepared Text for Sending:", prepared_text)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from sync_service import ConfigStore, create_service, run_headless
 
-            time.sleep(interval)
-    
-    except KeyboardInterrupt:
-        print("\nStopped clipboard monitoring.")
-
-def prepare_text(text):
-    """
-    Clean or format text before sending (e.g., trimming whitespace).
-    """
-    return text.strip()
+def print_status(status):
+    """Print the sync service's status updates to the console."""
+    if status["event"] == "changed":
+        print(f"\n[Clipboard Updated] ({status['length']} characters): {status['preview']}")
+    elif status["event"] == "echo":
+        print(f"\n[Echo suppressed] ({status['suppressed']} total)")
+    elif status["event"] == "error":
+        print(f"[Error accessing clipboard]: {status['message']}")
+    elif status["event"] == "reconfigured":
+        print("[Config reloaded]")
 
 if __name__ == "__main__":
-    monitor_clipboard(interval=1)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    print("Monitoring clipboard for changes. Press Ctrl+C to stop.")
+    run_headless(create_service(None, on_status=print_status, config_store=ConfigStore()))
+    print("\nStopped clipboard monitoring.")